@@ -15,11 +15,8 @@ but WITHOUT ANY WARRANTY; without even the implied warranty of
 MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 GNU General Public License for more details.
 """
-import os
 from pathlib import Path
-import webbrowser
 from nvcollectionlib.nvcollection_globals import *
-from nvcollectionlib.collection_manager import CollectionManager
 
 DEFAULT_FILE = 'collection.pwc'
 
@@ -30,6 +27,9 @@ class Plugin:
     Public methods:
         disable_menu() -- disable menu entries when no project is open.
         enable_menu() -- enable menu entries when a project is open.    
+
+    The collection manager is imported when it is started for the first time,
+    so loading the plugin does not slow down the novelyst startup.
     """
     VERSION = '@release'
     NOVELYST_API = '4.19'
@@ -52,9 +52,15 @@ class Plugin:
         self._ui.fileMenu.entryconfig(APPLICATION, state='normal')
 
         # Add an entry to the Help menu.
-        self._ui.helpMenu.add_command(label=_('Collection plugin Online help'), command=lambda: webbrowser.open(self._HELP_URL))
+        self._ui.helpMenu.add_command(label=_('Collection plugin Online help'), command=self._open_help)
+
+    def _open_help(self):
+        import webbrowser
+        webbrowser.open(self._HELP_URL)
 
     def _start_manager(self):
+        from nvcollectionlib.collection_manager import CollectionManager
+
         if self._collectionManager:
             if self._collectionManager.isOpen:
                 self._collectionManager.lift()
@@ -0,0 +1,79 @@
+"""Provide a class for checking the availability of the book files.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AvailabilityCheck:
+    """Check whether the book files exist, using a pool of worker threads.
+
+    The results can be fetched as they come in,
+    so the caller can poll them without blocking.
+
+    Public methods:
+        start() -- start checking the files.
+        get_results() -- return the results that came in since the last call.
+        is_finished() -- return True, if all files are checked and all results fetched.
+        wait() -- block until all files are checked.
+        cancel() -- do not check the files not yet started.
+    """
+    MAX_WORKERS = 16
+    # Stat calls on network drives are dominated by latency, so use more threads than CPUs.
+
+    def __init__(self, books, maxWorkers=MAX_WORKERS):
+        """Initialize the instance variables.
+
+        Positional arguments:
+            books -- dict of Book instances by book ID.
+
+        Optional arguments:
+            maxWorkers -- int: maximum number of worker threads.
+        """
+        self._files = [(bkId, books[bkId].filePath) for bkId in books]
+        self._maxWorkers = maxWorkers
+        self._results = queue.Queue()
+        self._executor = None
+        self._futures = []
+        self._pending = len(self._files)
+
+    def start(self):
+        """Start checking the files."""
+        self._executor = ThreadPoolExecutor(max_workers=self._maxWorkers)
+        for bkId, filePath in self._files:
+            self._futures.append(self._executor.submit(self._check_file, bkId, filePath))
+        self._executor.shutdown(wait=False)
+
+    def get_results(self):
+        """Return a list of (book ID, bool: file exists) tuples that came in since the last call."""
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                break
+
+        self._pending -= len(results)
+        return results
+
+    def is_finished(self):
+        return self._pending <= 0
+
+    def wait(self):
+        """Block until all files are checked."""
+        for future in self._futures:
+            if not future.cancelled():
+                future.exception()
+
+    def cancel(self):
+        """Do not check the files not yet started."""
+        for future in self._futures:
+            if future.cancel():
+                self._pending -= 1
+
+    def _check_file(self, bkId, filePath):
+        self._results.put((bkId, os.path.isfile(filePath)))
@@ -4,6 +4,7 @@ Copyright (c) 2023 Peter Triesberger
 For further information see https://github.com/peter88213/novelyst_collection
 License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
 """
+from nvcollectionlib.yw7_metadata import read_project_metadata
 
 
 class Book:
@@ -18,6 +19,15 @@ class Book:
         self.title = None
         self.desc = None
 
+        self.isAvailable = None
+        # True, if the project file exists; None, if not checked yet.
+
+        self.isModified = False
+        # True, if the book has changed since the collection was read or written.
+
+        self.statistics = None
+        # Dictionary with the word, chapter, and scene counts; None, if not counted yet.
+
     def pull_metadata(self, novel):
         """Update metadata from novel.
 
@@ -33,6 +43,29 @@ class Book:
             modified = True
         return modified
 
+    def pull_file_metadata(self, cache=None):
+        """Update metadata from the project file, without reading the whole project.
+
+        Optional arguments:
+            cache -- MetadataCache instance to be used instead of reading unchanged files.
+
+        Return True, if the book is modified, 
+        otherwise return False. 
+        Raise the "Error" exception in case of error.
+        """
+        if cache is not None:
+            metadata = cache.get_metadata(self.filePath)
+        else:
+            metadata = read_project_metadata(self.filePath)
+        modified = False
+        if self.title != metadata['title']:
+            self.title = metadata['title']
+            modified = True
+        if self.desc != metadata['desc']:
+            self.desc = metadata['desc']
+            modified = True
+        return modified
+
     def push_metadata(self, novel):
         """Update novel metadata.
         
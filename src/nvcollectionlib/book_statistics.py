@@ -0,0 +1,104 @@
+"""Provide functions for counting the words, chapters, and scenes of the books.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from nvcollectionlib.nvcollection_globals import *
+from nvcollectionlib.yw7_metadata import read_project_content
+from nvcollectionlib.yw7_metadata import strip_markup
+
+STATISTICS_KEYS = ('words', 'chapters', 'scenes', 'unusedScenes')
+# Per-book counts: words and chapters of the manuscript, normal scenes, unused scenes.
+
+ROLLUP_KEYS = ('books',) + STATISTICS_KEYS
+# Counts of series and collections, including the number of books counted.
+
+_DASH_PATTERN = re.compile(r'--|\u2014|\u2013')
+# Dashes separating words.
+
+
+def count_words(text):
+    """Return the number of words of a scene text, without the yWriter markup and comments."""
+    return len(_DASH_PATTERN.sub(' ', strip_markup(text)).split())
+
+
+def get_statistics(content):
+    """Return a dictionary with the STATISTICS_KEYS, counted from the project content.
+
+    Positional arguments:
+        content -- dict: project content, as returned by read_project_content().
+
+    Only normal chapters are counted. Their normal scenes make up the word count.
+    Scenes marked as unused, or belonging to unused chapters, are counted as unused scenes.
+    Notes and to do scenes and chapters are not counted.
+    """
+    statistics = dict.fromkeys(STATISTICS_KEYS, 0)
+    for chapter in content['chapters']:
+        if chapter['type'] != 0:
+            continue
+
+        if not chapter['unused']:
+            statistics['chapters'] += 1
+        for scId in chapter['scenes']:
+            scene = content['scenes'].get(scId, None)
+            if scene is None or scene['type'] != 0:
+                continue
+
+            if scene['unused'] or chapter['unused']:
+                statistics['unusedScenes'] += 1
+            else:
+                statistics['scenes'] += 1
+                statistics['words'] += count_words(scene['text'])
+    return statistics
+
+
+def read_statistics(filePath):
+    """Return a dictionary with the STATISTICS_KEYS, counted from a .yw7 file.
+
+    Raise the "Error" exception in case of error.
+    """
+    return get_statistics(read_project_content(filePath))
+
+
+def read_books_statistics(filePaths, cache=None):
+    """Count the words, chapters, and scenes of many books, using a pool of worker threads.
+
+    Positional arguments:
+        filePaths -- dict of project paths by book ID.
+
+    Optional arguments:
+        cache -- MetadataCache instance to be used instead of reading unchanged files.
+
+    Return a dictionary of the statistics by book ID, with the error message instead, if a project cannot be read.
+    The collection is not accessed, so this function can run in another thread.
+    """
+
+    def read_book(filePath):
+        try:
+            if cache is not None:
+                return cache.get_statistics(filePath)
+
+            return read_statistics(filePath)
+
+        except Error as ex:
+            return str(ex)
+
+    bkIds = list(filePaths)
+    with ThreadPoolExecutor() as executor:
+        return dict(zip(bkIds, executor.map(read_book, [filePaths[bkId] for bkId in bkIds])))
+
+
+def add_statistics(totals, statistics, sign=1):
+    """Add a book's statistics to the roll-up totals, or subtract them with sign=-1."""
+    totals['books'] += sign
+    for key in STATISTICS_KEYS:
+        totals[key] += sign * statistics[key]
+
+
+def new_rollup():
+    """Return a dictionary with the ROLLUP_KEYS set to zero."""
+    return dict.fromkeys(ROLLUP_KEYS, 0)
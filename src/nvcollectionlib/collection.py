@@ -5,17 +5,34 @@ For further information see https://github.com/peter88213/novelyst_collection
 License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
 """
 import os
-import re
-from html import unescape
-import xml.etree.ElementTree as ET
+import csv
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
 import tkinter.font as tkFont
 
 from nvcollectionlib.nvcollection_globals import *
-from pywriter.yw.xml_indent import indent
 from pywriter.model.id_generator import create_id
 
 from nvcollectionlib.series import Series
 from nvcollectionlib.book import Book
+from nvcollectionlib.collection_tree import CollectionTree
+from nvcollectionlib.collection_stats import CollectionStats
+from nvcollectionlib.collection_storage import get_storage
+from nvcollectionlib.collection_storage import get_storage_class
+from nvcollectionlib.search_index import SearchIndex
+from nvcollectionlib.collection_lock import CollectionChangedError
+from nvcollectionlib.collection_lock import CollectionLock
+from nvcollectionlib.collection_lock import get_file_version
+from nvcollectionlib.collection_lock import is_file_changed
+from nvcollectionlib.collection_merge import merge_nodes
+from nvcollectionlib.collection_diff import diff_nodes
+from nvcollectionlib.collection_diff import merge_collections
+from nvcollectionlib.book_statistics import STATISTICS_KEYS
+from nvcollectionlib.book_statistics import add_statistics
+from nvcollectionlib.book_statistics import new_rollup
+from nvcollectionlib.book_statistics import read_books_statistics
+from nvcollectionlib.yw7_metadata import read_project_metadata
+from nvcollectionlib.availability_check import AvailabilityCheck
 
 
 class Collection:
@@ -24,49 +41,41 @@ class Collection:
     - A collection has books and series.
     - Books can be members of a series.
     
-    The collection data is saved in an XML file.
+    The collection data is saved in a pwc XML file, or in an SQLite database.
+    The order of books and series is held by a CollectionTree,
+    so the collection can be processed without a display.
+    The time spent in reading, writing, and adding books, the numbers of books
+    and bytes processed, and the view calls are recorded in the stats object.
+    Changes to the books, the series, and the tree structure are tracked,
+    so the collection needs to be written only if it is modified.
+    Optionally, the changes are logged in a journal, which is replayed on reading,
+    so the collection file needs to be written only now and then.
+    Optionally, the content of the collection file is kept in a binary cache,
+    so the file needs to be parsed only if it has been changed by another program.
+    The books' word, chapter, and scene counts are rolled up per series and for the collection.
+    The roll-ups are updated with each change, so the books need not be counted again.
+    Several users can edit the same collection file: the file is locked while being written,
+    and changes made by others since the file was read are merged instead of being overwritten.
     """
-    MAJOR_VERSION = 1
-    MINOR_VERSION = 0
-    # DTD version.
-
-    _FILE_EXTENSION = 'pwc'
-
-    _CDATA_TAGS = ['title', 'desc', 'path']
-    # Names of xml books containing CDATA.
-    # ElementTree.write omits CDATA tags, so they have to be inserted afterwards.
-
-    newMap = dict(
-            collection='collection',
-            series='series',
-            book='book',
-            id='id',
-            path='path',
-            title='title',
-            desc='desc',
-            )
-
-    oldMap = dict(
-            collection='COLLECTION',
-            series='SERIES',
-            book='BOOK',
-            id='ID',
-            path='Path',
-            title='Title',
-            desc='Desc',
-            )
-
-    def __init__(self, filePath, tree):
+    def __init__(self, filePath, view=None):
         """Initialize the instance variables.
         
         Positional arguments:
             filePath -- str: path to xml file.
-            tree -- tree structure of series and book IDs.
+
+        Optional arguments:
+            view -- ttk.Treeview displaying the tree of series and books.
         """
         self.title = None
-        self.tree = tree
-        fontSize = tkFont.nametofont('TkDefaultFont').actual()['size']
-        self.tree.tag_configure('series', font=('', fontSize, 'bold'))
+        self.stats = CollectionStats()
+        # Timers and counters of the collection operations.
+
+        if view is not None:
+            fontSize = tkFont.nametofont('TkDefaultFont').actual()['size']
+            view.tag_configure('series', font=('', fontSize, 'bold'))
+            view.tag_configure('missing', foreground='gray')
+        self.tree = CollectionTree(view, self.stats)
+        # Tree structure of series and book IDs.
 
         self.books = {}
         # Dictionary:
@@ -78,8 +87,57 @@ class Collection:
         #   keyword -- series ID
         #   value -- Series instance
 
+        self._pathIndex = {}
+        # Dictionary:
+        #   keyword -- normalized book file path
+        #   value -- book ID
+
+        self._searchIndex = None
+        # SearchIndex of the books' and series' titles and descriptions, built on the first search.
+
+        self._titleIndex = {}
+        # Dictionary:
+        #   keyword -- book title
+        #   value -- list of book IDs
+
+        self._lastBookId = 0
+        # Highest numeric book ID in use; new IDs are allocated above it.
+
+        self.metadataCache = None
+        # MetadataCache instance used for refreshing the books, if any.
+
+        self.keepBackup = True
+        # If True, the previous collection file is kept as a .bak file on writing.
+
+        self.lockTimeout = CollectionLock.TIMEOUT
+        # Seconds to wait for another user's lock on writing; 0 for a single attempt.
+
+        self._changes = {}
+        # Dictionary:
+        #   keyword -- node ID of a modified book or series; '' for the tree structure
+        #   value -- int: change count at the element's last modification
+
+        self._changeCount = 0
+        # Number of changes since the collection was created.
+
+        self.journal = None
+        # CollectionJournal instance logging the changes, if any.
+
+        self.cache = None
+        # CollectionCache instance holding the content of the collection file, if any.
+
+        self.statistics = new_rollup()
+        # Dictionary with the sums of the counted books' statistics, and the number of these books.
+
+        self._fileVersion = None
+        # Dictionary identifying the collection file version last read or written, if any.
+
+        self._baseNodes = None
+        # List of the nodes of the collection file version last read or written,
+        # used as common base for merging.
+
         self._filePath = None
-        # Location of the collection XML file.
+        # Location of the collection file.
 
         self.filePath = filePath
 
@@ -89,154 +147,339 @@ class Collection:
 
     @filePath.setter
     def filePath(self, filePath):
-        """Accept only filenames with the right extension. """
-        if filePath.lower().endswith(self._FILE_EXTENSION):
+        """Accept only filenames with the extension of a supported file format. """
+        if get_storage_class(filePath) is not None:
             self._filePath = filePath
             self.title, __ = os.path.splitext(os.path.basename(self.filePath))
 
     def read(self):
-        """Parse the pwc XML file located at filePath, fetching the Collection attributes.
+        """Read the collection file located at filePath, fetching the Collection attributes.
         
+        The file format depends on the file extension. 
+        The book files are not checked here, so the books' availability is unknown 
+        until check_availability() or set_availability() is called.
+        If there is a valid cache, the file is not parsed, but the cached content is loaded.
+        If there is a journal, the changes logged since the file was written are applied.
         Return a message.
         Raise the "Error" exception in case of error.
         """
+        nodes = self.read_nodes()
+        self.begin_load()
+        self.load_nodes(nodes)
+        return self.finish_load()
 
-        def get_book(parent, xmlBook):
-            try:
-                bkId = xmlBook.attrib[(xmlMap['id'])]
-                item = f'{BOOK_PREFIX}{bkId}'
-                bookPath = xmlBook.find(xmlMap['path']).text
-                if os.path.isfile(bookPath):
-                    self.books[bkId] = Book(bookPath)
-                    if xmlBook.find(xmlMap['title']) is not None:
-                        self.books[bkId].title = xmlBook.find(xmlMap['title']).text
-                    else:
-                        self.books[bkId].title = item
-                    if xmlBook.find(xmlMap['desc']) is not None:
-                        self.books[bkId].desc = xmlBook.find(xmlMap['desc']).text
-                    self.tree.insert(parent, 'end', item, text=self.books[bkId].title, open=True)
-            except:
-                pass
+    def read_nodes(self):
+        """Return a list of the (node ID, parent node ID, fields) tuples of the collection file, in tree order.
 
-        # Open the file and let ElementTree parse its xml structure.
+        If there is a valid cache, the file is not parsed, but the cached nodes are returned.
+        Otherwise, the cache is refreshed with the parsed nodes.
+        The collection model is not accessed, so this method can run in another thread,
+        and the nodes can be loaded in batches with load_nodes().
+        The file version and the nodes are kept as base for merging the changes of other users.
+        Raise the "Error" exception in case of error.
+        """
+        storage = self._get_storage(self.filePath)
+        fileVersion = get_file_version(self.filePath)
+        nodes = None
         try:
-            xmlTree = ET.parse(self.filePath)
-            xmlRoot = xmlTree.getroot()
-        except:
-            raise Error(f'{_("Can not process file")}: "{norm_path(self.filePath)}".')
-
-        if xmlRoot.tag == self.newMap['collection']:
-            xmlMap = self.newMap
-        elif xmlRoot.tag == self.oldMap['collection']:
-            xmlMap = self.oldMap
-        else:
-            raise Error(f'{_("No collection found in file")}: "{norm_path(self.filePath)}".')
+            with self.stats.timer('read'):
+                if self.cache is not None:
+                    nodes = self.cache.read()
+                if nodes is not None:
+                    self.stats.count('cache hits')
+                else:
+                    nodes = list(storage.read())
+                    if self.cache is not None:
+                        self.cache.write(nodes)
+        except Error:
+            raise
 
-        try:
-            majorVersionStr, minorVersionStr = xmlRoot.attrib['version'].split('.')
-            majorVersion = int(majorVersionStr)
-            minorVersion = int(minorVersionStr)
         except:
-            raise Error(f'{_("No valid version found in file")}: "{norm_path(self.filePath)}".')
+            raise Error(f'{_("Can not parse file")}: "{norm_path(self.filePath)}".')
 
-        if majorVersion > self.MAJOR_VERSION:
-            raise Error(_('The collection was created with a newer plugin version.'))
+        self._fileVersion = fileVersion
+        self._baseNodes = nodes
+        return nodes
 
-        elif majorVersion < self.MAJOR_VERSION:
-            raise Error(_('The collection was created with an outdated plugin version.'))
+    def begin_load(self):
+        """Discard the collection's content before loading the nodes read from the file."""
+        self.reset_tree()
+        self._reset_elements()
 
-        elif minorVersion > self.MINOR_VERSION:
-            raise Error(_('The collection was created with a newer plugin version.'))
+    def load_nodes(self, nodes):
+        """Create the books and series of a batch of nodes, as returned by read_nodes().
 
-        self.reset_tree()
-        self.books = {}
-        self.series = {}
+        Raise the "Error" exception in case of error.
+        """
         try:
-            for xmlElement in xmlRoot:
-                if xmlElement.tag == xmlMap['book']:
-                    get_book('', xmlElement)
-                elif xmlElement.tag == xmlMap['series']:
-                    srId = xmlElement.attrib[xmlMap['id']]
-                    item = f'{SERIES_PREFIX}{srId}'
-                    self.series[srId] = Series()
-                    if xmlElement.find(xmlMap['title']) is not None:
-                        self.series[srId].title = xmlElement.find(xmlMap['title']).text
-                    else:
-                        self.series[srId].title = item
-                    if xmlElement.find(xmlMap['desc']) is not None:
-                        self.series[srId].desc = xmlElement.find(xmlMap['desc']).text
-                    self.tree.insert('', 'end', item, text=self.series[srId].title, tags=xmlMap['series'], open=True)
-                    for xmlBook in xmlElement.iter(xmlMap['book']):
-                        get_book(item, xmlBook)
+            with self.stats.timer('load'):
+                for node in nodes:
+                    self._add_element(*node)
         except:
             raise Error(f'{_("Can not parse file")}: "{norm_path(self.filePath)}".')
 
-        if not xmlRoot.attrib.get('version', None):
-            self.write()
-            # update the XML file according to the current DTD version
-        return f'{len(self.books)} Books found in "{norm_path(self.filePath)}".'
+    def finish_load(self):
+        """Complete loading the collection file.
+
+        If there is a journal, the changes logged since the file was written are applied.
+        Return a message.
+        """
+        self.stats.count('books read', len(self.books))
+        self.stats.count('series read', len(self.series))
+        message = f'{len(self.books)} Books found in "{norm_path(self.filePath)}".'
+        journal = self.journal
+        if journal is not None:
+            replayCount = self._replay_journal()
+            if replayCount and journal.isOutdated:
+                message = (f'{message} {replayCount} {_("unsaved changes restored")}; '
+                           f'{_("the file has been changed by another program in the meantime")}.')
+        return message
+
+    def reload(self, keepChanges=True):
+        """Update the collection from its file, changing only the books and series that differ.
+
+        Optional arguments:
+            keepChanges -- bool: if True, the unsaved changes are merged with the file's changes.
+
+        The tree is not rebuilt. Instead, the file's nodes are matched with the tree nodes by their IDs,
+        and only the differences are applied as insertions, deletions, moves, and text updates.
+        So the view keeps its selection and the expansion state of the nodes.
+        If keepChanges is False, the unsaved changes are discarded, and so is the journal, if any.
+        Return a message.
+        Raise the "Error" exception in case of error.
+        """
+        if keepChanges and self.is_modified():
+            message = self.merge_file()
+            if self.journal is not None:
+                try:
+                    self.journal.start(self.journal.records)
+                except Error:
+                    self._drop_journal()
+            return message
+
+        nodes = self.read_nodes()
+        with self.stats.timer('reload'):
+            try:
+                counts = self._apply_nodes(nodes)
+            except:
+                raise Error(f'{_("Can not parse file")}: "{norm_path(self.filePath)}".')
+
+            self.clear_modified()
+            if self.journal is not None:
+                try:
+                    self.journal.start()
+                except Error:
+                    self._drop_journal()
+        return (f'"{norm_path(self.filePath)}" reloaded: '
+                f'{counts["added"]} added, {counts["removed"]} removed, '
+                f'{counts["moved"]} moved, {counts["changed"]} changed.')
 
     def write(self):
         """Write the collection's attributes to a pwc XML file located at filePath. 
         
-        Overwrite existing file without confirmation.
+        If the file has been changed by another program since it was read,
+        the changes are merged with the collection before writing.
         Return a message.
         Raise the "Error" exception in case of error.
         """
+        snapshot = self.snapshot()
+        try:
+            message = self.write_snapshot(snapshot)
+        except CollectionChangedError:
+            self.merge_file()
+            snapshot = self.snapshot()
+            message = self.write_snapshot(snapshot)
+        self.commit_snapshot(snapshot)
+        return message
+
+    def merge_file(self):
+        """Merge the changes made to the collection file by another program with the collection's changes.
 
-        def walk_tree(node, xmlNode):
-            """Transform the Treeview nodes to XML Elementtree nodes."""
+        The file is compared with the version last read or written, so the books and series 
+        changed on either side are found by their IDs, and merged field by field.
+        If both sides changed the same field, the collection's value is kept.
+        The differences are applied to the tree, and the collection is marked as modified 
+        where it differs from the file.
+        Return a message.
+        Raise the "Error" exception in case of error.
+        """
+        baseNodes = self._baseNodes
+        if baseNodes is None:
+            baseNodes = []
+        ourNodes = self._get_snapshot_nodes(self.snapshot()['elements'])
+        theirNodes = self.read_nodes()
+        mergedNodes, conflicts = merge_nodes(baseNodes, ourNodes, theirNodes)
+        with self.stats.timer('merge'):
+            try:
+                counts = self._apply_nodes(mergedNodes)
+            except:
+                raise Error(f'{_("Can not merge file")}: "{norm_path(self.filePath)}".')
+
+        # Mark what differs from the file, so it is written.
+        theirFields = {nodeId: (parent, fields) for nodeId, parent, fields in theirNodes}
+        theirTree = [(nodeId, parent) for nodeId, parent, __ in theirNodes]
+        if [(nodeId, parent) for nodeId, parent, __ in mergedNodes] != theirTree:
+            self._set_modified()
+        for nodeId, parent, fields in mergedNodes:
+            if theirFields.get(nodeId, None) != (parent, fields):
+                self._set_modified(nodeId)
+        message = (f'{_("Changes merged from")} "{norm_path(self.filePath)}": '
+                   f'{counts["added"]} added, {counts["removed"]} removed, '
+                   f'{counts["moved"]} moved, {counts["changed"]} changed.')
+        if conflicts:
+            message = f'{message} {len(conflicts)} {_("conflicts resolved in favor of the local changes")}.'
+        return message
+
+    def snapshot(self):
+        """Return a copy of the collection data to be written, e.g. by another thread.
+
+        The snapshot is a dictionary with the keys:
+            changeCount -- int: change count at the time of the snapshot.
+            journalCount -- int: number of journal records at the time of the snapshot.
+            fileVersion -- dict identifying the file version the changes are based on, or None.
+            modifiedIds -- list of the node IDs modified since the last write; '' for the structure.
+            books -- int: number of books.
+            elements -- tuple of (node prefix, element ID, fields, children) tuples,
+                        with fields as tuple of (XML tag, text) pairs, 
+                        and children in the same format.
+        """
+
+        def copy_tree(node):
+            elements = []
             for childNode in self.tree.get_children(node):
                 elementId = childNode[2:]
                 if childNode.startswith(BOOK_PREFIX):
-                    xmlBook = ET.SubElement(xmlNode, 'book')
-                    xmlBook.set('id', elementId)
-                    xmlBookPath = ET.SubElement(xmlBook, 'path')
-                    xmlBookPath.text = self.books[elementId].filePath
-                    xmlBookTitle = ET.SubElement(xmlBook, 'title')
-                    if self.books[elementId].title:
-                        xmlBookTitle.text = self.books[elementId].title
-                    xmlBookDesc = ET.SubElement(xmlBook, 'desc')
-                    if self.books[elementId].desc:
-                        xmlBookDesc.text = self.books[elementId].desc
+                    book = self.books[elementId]
+                    fields = (('path', book.filePath), ('title', book.title), ('desc', book.desc))
+                    elements.append((BOOK_PREFIX, elementId, fields, ()))
                 elif childNode.startswith(SERIES_PREFIX):
-                    xmlSeries = ET.SubElement(xmlNode, 'series')
-                    xmlSeries.set('id', elementId)
-                    xmlSeriesTitle = ET.SubElement(xmlSeries, 'title')
-                    if self.series[elementId].title:
-                        xmlSeriesTitle.text = self.series[elementId].title
-                    xmlSeriesDesc = ET.SubElement(xmlSeries, 'desc')
-                    if self.series[elementId].desc:
-                        xmlSeriesDesc.text = self.series[elementId].desc
-
-                    walk_tree(childNode, xmlSeries)
-
-        xmlRoot = ET.Element('collection')
-        xmlRoot.set('version', f'{self.MAJOR_VERSION}.{self.MINOR_VERSION}')
-        walk_tree('', xmlRoot)
-
-        indent(xmlRoot)
-        xmlTree = ET.ElementTree(xmlRoot)
-        backedUp = False
-        if os.path.isfile(self.filePath):
+                    series = self.series[elementId]
+                    fields = (('title', series.title), ('desc', series.desc))
+                    elements.append((SERIES_PREFIX, elementId, fields, copy_tree(childNode)))
+            return tuple(elements)
+
+        journalCount = 0
+        if self.journal is not None:
+            journalCount = len(self.journal.records)
+        return dict(
+            changeCount=self._changeCount,
+            journalCount=journalCount,
+            modifiedIds=list(self._changes),
+            fileVersion=self._fileVersion,
+            books=len(self.books),
+            elements=copy_tree(''),
+            )
+
+    def commit_snapshot(self, snapshot):
+        """Mark the changes contained in a written snapshot as saved.
+
+        Positional arguments:
+            snapshot -- dict: collection data, as returned by snapshot().
+
+        If there is a journal, it restarts with the changes made after the snapshot.
+        The written file becomes the base for merging.
+        """
+        self.clear_modified(snapshot['changeCount'])
+        if 'nodes' in snapshot:
+            self._fileVersion = snapshot['fileVersion']
+            self._baseNodes = snapshot['nodes']
+        if self.journal is not None:
             try:
-                os.replace(self.filePath, f'{self.filePath}.bak')
-            except:
-                raise Error(f'{_("Cannot overwrite file")}: "{norm_path(self.filePath)}".')
-            else:
-                backedUp = True
-        try:
-            xmlTree.write(self.filePath, encoding='utf-8')
+                self.journal.start(self.journal.records[snapshot['journalCount']:])
+            except Error:
+                self._drop_journal()
 
-            # Postprocess the xml file created by ElementTree
-            self._postprocess_xml_file(self.filePath)
-        except:
-            if backedUp:
-                os.replace(f'{self.filePath}.bak', self.filePath)
-            raise Error(f'{_("Cannot write file")}: "{norm_path(self.filePath)}".')
+    def write_snapshot(self, snapshot):
+        """Write a snapshot of the collection to the file located at filePath. 
+
+        Positional arguments:
+            snapshot -- dict: collection data, as returned by snapshot().
+
+        The file format depends on the file extension. 
+        If keepBackup is True, the previous collection file is kept as a .bak file, if applicable.
+        If there is a cache, it is updated with the snapshot.
+        The collection model is not accessed, so this method can run in another thread.
+        The file is locked while being written. If it has been changed by another program
+        since the snapshot's base version, it is not overwritten.
+        On success, the snapshot is extended by the written file's version and nodes.
+        Return a message.
+        Raise the "CollectionChangedError" exception, if the file has been changed by another program.
+        Raise the "CollectionLockedError" exception, if the file stays locked for lockTimeout seconds.
+        Raise the "Error" exception in case of error.
+        """
+        storage = self._get_storage(self.filePath)
+        with self.stats.timer('write'):
+            with CollectionLock(self.filePath, self.lockTimeout):
+                fileVersion = snapshot.get('fileVersion', None)
+                if fileVersion is not None and is_file_changed(self.filePath, fileVersion):
+                    raise CollectionChangedError(f'{_("File has been changed by another program")}: "{norm_path(self.filePath)}".')
+
+                try:
+                    storage.write(snapshot, self.keepBackup)
+                except Error:
+                    if self.cache is not None:
+                        self.cache.remove()
+                    raise
 
+                snapshot['fileVersion'] = get_file_version(self.filePath)
+            snapshot['nodes'] = self._get_snapshot_nodes(snapshot['elements'])
+            if self.cache is not None:
+                self.cache.write(snapshot['nodes'])
+        self.stats.count('books written', snapshot['books'])
         return f'"{norm_path(self.filePath)}" written.'
 
+    def export(self, filePath):
+        """Write the whole collection to another file, e.g. in another format.
+
+        Positional arguments:
+            filePath -- str: path to the target file; its extension determines the format.
+
+        The collection's own file and modification state are not changed.
+        Return a message.
+        Raise the "Error" exception in case of error.
+        """
+        storage = self._get_storage(filePath)
+        snapshot = self.snapshot()
+        snapshot['modifiedIds'] = None
+        storage.write(snapshot, self.keepBackup)
+        return f'"{norm_path(filePath)}" written.'
+
+    def diff(self, filePath):
+        """Return the differences between the collection and another collection file.
+
+        Positional arguments:
+            filePath -- str: path to the other collection file.
+
+        The books are matched by their IDs and normalized paths, the series by their IDs.
+        Return a dictionary, as described with collection_diff.diff_nodes().
+        Raise the "Error" exception in case of error.
+        """
+        return diff_nodes(self._get_snapshot_nodes(self.snapshot()['elements']), self._read_other(filePath))
+
+    def merge(self, filePath):
+        """Add the books and series of another collection file that are not in the collection.
+
+        Positional arguments:
+            filePath -- str: path to the other collection file.
+
+        The books are matched by their IDs and normalized paths, the series by their IDs.
+        The collection's entries are kept; only their empty fields are filled in from the other file. 
+        The differences are applied to the tree, and marked as modified.
+        Return a message.
+        Raise the "Error" exception in case of error.
+        """
+        ourNodes = self._get_snapshot_nodes(self.snapshot()['elements'])
+        mergedNodes = merge_collections(ourNodes, self._read_other(filePath))
+        with self.stats.timer('merge'):
+            counts = self._apply_nodes(mergedNodes)
+        ours = {nodeId: (parent, fields) for nodeId, parent, fields in ourNodes}
+        for nodeId, parent, fields in mergedNodes:
+            if ours.get(nodeId, None) != (parent, fields):
+                self._set_modified(nodeId)
+        if counts['added']:
+            self._set_modified()
+        return f'"{norm_path(filePath)}" merged: {counts["added"]} added, {counts["changed"]} changed.'
+
     def add_book(self, book, parent='', index='end'):
         """Add an existing project file as book to the collection. 
         
@@ -244,19 +487,85 @@ class Collection:
         Return None, if vovel is already a member.
         Raise the "Error" exception in case of error.
         """
-        if os.path.isfile(book.filePath):
-            for bkId in self.books:
-                if book.filePath == self.books[bkId].filePath:
+        with self.stats.timer('add_book'):
+            if os.path.isfile(book.filePath):
+                if self.get_book_id_by_path(book.filePath) is not None:
                     return None
 
-            bkId = create_id(self.books)
-            self.books[bkId] = Book(book.filePath)
-            self.books[bkId].pull_metadata(book.novel)
-            self.tree.insert(parent, index, f'{BOOK_PREFIX}{bkId}', text=self.books[bkId].title, open=True)
-            return bkId
+                bkId = self._new_book_id()
+                newBook = Book(book.filePath)
+                newBook.pull_metadata(book.novel)
+                newBook.isAvailable = True
+                self._register_book(bkId, newBook)
+                nodeId = f'{BOOK_PREFIX}{bkId}'
+                self.tree.insert(parent, index, nodeId, text=newBook.title, open=True)
+                self._set_modified(nodeId)
+                self._set_modified()
+                self._record('add_book', node=nodeId, parent=parent, index=self.tree.index(nodeId),
+                             path=newBook.filePath, title=newBook.title, desc=newBook.desc)
+                self.stats.count('books added')
+                return bkId
 
-        else:
-            raise Error(f'"{norm_path(book.filePath)}" not found.')
+            else:
+                raise Error(f'"{norm_path(book.filePath)}" not found.')
+
+    def add_books(self, books, parent='', index='end'):
+        """Add a batch of existing project files as books to the collection.
+
+        Positional arguments:
+            books -- iterable of project file objects, or of Book instances.
+
+        Optional arguments:
+            parent -- str: parent node ID; '' for the top level.
+            index -- int or 'end': position of the first book among the parent's children.
+
+        Paths are validated and duplicates are skipped, whether they are
+        already in the collection or repeated in the batch.
+        The tree is updated once for the whole batch.
+        Return a list of (file path, book ID, message) tuples, one per item.
+        The book ID is None, if the item is not added.
+        """
+        results = []
+        newBooks = []
+        # list of (result index, Book instance) tuples
+        pathKeys = set()
+        for book in books:
+            pathKey = path_key(book.filePath)
+            if not os.path.isfile(book.filePath):
+                results.append((book.filePath, None, f'!"{norm_path(book.filePath)}" not found.'))
+            elif pathKey in pathKeys or pathKey in self._pathIndex:
+                results.append((book.filePath, None, f'!"{norm_path(book.filePath)}" already exists.'))
+            else:
+                pathKeys.add(pathKey)
+                newBook = Book(book.filePath)
+                newBook.isAvailable = True
+                if isinstance(book, Book):
+                    newBook.title = book.title
+                    newBook.desc = book.desc
+                else:
+                    newBook.pull_metadata(book.novel)
+                newBooks.append((len(results), newBook))
+                results.append(None)
+
+        # Allocate the IDs for the whole batch.
+        firstId = self._lastBookId + 1
+        nodes = []
+        for i, (resultIndex, newBook) in enumerate(newBooks):
+            bkId = str(firstId + i)
+            self._register_book(bkId, newBook)
+            nodes.append((f'{BOOK_PREFIX}{bkId}', dict(text=newBook.title, open=True)))
+            results[resultIndex] = (newBook.filePath, bkId, f'"{newBook.title}" added to the collection.')
+        self.tree.insert_many(parent, index, nodes)
+        if nodes:
+            firstIndex = self.tree.index(nodes[0][0])
+            for i, (iid, __) in enumerate(nodes):
+                self._set_modified(iid)
+                book = self.books[iid[2:]]
+                self._record('add_book', node=iid, parent=parent, index=firstIndex + i,
+                             path=book.filePath, title=book.title, desc=book.desc)
+            self._set_modified()
+        self.stats.count('books added', len(nodes))
+        return results
 
     def remove_book(self, nodeId):
         """Remove a book from the collection.
@@ -268,8 +577,10 @@ class Collection:
         bookTitle = nodeId
         try:
             bookTitle = self.books[bkId].title
-            del self.books[bkId]
+            self._unregister_book(bkId)
             self.tree.delete(nodeId)
+            self._set_modified()
+            self._record('remove_book', node=nodeId)
             message = f'Book "{bookTitle}" removed from the collection.'
             return message
         except:
@@ -277,11 +588,19 @@ class Collection:
 
     def add_series(self, seriesTitle, index='end'):
         """Instantiate a Series object.
+
+        Return the series ID.
         """
         srId = create_id(self.series)
         self.series[srId] = Series()
         self.series[srId].title = seriesTitle
-        self.tree.insert('', index, f'{SERIES_PREFIX}{srId}', text=self.series[srId].title, tags='series', open=True)
+        nodeId = f'{SERIES_PREFIX}{srId}'
+        self.tree.insert('', index, nodeId, text=self.series[srId].title, tags='series', open=True)
+        self._update_search_index(nodeId)
+        self._set_modified(nodeId)
+        self._set_modified()
+        self._record('add_series', node=nodeId, index=self.tree.index(nodeId), title=seriesTitle)
+        return srId
 
     def remove_series(self, nodeId):
         """Delete a Series object but keep the books.
@@ -294,7 +613,10 @@ class Collection:
         for bookNode in self.tree.get_children(nodeId):
             self.tree.move(bookNode, '', 'end')
         del(self.series[srId])
+        self._update_search_index(nodeId)
         self.tree.delete(nodeId)
+        self._set_modified()
+        self._record('remove_series', node=nodeId)
         return f'"{seriesTitle}" series removed from the collection.'
 
         raise Error(f'Cannot remove "{seriesTitle}" series from the collection.')
@@ -309,47 +631,733 @@ class Collection:
         seriesTitle = self.series[srId].title
         for bookNode in self.tree.get_children(nodeId):
             bkId = bookNode[2:]
-            del self.books[bkId]
+            self._unregister_book(bkId)
         del(self.series[srId])
+        self._update_search_index(nodeId)
         self.tree.delete(nodeId)
+        self._set_modified()
+        self._record('remove_series_with_books', node=nodeId)
         return f'"{seriesTitle}" series removed from the collection.'
 
         raise Error(f'Cannot remove "{seriesTitle}" series from the collection.')
 
-    def _postprocess_xml_file(self, filePath):
-        """Postprocess an xml file created by ElementTree.
-        
-        Positional argument:
-            filePath -- str: path to xml file.
-        
-        Read the xml file, put a header on top, insert the missing CDATA tags,
-        and replace xml entities by plain text (unescape). Overwrite the .yw7 xml file.
-        Raise the "Error" exception in case of error. 
-        
-        Note: The path is given as an argument rather than using self.filePath. 
-        So this routine can be used for yWriter-generated xml files other than .yw7 as well. 
-        """
-        with open(filePath, 'r', encoding='utf-8') as f:
-            text = f.read()
-        lines = text.split('\n')
-        newlines = ['<?xml version="1.0" encoding="utf-8"?>']
-        for line in lines:
-            for tag in self._CDATA_TAGS:
-                line = re.sub(f'\<{tag}\>', f'<{tag}><![CDATA[', line)
-                line = re.sub(f'\<\/{tag}\>', f']]></{tag}>', line)
-            newlines.append(line)
-        text = '\n'.join(newlines)
-        text = text.replace('[CDATA[ \n', '[CDATA[')
-        text = text.replace('\n]]', ']]')
-        text = unescape(text)
+    def set_title(self, nodeId, title):
+        """Change the title of a book or series, and update the tree view.
+
+        Positional arguments:
+            nodeId -- str: tree node ID of the book or series.
+            title -- str: new title.
+        """
+        elemId = nodeId[2:]
+        if nodeId.startswith(BOOK_PREFIX):
+            book = self.books[elemId]
+            if book.title != title:
+                self._unindex_title(elemId, book.title)
+                book.title = title
+                self._index_title(elemId)
+                self._update_search_index(nodeId)
+                self._set_modified(nodeId)
+                self._record('set_title', node=nodeId, title=title)
+        elif nodeId.startswith(SERIES_PREFIX):
+            if self.series[elemId].title != title:
+                self.series[elemId].title = title
+                self._update_search_index(nodeId)
+                self._set_modified(nodeId)
+                self._record('set_title', node=nodeId, title=title)
+        self.tree.item(nodeId, text=title)
+
+    def set_desc(self, nodeId, desc):
+        """Change the description of a book or series.
+
+        Positional arguments:
+            nodeId -- str: tree node ID of the book or series.
+            desc -- str: new description.
+        """
+        element = self._get_element(nodeId)
+        if element is not None and element.desc != desc:
+            element.desc = desc
+            self._update_search_index(nodeId)
+            self._set_modified(nodeId)
+            self._record('set_desc', node=nodeId, desc=desc)
+
+    def update_book(self, bkId, novel):
+        """Update a book's metadata from a novel.
+
+        Return True, if the book is modified, otherwise return False.
+        """
+        book = self.books[bkId]
+        oldTitle = book.title
+        if not book.pull_metadata(novel):
+            return False
+
+        self._update_search_index(f'{BOOK_PREFIX}{bkId}')
+        self._set_modified(f'{BOOK_PREFIX}{bkId}')
+        self._record('update_book', node=f'{BOOK_PREFIX}{bkId}', title=book.title, desc=book.desc)
+        if book.title != oldTitle:
+            self._unindex_title(bkId, oldTitle)
+            self._index_title(bkId)
+            self.tree.item(f'{BOOK_PREFIX}{bkId}', text=book.title)
+        return True
+
+    def refresh_books(self, bkIds=None):
+        """Update the books' titles and descriptions from their project files.
+
+        Optional arguments:
+            bkIds -- list of book IDs; if None, refresh all books.
+
+        The project files are read in parallel, without loading the chapters and scenes.
+        If a metadata cache is set, only the changed project files are read.
+        Return a tuple: list of the IDs of the modified books, list of error messages.
+        """
+
+        def read_metadata(bkId):
+            try:
+                if self.metadataCache is not None:
+                    return self.metadataCache.get_metadata(self.books[bkId].filePath)
+
+                return read_project_metadata(self.books[bkId].filePath)
+
+            except Error as ex:
+                return str(ex)
+
+        if bkIds is None:
+            bkIds = list(self.books)
+        modifiedIds = []
+        messages = []
+        with ThreadPoolExecutor() as executor:
+            for bkId, metadata in zip(bkIds, executor.map(read_metadata, bkIds)):
+                if isinstance(metadata, str):
+                    messages.append(metadata)
+                    continue
+
+                book = self.books[bkId]
+                if book.title != metadata['title'] or book.desc != metadata['desc']:
+                    self.set_title(f'{BOOK_PREFIX}{bkId}', metadata['title'])
+                    self.set_desc(f'{BOOK_PREFIX}{bkId}', metadata['desc'])
+                    modifiedIds.append(bkId)
+        return modifiedIds, messages
+
+    def check_availability(self):
+        """Check whether the book files exist, using a pool of worker threads.
+
+        Block until all books are checked.
+        Return a list of the IDs of the missing books.
+        """
+        availabilityCheck = AvailabilityCheck(self.books)
+        availabilityCheck.start()
+        availabilityCheck.wait()
+        missingIds = []
+        for bkId, isAvailable in availabilityCheck.get_results():
+            self.set_availability(bkId, isAvailable)
+            if not isAvailable:
+                missingIds.append(bkId)
+        return missingIds
+
+    def set_availability(self, bkId, isAvailable):
+        """Mark a book as available or missing, and update the tree view.
+
+        Missing books are kept in the collection.
+        Only the 'missing' tag is changed, so the node keeps its other tags, e.g. a search highlight.
+        """
+        book = self.books.get(bkId, None)
+        if book is None:
+            return
+
+        book.isAvailable = isAvailable
+        nodeId = f'{BOOK_PREFIX}{bkId}'
+        tags = self.tree.item(nodeId, 'tags')
+        if tags is None:
+            # The node is not displayed; its tags are set when it is shown.
+            return
+
+        tags = set(tags)
+        if isAvailable:
+            tags.discard('missing')
+        else:
+            tags.add('missing')
+        self.tree.item(nodeId, tags=tuple(tags))
+
+    def get_node_options(self, nodeId):
+        """Return a dictionary with the tree view options of a book or series node."""
+        elemId = nodeId[2:]
+        if nodeId.startswith(BOOK_PREFIX):
+            book = self.books[elemId]
+            if book.isAvailable is False:
+                return dict(text=book.title, tags=('missing',), open=True)
+
+            return dict(text=book.title, open=True)
+
+        return dict(text=self.series[elemId].title, tags='series', open=True)
+
+    def move_node(self, nodeId, parent, index):
+        """Move a book or series to another parent and/or position.
+
+        Positional arguments:
+            nodeId -- str: tree node ID of the book or series.
+            parent -- str: new parent node ID; '' for the top level.
+            index -- int or 'end': new position among the parent's children.
+        """
+        self._move_element(nodeId, parent, index)
+        self._set_modified()
+        self._record('move', node=nodeId, parent=parent, index=self.tree.index(nodeId))
+
+    def is_modified(self):
+        """Return True, if the collection has changed since it was read or written."""
+        return bool(self._changes)
+
+    def get_modified_ids(self):
+        """Return a list of the node IDs of the modified books and series.
+
+        The tree structure is marked as modified by the empty string.
+        """
+        return list(self._changes)
+
+    def clear_modified(self, changeCount=None):
+        """Mark the collection as unmodified, e.g. after writing a snapshot.
+
+        Optional arguments:
+            changeCount -- int: change count of the snapshot written; 
+                           later changes remain marked as modified.
+        """
+        for nodeId, elementChange in list(self._changes.items()):
+            if changeCount is None or elementChange <= changeCount:
+                del self._changes[nodeId]
+                element = self._get_element(nodeId)
+                if element is not None:
+                    element.isModified = False
+
+    def get_book(self, bkId):
+        """Return the Book instance with the ID bkId, or None."""
+        return self.books.get(bkId, None)
+
+    def get_book_id_by_path(self, filePath):
+        """Return the ID of the book located at filePath, or None."""
+        return self._pathIndex.get(path_key(filePath), None)
+
+    def get_book_ids_by_title(self, title):
+        """Return a list of the IDs of the books with the given title."""
+        return list(self._titleIndex.get(title, []))
+
+    def set_statistics(self, bkId, statistics):
+        """Set a book's word, chapter, and scene counts, and update the roll-ups.
+
+        Positional arguments:
+            bkId -- str: book ID.
+            statistics -- dict with the STATISTICS_KEYS, or None, if unknown.
+
+        The statistics are not saved with the collection, so the collection is not modified.
+        """
+        book = self.books[bkId]
+        nodeId = f'{BOOK_PREFIX}{bkId}'
+        if book.statistics is not None:
+            self._roll_up(nodeId, book.statistics, -1)
+        book.statistics = statistics
+        if statistics is not None:
+            self._roll_up(nodeId, statistics)
+
+    def apply_statistics(self, results, filePaths):
+        """Set the statistics read by read_books_statistics().
+
+        Positional arguments:
+            results -- dict of statistics or error messages by book ID.
+            filePaths -- dict of the project paths by book ID that were read.
+
+        Books removed or relocated in the meantime are skipped.
+        Return a list of error messages.
+        """
+        messages = []
+        for bkId, statistics in results.items():
+            if isinstance(statistics, str):
+                messages.append(statistics)
+                continue
+
+            book = self.books.get(bkId, None)
+            if book is not None and book.filePath == filePaths[bkId]:
+                self.set_statistics(bkId, statistics)
+        return messages
+
+    def refresh_statistics(self, bkIds=None):
+        """Count the words, chapters, and scenes of the books, and update the roll-ups.
+
+        Optional arguments:
+            bkIds -- list of book IDs; if None, refresh all books.
+
+        The project files are read in parallel.
+        If a metadata cache is set, only the changed project files are read.
+        Return a list of error messages.
+        """
+        if bkIds is None:
+            bkIds = list(self.books)
+        filePaths = {bkId: self.books[bkId].filePath for bkId in bkIds}
+        return self.apply_statistics(read_books_statistics(filePaths, self.metadataCache), filePaths)
+
+    def get_statistics(self, nodeId=''):
+        """Return the statistics of a book, the roll-up of a series, or by default the collection's roll-up.
+
+        Return None for a book not counted yet.
+        """
+        if not nodeId:
+            return self.statistics
+
+        element = self._get_element(nodeId)
+        if element is None:
+            return None
+
+        return element.statistics
+
+    def export_statistics(self, filePath):
+        """Write the statistics of the books, series, and collection to a CSV file.
+
+        Positional arguments:
+            filePath -- str: path to the CSV file.
+
+        Return a message.
+        Raise the "Error" exception in case of error.
+        """
+        header = ['Type', 'Series', 'Title', 'Path', 'Books'] + list(STATISTICS_KEYS)
+
+        def row(elementType, seriesTitle, title, path, statistics):
+            values = [elementType, seriesTitle, title, path]
+            if statistics is None:
+                return values + [''] * (len(header) - len(values))
+
+            return values + [statistics.get('books', 1)] + [statistics[key] for key in STATISTICS_KEYS]
+
+        rows = []
+        for nodeId in self.tree.get_children(''):
+            if nodeId.startswith(SERIES_PREFIX):
+                series = self.series[nodeId[2:]]
+                rows.append(row('series', series.title, series.title, '', series.statistics))
+                for childId in self.tree.get_children(nodeId):
+                    book = self.books[childId[2:]]
+                    rows.append(row('book', series.title, book.title, book.filePath, book.statistics))
+            elif nodeId.startswith(BOOK_PREFIX):
+                book = self.books[nodeId[2:]]
+                rows.append(row('book', '', book.title, book.filePath, book.statistics))
+        rows.append(row('collection', '', self.title, self.filePath, self.statistics))
         try:
-            with open(filePath, 'w', encoding='utf-8') as f:
-                f.write(text)
-        except:
+            with open(filePath, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(rows)
+        except OSError:
             raise Error(f'{_("Cannot write file")}: "{norm_path(filePath)}".')
 
+        return f'"{norm_path(filePath)}" written.'
+
+    def search(self, query):
+        """Return a set of the IDs of the book and series nodes matching a query.
+
+        Positional arguments:
+            query -- str: search terms.
+
+        A node matches, if its title or description contains words 
+        beginning with all search terms, regardless of case.
+        The search index is built on the first search, and then kept up to date.
+        """
+        if self._searchIndex is None:
+            nodes = []
+            for bkId, book in self.books.items():
+                nodes.append((f'{BOOK_PREFIX}{bkId}', (book.title, book.desc)))
+            for srId, series in self.series.items():
+                nodes.append((f'{SERIES_PREFIX}{srId}', (series.title, series.desc)))
+            self._searchIndex = SearchIndex()
+            with self.stats.timer('build search index'):
+                self._searchIndex.build(nodes)
+        return self._searchIndex.search(query)
+
     def reset_tree(self):
-        """Clear the displayed tree."""
-        for child in self.tree.get_children(''):
-            self.tree.delete(child)
+        """Clear the tree and its view."""
+        self.tree.reset()
+
+    def _get_snapshot_nodes(self, elements, parent=''):
+        """Return a list of (node ID, parent node ID, fields) tuples made from snapshot elements.
+
+        The fields are dictionaries as generated by reading the written file,
+        i.e. empty texts are given as None.
+        """
+        nodes = []
+        for prefix, elementId, fields, children in elements:
+            nodeId = f'{prefix}{elementId}'
+            nodes.append((nodeId, parent, {tag: text or None for tag, text in fields}))
+            nodes.extend(self._get_snapshot_nodes(children, nodeId))
+        return nodes
+
+    def _get_storage(self, filePath):
+        """Return a storage instance for the file format, or raise the "Error" exception."""
+        if filePath is None:
+            raise Error(_('No collection file specified.'))
+
+        storage = get_storage(filePath, self.stats)
+        if storage is None:
+            raise Error(f'{_("File type is not supported")}: "{norm_path(filePath)}".')
+
+        return storage
+
+    def _read_other(self, filePath):
+        """Return a list of the (node ID, parent node ID, fields) tuples of another collection file.
+
+        Raise the "Error" exception in case of error.
+        """
+        storage = self._get_storage(filePath)
+        try:
+            return list(storage.read())
+
+        except Error:
+            raise
 
+        except:
+            raise Error(f'{_("Can not parse file")}: "{norm_path(filePath)}".')
+
+    def _add_element(self, nodeId, parent, fields, index='end'):
+        """Create a book or series, and insert its tree node.
+
+        Positional arguments:
+            nodeId -- str: tree node ID of the book or series.
+            parent -- str: parent node ID; '' for the top level.
+            fields -- dict: book path, title, and description, or series title and description.
+
+        Optional arguments:
+            index -- int or 'end': position among the parent's children.
+
+        Nodes that already exist, or whose parent does not exist, are skipped.
+        Return True, if the element is created.
+        """
+        if self.tree.exists(nodeId) or (parent and not self.tree.exists(parent)):
+            return False
+
+        elemId = nodeId[2:]
+        if nodeId.startswith(BOOK_PREFIX):
+            book = Book(fields['path'])
+            book.title = fields['title']
+            book.desc = fields['desc']
+            self._register_book(elemId, book)
+            self.tree.insert(parent, index, nodeId, text=book.title, open=True)
+        elif nodeId.startswith(SERIES_PREFIX):
+            self.series[elemId] = Series()
+            self.series[elemId].title = fields['title']
+            self.series[elemId].desc = fields['desc']
+            self.tree.insert(parent, index, nodeId, text=fields['title'], tags='series', open=True)
+            self._update_search_index(nodeId)
+        else:
+            return False
+
+        return True
+
+    def _apply_nodes(self, nodes):
+        """Make the collection match the nodes read from the file, changing only what differs.
+
+        Positional arguments:
+            nodes -- list of (node ID, parent node ID, fields) tuples, in tree order.
+
+        Return a dictionary with the numbers of the 'added', 'removed', 'moved', and 'changed' nodes.
+        """
+        newNodes = []
+        newParents = {}
+        newChildren = {'': []}
+        # Dictionary:
+        #   keyword -- parent node ID; '' for the top level
+        #   value -- list of the child node IDs in the file
+        for nodeId, parent, fields in nodes:
+            if nodeId in newParents or not parent in newChildren:
+                # Same as on reading: skip duplicates and orphans.
+                continue
+
+            newNodes.append((nodeId, parent, fields))
+            newParents[nodeId] = parent
+            newChildren[nodeId] = []
+            newChildren[parent].append(nodeId)
+        counts = dict(added=0, removed=0, moved=0, changed=0)
+        movedIds = set()
+
+        # Insert the new nodes, update the existing ones, and move the nodes that have a new parent.
+        # Parents precede their children, so the new parents are inserted first.
+        for nodeId, parent, fields in newNodes:
+            if not self.tree.exists(nodeId):
+                if self._add_element(nodeId, parent, fields):
+                    counts['added'] += 1
+                continue
+
+            if self._update_element(nodeId, fields):
+                counts['changed'] += 1
+            if self.tree.parent(nodeId) != parent:
+                self._move_element(nodeId, parent, 'end')
+                movedIds.add(nodeId)
+
+        # Delete the nodes not in the file. The books are deleted first,
+        # so the series left have no children.
+        for bkId in [bkId for bkId in self.books if not f'{BOOK_PREFIX}{bkId}' in newParents]:
+            self._unregister_book(bkId)
+            self.tree.delete(f'{BOOK_PREFIX}{bkId}')
+            counts['removed'] += 1
+        for srId in [srId for srId in self.series if not f'{SERIES_PREFIX}{srId}' in newParents]:
+            del self.series[srId]
+            self._update_search_index(f'{SERIES_PREFIX}{srId}')
+            self.tree.delete(f'{SERIES_PREFIX}{srId}')
+            counts['removed'] += 1
+
+        # Now the parents have the same children as in the file; restore their order.
+        # The longest sequence of children already in order stays in place; the others,
+        # including the children just moved from another parent, are moved behind their predecessors.
+        for parent, children in newChildren.items():
+            current = list(self.tree.get_children(parent))
+            if current == children:
+                continue
+
+            unmoved = _get_ordered_subset([nodeId for nodeId in current if not nodeId in movedIds], children)
+            for i, nodeId in enumerate(children):
+                if nodeId in unmoved:
+                    continue
+
+                current.remove(nodeId)
+                index = 0
+                if i > 0:
+                    index = current.index(children[i - 1]) + 1
+                current.insert(index, nodeId)
+                self.tree.move(nodeId, parent, index)
+                movedIds.add(nodeId)
+        counts['moved'] = len(movedIds)
+        return counts
+
+    def _update_element(self, nodeId, fields):
+        """Set the fields of an existing book or series, without marking it as modified.
+
+        Positional arguments:
+            nodeId -- str: tree node ID of the book or series.
+            fields -- dict: book path, title, and description, or series title and description.
+
+        Return True, if the element has changed.
+        """
+        element = self._get_element(nodeId)
+        isChanged = False
+        title = element.title
+        if nodeId.startswith(BOOK_PREFIX):
+            bkId = nodeId[2:]
+            if element.filePath != fields['path']:
+                pathKey = path_key(element.filePath)
+                if self._pathIndex.get(pathKey, None) == bkId:
+                    del self._pathIndex[pathKey]
+                element.filePath = fields['path']
+                self._pathIndex[path_key(element.filePath)] = bkId
+                self.set_statistics(bkId, None)
+                isChanged = True
+            if element.title != fields['title']:
+                self._unindex_title(bkId, element.title)
+                element.title = fields['title']
+                self._index_title(bkId)
+                isChanged = True
+        elif element.title != fields['title']:
+            element.title = fields['title']
+            isChanged = True
+        if element.title != title:
+            self.tree.item(nodeId, text=element.title)
+        if element.desc != fields['desc']:
+            element.desc = fields['desc']
+            isChanged = True
+        if isChanged:
+            self._update_search_index(nodeId)
+        return isChanged
+
+    def _move_element(self, nodeId, parent, index):
+        """Move a book or series in the tree, and update the roll-ups."""
+        statistics = None
+        if nodeId.startswith(BOOK_PREFIX):
+            statistics = self.books[nodeId[2:]].statistics
+        if statistics is not None:
+            self._roll_up(nodeId, statistics, -1)
+        self.tree.move(nodeId, parent, index)
+        if statistics is not None:
+            self._roll_up(nodeId, statistics)
+
+    def _record(self, op, **fields):
+        """Log a change in the journal, if any.
+
+        Positional arguments:
+            op -- str: name of the operation.
+
+        Keyword arguments are the operation's parameters.
+        """
+        if self.journal is None:
+            return
+
+        try:
+            self.journal.append(dict(op=op, **fields))
+        except Error:
+            self._drop_journal()
+
+    def _drop_journal(self):
+        """Stop logging, if the journal can not be written.
+
+        The changes are kept until the collection file is written.
+        """
+        self.journal.close()
+        self.journal = None
+
+    def _replay_journal(self):
+        """Apply the changes logged in the journal since the collection file was written.
+
+        If the file has been changed by another program since, the changes are applied
+        on top of the other program's changes. Records that do not apply are skipped.
+        The journal then continues with the records replayed, based on the current file.
+        Return the number of records replayed.
+        """
+        journal = self.journal
+        self.journal = None
+        records = []
+        try:
+            for record in journal.read():
+                try:
+                    self._apply_record(record)
+                except Exception:
+                    continue
+
+                records.append(record)
+        finally:
+            self.journal = journal
+        try:
+            self.journal.start(records)
+        except Error:
+            self._drop_journal()
+        return len(records)
+
+    def _apply_record(self, record):
+        """Apply a change logged in the journal."""
+        op = record['op']
+        nodeId = record['node']
+        if op in ('add_book', 'add_series'):
+            fields = dict(path=record.get('path', None), title=record['title'], desc=record.get('desc', None))
+            if not self._add_element(nodeId, record.get('parent', ''), fields, record['index']):
+                raise ValueError
+
+            self._set_modified(nodeId)
+            self._set_modified()
+        elif op == 'remove_book':
+            self.remove_book(nodeId)
+        elif op == 'remove_series':
+            self.remove_series(nodeId)
+        elif op == 'remove_series_with_books':
+            self.remove_series_with_books(nodeId)
+        elif op == 'move':
+            self.move_node(nodeId, record['parent'], record['index'])
+        elif op == 'set_title':
+            self.set_title(nodeId, record['title'])
+        elif op == 'set_desc':
+            self.set_desc(nodeId, record['desc'])
+        elif op == 'update_book':
+            self.set_title(nodeId, record['title'])
+            self.set_desc(nodeId, record['desc'])
+        else:
+            raise ValueError
+
+    def _get_element(self, nodeId):
+        """Return the Book or Series instance of a tree node, or None."""
+        if nodeId.startswith(BOOK_PREFIX):
+            return self.books.get(nodeId[2:], None)
+
+        if nodeId.startswith(SERIES_PREFIX):
+            return self.series.get(nodeId[2:], None)
+
+        return None
+
+    def _set_modified(self, nodeId=''):
+        """Mark a book or series as modified; by default, mark the tree structure."""
+        self._changeCount += 1
+        self._changes[nodeId] = self._changeCount
+        element = self._get_element(nodeId)
+        if element is not None:
+            element.isModified = True
+
+    def _reset_elements(self):
+        """Remove all books and series, and clear the indexes."""
+        self.books = {}
+        self.series = {}
+        self._changes = {}
+        self._pathIndex = {}
+        self._titleIndex = {}
+        self._searchIndex = None
+        self._lastBookId = 0
+        self.statistics = new_rollup()
+
+    def _new_book_id(self):
+        """Return an unused book ID."""
+        self._lastBookId += 1
+        return str(self._lastBookId)
+
+    def _register_book(self, bkId, book):
+        """Add a book to the books dictionary and to the indexes."""
+        self.books[bkId] = book
+        self._pathIndex[path_key(book.filePath)] = bkId
+        self._index_title(bkId)
+        self._update_search_index(f'{BOOK_PREFIX}{bkId}')
+        if bkId.isdigit():
+            self._lastBookId = max(self._lastBookId, int(bkId))
+
+    def _unregister_book(self, bkId):
+        """Remove a book from the books dictionary, from the indexes, and from the roll-ups."""
+        if self.books[bkId].statistics is not None:
+            self._roll_up(f'{BOOK_PREFIX}{bkId}', self.books[bkId].statistics, -1)
+        book = self.books.pop(bkId)
+        pathKey = path_key(book.filePath)
+        if self._pathIndex.get(pathKey, None) == bkId:
+            del self._pathIndex[pathKey]
+        self._unindex_title(bkId, book.title)
+        self._update_search_index(f'{BOOK_PREFIX}{bkId}')
+
+    def _roll_up(self, nodeId, statistics, sign=1):
+        """Add a book's statistics to the collection and to its series, or subtract them with sign=-1."""
+        add_statistics(self.statistics, statistics, sign)
+        parent = self.tree.parent(nodeId)
+        if parent:
+            add_statistics(self.series[parent[2:]].statistics, statistics, sign)
+
+    def _update_search_index(self, nodeId):
+        """Index the current title and description of a book or series, if the search index is built."""
+        if self._searchIndex is None:
+            return
+
+        element = self._get_element(nodeId)
+        if element is None:
+            self._searchIndex.remove(nodeId)
+        else:
+            self._searchIndex.add(nodeId, element.title, element.desc)
+
+    def _index_title(self, bkId):
+        self._titleIndex.setdefault(self.books[bkId].title, []).append(bkId)
+
+    def _unindex_title(self, bkId, title):
+        bookIds = self._titleIndex.get(title, [])
+        if bkId in bookIds:
+            bookIds.remove(bkId)
+            if not bookIds:
+                del self._titleIndex[title]
+
+
+def _get_ordered_subset(current, target):
+    """Return a set of the items of current that form the longest sequence in the same order as in target.
+
+    Positional arguments:
+        current -- list of items.
+        target -- list of the same items in another order.
+    """
+    positions = {item: i for i, item in enumerate(target)}
+    tails = []
+    # Target positions ending the longest ordered sequences found, by length.
+
+    tailItems = []
+    predecessors = {}
+    for item in current:
+        position = positions[item]
+        length = bisect_left(tails, position)
+        if length == len(tails):
+            tails.append(position)
+            tailItems.append(item)
+        else:
+            tails[length] = position
+            tailItems[length] = item
+        predecessors[item] = tailItems[length - 1] if length > 0 else None
+    ordered = set()
+    item = tailItems[-1] if tailItems else None
+    while item is not None:
+        ordered.add(item)
+        item = predecessors[item]
+    return ordered
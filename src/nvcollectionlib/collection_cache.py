@@ -0,0 +1,95 @@
+"""Provide a class for a binary cache of a collection file's content.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+import os
+import marshal
+
+from nvcollectionlib.collection_lock import get_file_version
+
+
+class CollectionCache:
+    """Binary sidecar copy of the books and series stored in a collection file.
+
+    The cache file is located next to the collection file.
+    It holds the collection's tree nodes in the marshal format,
+    which is loaded much faster than the collection file is parsed.
+    The cache identifies the collection file version it was made from,
+    by its modification time, size, and content hash.
+    A cache that does not match the collection file is regarded as outdated.
+
+    Public methods:
+        read() -- return the cached nodes, if the cache matches the collection file.
+        write(nodes) -- store the nodes of the current collection file.
+        remove() -- delete the cache file.
+
+    Public instance variables:
+        filePath -- str: path to the cache file.
+        collectionPath -- str: path to the collection file.
+    """
+    _FORMAT = 1
+    # Cache file format version.
+
+    def __init__(self, collectionPath):
+        """Initialize the instance variables.
+
+        Positional arguments:
+            collectionPath -- str: path to the collection file.
+        """
+        self.collectionPath = collectionPath
+        self.filePath = f'{collectionPath}.cache'
+
+    def read(self):
+        """Return a list of (node ID, parent node ID, fields) tuples, in tree order.
+
+        The fields are dictionaries, as generated by the storage classes' read() method.
+        Return None, if there is no cache, or if it is outdated or damaged.
+        """
+        try:
+            with open(self.filePath, 'rb') as f:
+                formatVersion, base, nodes = marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+        if formatVersion != self._FORMAT or base != self._get_base():
+            return None
+
+        return nodes
+
+    def write(self, nodes):
+        """Store the nodes of the current collection file.
+
+        Positional arguments:
+            nodes -- list of (node ID, parent node ID, fields) tuples, in tree order.
+
+        The cache is optional, so an outdated cache is removed
+        instead of raising an exception, if it cannot be written.
+        """
+        base = self._get_base()
+        if base is None:
+            self.remove()
+            return
+
+        tempPath = f'{self.filePath}.tmp'
+        try:
+            with open(tempPath, 'wb') as f:
+                f.write(marshal.dumps((self._FORMAT, base, list(nodes))))
+            os.replace(tempPath, self.filePath)
+        except (OSError, ValueError):
+            for filePath in (tempPath, self.filePath):
+                try:
+                    os.remove(filePath)
+                except OSError:
+                    pass
+
+    def remove(self):
+        try:
+            os.remove(self.filePath)
+        except OSError:
+            pass
+
+    def _get_base(self):
+        """Return a dictionary identifying the collection file version, or None."""
+        return get_file_version(self.collectionPath)
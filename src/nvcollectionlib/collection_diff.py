@@ -0,0 +1,196 @@
+"""Provide functions for comparing and merging two collections.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+from nvcollectionlib.nvcollection_globals import *
+
+DIFF_KEYS = ('added', 'removed', 'moved', 'retitled', 'changed')
+
+
+def match_nodes(ourNodes, theirNodes):
+    """Return a dictionary of our node IDs by their node IDs, for the books and series found in both collections.
+
+    Positional arguments:
+        ourNodes -- list of (node ID, parent node ID, fields) tuples, in tree order.
+        theirNodes -- list of (node ID, parent node ID, fields) tuples, in tree order.
+
+    Books with the same normalized path are the same, regardless of their IDs.
+    Books with the same ID but different paths are the same, if they have the same title.
+    Series are matched by their IDs.
+    """
+    ourFields = {}
+    ourPaths = {}
+    # Dictionary:
+    #   keyword -- normalized book path
+    #   value -- our book node ID
+    for nodeId, __, fields in ourNodes:
+        ourFields[nodeId] = fields
+        if nodeId.startswith(BOOK_PREFIX):
+            ourPaths[path_key(fields['path'])] = nodeId
+    matches = {}
+    matchedIds = set()
+    for nodeId, __, fields in theirNodes:
+        if nodeId.startswith(BOOK_PREFIX):
+            ourId = ourPaths.get(path_key(fields['path']), None)
+            if ourId is not None and not ourId in matchedIds:
+                matches[nodeId] = ourId
+                matchedIds.add(ourId)
+    for nodeId, __, fields in theirNodes:
+        if nodeId in matches or nodeId in matchedIds or not nodeId in ourFields:
+            continue
+
+        if nodeId.startswith(SERIES_PREFIX) or ourFields[nodeId]['title'] == fields['title']:
+            matches[nodeId] = nodeId
+            matchedIds.add(nodeId)
+    return matches
+
+
+def diff_nodes(ourNodes, theirNodes):
+    """Return the differences between two collections.
+
+    Positional arguments:
+        ourNodes -- list of (node ID, parent node ID, fields) tuples, in tree order.
+        theirNodes -- list of (node ID, parent node ID, fields) tuples, in tree order.
+
+    Return a dictionary with the DIFF_KEYS, describing how their collection differs from ours:
+        added -- list of their node IDs not found in our collection.
+        removed -- list of our node IDs not found in their collection.
+        moved -- list of (our node ID, our parent, their parent) tuples for the nodes in another series.
+        retitled -- list of (our node ID, our title, their title) tuples.
+        changed -- list of our node IDs with another path or description.
+    The books and series are matched by match_nodes(). Changes of the order within a series are not reported.
+    """
+    matches = match_nodes(ourNodes, theirNodes)
+    ours = {nodeId: (parent, fields) for nodeId, parent, fields in ourNodes}
+    diff = {key: [] for key in DIFF_KEYS}
+    for nodeId, parent, fields in theirNodes:
+        ourId = matches.get(nodeId, None)
+        if ourId is None:
+            diff['added'].append(nodeId)
+            continue
+
+        ourParent, ourFields = ours[ourId]
+        if parent:
+            parent = matches.get(parent, parent)
+        if parent != ourParent:
+            diff['moved'].append((ourId, ourParent, parent))
+        if fields['title'] != ourFields['title']:
+            diff['retitled'].append((ourId, ourFields['title'], fields['title']))
+        if fields.get('path', None) != ourFields.get('path', None) or fields['desc'] != ourFields['desc']:
+            diff['changed'].append(ourId)
+    matchedIds = set(matches.values())
+    diff['removed'] = [nodeId for nodeId in ours if not nodeId in matchedIds]
+    return diff
+
+
+def merge_collections(ourNodes, theirNodes):
+    """Return a list of (node ID, parent node ID, fields) tuples, merging their collection into ours.
+
+    Positional arguments:
+        ourNodes -- list of (node ID, parent node ID, fields) tuples, in tree order.
+        theirNodes -- list of (node ID, parent node ID, fields) tuples, in tree order.
+
+    The merged collection contains all of our books and series, and those of theirs not found in ours,
+    as matched by match_nodes(). Without a common base version, it cannot be told which side
+    changed an entry, so our titles, descriptions, paths, and positions are kept;
+    only the fields we have left empty are taken from their collection.
+    Their additions keep their IDs, if not used by us, and are inserted after the same predecessors
+    as in their collection. The time needed grows linearly with the number of books and series.
+    """
+    matches = match_nodes(ourNodes, theirNodes)
+    theirFields = {nodeId: fields for nodeId, __, fields in theirNodes}
+    usedIds = set()
+    nextIds = {BOOK_PREFIX: 1, SERIES_PREFIX: 1}
+    # Lowest numeric ID above all IDs in use, by node prefix.
+
+    children = {'': []}
+    # Dictionary:
+    #   keyword -- parent node ID
+    #   value -- list of our child node IDs, in our order
+
+    mergedNodes = {}
+    # Dictionary:
+    #   keyword -- merged node ID
+    #   value -- (parent, fields) tuple
+
+    for nodes in (ourNodes, theirNodes):
+        for prefix in nextIds:
+            numbers = [int(nodeId[2:]) for nodeId, __, __ in nodes if nodeId.startswith(prefix) and nodeId[2:].isdigit()]
+            if numbers:
+                nextIds[prefix] = max(nextIds[prefix], max(numbers) + 1)
+    for nodeId, parent, fields in ourNodes:
+        usedIds.add(nodeId)
+        mergedNodes[nodeId] = (parent, fields)
+        children.setdefault(parent, []).append(nodeId)
+        children.setdefault(nodeId, [])
+    for theirId, ourId in matches.items():
+        parent, fields = mergedNodes[ourId]
+        filledFields = {key: value for key, value in theirFields[theirId].items() if value is not None and fields.get(key, None) is None}
+        if filledFields:
+            mergedNodes[ourId] = (parent, dict(fields, **filledFields))
+
+    #--- Add their books and series not found in our collection.
+    ids = {}
+    # Dictionary:
+    #   keyword -- their node ID
+    #   value -- merged node ID
+
+    insertions = {}
+    # Dictionary:
+    #   keyword -- (merged parent node ID, merged predecessor node ID or None)
+    #   value -- list of the merged IDs of their nodes to be inserted after the predecessor
+
+    predecessors = {}
+    # Dictionary:
+    #   keyword -- merged parent node ID
+    #   value -- merged ID of the last node of their collection found below this parent
+
+    for nodeId, parent, fields in theirNodes:
+        mergedParent = ids.get(parent, '')
+        if nodeId in matches:
+            ids[nodeId] = matches[nodeId]
+            if mergedNodes[ids[nodeId]][0] != mergedParent:
+                # Their node is in another series in our collection.
+                continue
+
+        else:
+            if nodeId in usedIds:
+                ids[nodeId] = f'{nodeId[:2]}{nextIds[nodeId[:2]]}'
+                nextIds[nodeId[:2]] += 1
+            else:
+                ids[nodeId] = nodeId
+            usedIds.add(ids[nodeId])
+            mergedNodes[ids[nodeId]] = (mergedParent, fields)
+            children.setdefault(ids[nodeId], [])
+            insertions.setdefault((mergedParent, predecessors.get(mergedParent, None)), []).append(ids[nodeId])
+        predecessors[mergedParent] = ids[nodeId]
+
+    #--- Put the nodes in tree order.
+    result = []
+
+    def add_children(parent):
+        order = []
+        stack = list(reversed(insertions.get((parent, None), [])))
+        ourChildren = children.get(parent, [])
+        i = 0
+        while True:
+            if not stack:
+                if i == len(ourChildren):
+                    break
+
+                stack.append(ourChildren[i])
+                i += 1
+            nodeId = stack.pop()
+            order.append(nodeId)
+            stack.extend(reversed(insertions.get((parent, nodeId), [])))
+        return order
+
+    for nodeId in add_children(''):
+        parent, fields = mergedNodes[nodeId]
+        result.append((nodeId, parent, fields))
+        if nodeId.startswith(SERIES_PREFIX):
+            for childId in add_children(nodeId):
+                result.append((childId, nodeId, mergedNodes[childId][1]))
+    return result
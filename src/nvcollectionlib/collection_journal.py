@@ -0,0 +1,135 @@
+"""Provide a class for an append-only journal of collection changes.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+import os
+import json
+
+from nvcollectionlib.nvcollection_globals import *
+
+
+class CollectionJournal:
+    """Append-only log of the changes made to a collection since its file was written.
+
+    The journal is a JSON lines file next to the collection file.
+    The first line identifies the collection file version the changes apply to,
+    by its modification time and size. Each further line holds one change record.
+    A journal that does not match the collection file is regarded as outdated,
+    e.g. if another user has saved the collection in the meantime.
+    Its records are still returned, so the unsaved changes are not lost.
+
+    Public methods:
+        read() -- return the change records logged for the collection file.
+        start(records) -- begin a new journal on top of the collection file.
+        append(record) -- log a change.
+        close() -- close the journal file.
+
+    Public instance variables:
+        filePath -- str: path to the journal file.
+        collectionPath -- str: path to the collection file.
+        records -- list of the change records in the journal file.
+        isOutdated -- bool: True, if the journal last read was made for another collection file version.
+    """
+
+    def __init__(self, collectionPath):
+        """Initialize the instance variables.
+
+        Positional arguments:
+            collectionPath -- str: path to the collection file.
+        """
+        self.collectionPath = collectionPath
+        self.filePath = f'{collectionPath}.journal'
+        self.records = []
+        self.isOutdated = False
+        self._file = None
+
+    def read(self):
+        """Return a list of the change records logged for the collection file.
+
+        Return an empty list, if there is no journal.
+        If the journal was made for another version of the collection file, 
+        the records are returned nevertheless, and isOutdated is set.
+        A record damaged by an interrupted write ends the journal.
+        """
+        self.isOutdated = False
+        try:
+            with open(self.filePath, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            return []
+
+        try:
+            header = json.loads(lines[0])
+        except (IndexError, ValueError):
+            return []
+
+        self.isOutdated = header.get('base', None) != self._get_base()
+        records = []
+        for line in lines[1:]:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+
+        return records
+
+    def start(self, records=()):
+        """Begin a new journal on top of the current collection file.
+
+        Optional arguments:
+            records -- list of change records not yet contained in the collection file.
+
+        Raise the "Error" exception in case of error.
+        """
+        self.close()
+        self.records = list(records)
+        lines = [json.dumps(dict(base=self._get_base()))]
+        for record in self.records:
+            lines.append(json.dumps(record, ensure_ascii=False))
+        tempPath = f'{self.filePath}.tmp'
+        try:
+            with open(tempPath, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines))
+                f.write('\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tempPath, self.filePath)
+            self._file = open(self.filePath, 'a', encoding='utf-8')
+        except OSError:
+            raise Error(f'{_("Cannot write file")}: "{norm_path(self.filePath)}".')
+
+    def append(self, record):
+        """Log a change record, and flush it to disk.
+
+        Positional arguments:
+            record -- dict: change record with the operation as 'op' entry.
+
+        Raise the "Error" exception in case of error.
+        """
+        if self._file is None:
+            self.start(self.records)
+        try:
+            self._file.write(json.dumps(record, ensure_ascii=False))
+            self._file.write('\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError:
+            raise Error(f'{_("Cannot write file")}: "{norm_path(self.filePath)}".')
+
+        self.records.append(record)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _get_base(self):
+        """Return a dictionary identifying the collection file version, or None."""
+        try:
+            stat = os.stat(self.collectionPath)
+        except OSError:
+            return None
+
+        return dict(mtime=stat.st_mtime_ns, size=stat.st_size)
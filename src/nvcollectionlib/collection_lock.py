@@ -0,0 +1,183 @@
+"""Provide a lock file and version checks for collection files shared by several users.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+import os
+import time
+import socket
+import hashlib
+import threading
+
+from nvcollectionlib.nvcollection_globals import *
+
+_CHUNK_SIZE = 1 << 20
+
+
+class CollectionChangedError(Error):
+    """The collection file has been changed by another program since it was read or written."""
+    pass
+
+
+class CollectionLockedError(Error):
+    """The collection file is locked by another owner."""
+    pass
+
+
+def get_file_version(filePath):
+    """Return a dictionary identifying the file's version by modification time, size, and content hash.
+
+    Return None, if the file cannot be read.
+    """
+    try:
+        stat = os.stat(filePath)
+        fileHash = hashlib.blake2b(digest_size=16)
+        with open(filePath, 'rb') as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+                fileHash.update(chunk)
+    except OSError:
+        return None
+
+    return dict(mtime=stat.st_mtime_ns, size=stat.st_size, hash=fileHash.hexdigest())
+
+
+def is_file_changed(filePath, version):
+    """Return True, if the file is not the version given.
+
+    Positional arguments:
+        filePath -- str: path to the file.
+        version -- dict, as returned by get_file_version().
+
+    The content hash is compared only if the modification time or size differ,
+    so a file touched without changes is regarded as unchanged.
+    A file that no longer exists is regarded as unchanged, because it can be written.
+    """
+    try:
+        stat = os.stat(filePath)
+    except OSError:
+        return False
+
+    if stat.st_mtime_ns == version['mtime'] and stat.st_size == version['size']:
+        return False
+
+    currentVersion = get_file_version(filePath)
+    if currentVersion is None:
+        return False
+
+    return currentVersion['hash'] != version['hash']
+
+
+class CollectionLock:
+    """Lock file preventing several users from writing a collection file at the same time.
+
+    The lock file is located next to the collection file, and holds the host name and process ID
+    of its owner. Unlike operating system locks, lock files also work on network drives.
+    While the lock is held, the lock file's modification time is refreshed every REFRESH_SECONDS
+    by a background thread, so a slow write does not lose the lock.
+    A lock file not refreshed for STALE_SECONDS is regarded as left over by a crashed program, and is removed.
+    The lock can be used as a context manager.
+
+    Public methods:
+        acquire() -- create the lock file, waiting for another owner's lock to be released.
+        release() -- remove the lock file.
+
+    Public instance variables:
+        filePath -- str: path to the lock file.
+    """
+    STALE_SECONDS = 60
+    REFRESH_SECONDS = 10
+    RETRY_SECONDS = 0.1
+    TIMEOUT = 10
+
+    def __init__(self, collectionPath, timeout=TIMEOUT):
+        """Initialize the instance variables.
+
+        Positional arguments:
+            collectionPath -- str: path to the collection file.
+
+        Optional arguments:
+            timeout -- float: seconds to wait for another owner's lock; 0 for a single attempt.
+        """
+        self.filePath = f'{collectionPath}.lock'
+        self._timeout = timeout
+        self._isLocked = False
+        self._stopRefresh = None
+        # threading.Event ending the refresh of the lock file's modification time.
+
+    def acquire(self):
+        """Create the lock file.
+
+        Raise the "CollectionLockedError" exception, if the collection stays locked by another owner.
+        Raise the "Error" exception, if the lock file cannot be created.
+        """
+        startTime = time.monotonic()
+        while True:
+            try:
+                fd = os.open(self.filePath, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self._remove_stale_lock():
+                    continue
+
+                if time.monotonic() - startTime > self._timeout:
+                    raise CollectionLockedError(f'{_("Collection is locked by")} {self._get_owner()}: "{norm_path(self.filePath)}".')
+
+                time.sleep(self.RETRY_SECONDS)
+                continue
+
+            except OSError:
+                raise Error(f'{_("Cannot create lock file")}: "{norm_path(self.filePath)}".')
+
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(f'{socket.gethostname()} {os.getpid()}')
+            self._isLocked = True
+            self._stopRefresh = threading.Event()
+            threading.Thread(target=self._refresh, args=(self._stopRefresh,), daemon=True).start()
+            return
+
+    def release(self):
+        if not self._isLocked:
+            return
+
+        self._isLocked = False
+        self._stopRefresh.set()
+        self._stopRefresh = None
+        try:
+            os.remove(self.filePath)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.release()
+
+    def _get_owner(self):
+        try:
+            with open(self.filePath, 'r', encoding='utf-8') as f:
+                return f.read().strip()
+
+        except OSError:
+            return '?'
+
+    def _refresh(self, stopRefresh):
+        """Touch the lock file every REFRESH_SECONDS, until stopRefresh is set."""
+        while not stopRefresh.wait(self.REFRESH_SECONDS):
+            try:
+                os.utime(self.filePath)
+            except OSError:
+                pass
+
+    def _remove_stale_lock(self):
+        """Remove the lock file, if it has not been refreshed for STALE_SECONDS. Return True, if removed."""
+        try:
+            if time.time() - os.path.getmtime(self.filePath) < self.STALE_SECONDS:
+                return False
+
+            os.remove(self.filePath)
+        except OSError:
+            return False
+
+        return True
@@ -5,6 +5,9 @@ For further information see https://github.com/peter88213/novelyst_collection
 License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
 """
 import os
+import cProfile
+import pstats
+from concurrent.futures import ThreadPoolExecutor
 import tkinter as tk
 from tkinter import filedialog
 from tkinter import messagebox
@@ -12,17 +15,57 @@ from tkinter import ttk
 from novelystlib.widgets.index_card import IndexCard
 from nvcollectionlib.nvcollection_globals import *
 from nvcollectionlib.collection import Collection
+from nvcollectionlib.collection_stats import CollectionStats
+from nvcollectionlib.collection_journal import CollectionJournal
+from nvcollectionlib.collection_cache import CollectionCache
+from nvcollectionlib.collection_lock import CollectionChangedError
+from nvcollectionlib.collection_lock import CollectionLockedError
+from nvcollectionlib.collection_storage import get_file_types
+from nvcollectionlib.content_index import ContentIndex
+from nvcollectionlib.content_index import ContentIndexer
+from nvcollectionlib.book_statistics import read_books_statistics
+from nvcollectionlib.content_search_window import ContentSearchWindow
 from nvcollectionlib.configuration import Configuration
+from nvcollectionlib.metadata_cache import MetadataCache
+from nvcollectionlib.availability_check import AvailabilityCheck
+from nvcollectionlib.lazy_tree_view import LazyTreeView
+from nvcollectionlib.project_import import ProjectImporter
+from nvcollectionlib.project_import import get_series_folder
 
 SETTINGS = dict(
     last_open='',
     tree_width='300',
+    autosave_delay='10',
+)
+OPTIONS = dict(
+    lazy_tree=False,
+    show_timings=False,
+    profile=False,
+    keep_backup=True,
+    autosave=True,
+    journal=False,
+    snapshot_cache=False,
+    content_index=False,
+    statistics=False,
 )
-OPTIONS = {}
 
 
 class CollectionManager(tk.Toplevel):
     _KEY_QUIT_PROGRAM = ('<Control-q>', 'Ctrl-Q')
+    _POLL_INTERVAL = 200
+    # Milliseconds between checks of background tasks.
+
+    _JOURNAL_LIMIT = 1000
+    # Number of journal records that causes the collection file to be written.
+
+    _LOCK_RETRY_INTERVAL = 1000
+    # Milliseconds between attempts to save a collection locked by another user.
+
+    _HIGHLIGHT_LIMIT = 1000
+    # Maximum number of search matches highlighted in the tree view.
+
+    _LOAD_BATCH_SIZE = 1000
+    # Number of books and series loaded into the tree between two updates of the window.
 
     def __init__(self, ui, position, configDir):
         self._ui = ui
@@ -34,16 +77,40 @@ class CollectionManager(tk.Toplevel):
         self.configuration.read(self.iniFile)
         self.kwargs = {}
         self.kwargs.update(self.configuration.settings)
+        self.kwargs.update(self.configuration.options)
         # Read the file path from the configuration file.
 
+        #--- Start profiling the session, if configured.
+        self._profileFile = f'{configDir}/collection_profile.txt'
+        self._profiler = None
+        if self.kwargs['profile']:
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError:
+                # Another profiler is active.
+                self._profiler = None
+
+        self.stats = CollectionStats()
+        # Timers of the collection manager's open and close paths.
+
+        #--- Load the project metadata cache.
+        self._metadataCache = MetadataCache(f'{configDir}/collection_cache.json')
+        self._metadataCache.read()
+
+        #--- Set up the manuscript content index.
+        self._contentIndex = ContentIndex(f'{configDir}/collection_content.db')
+        self._contentIndexer = None
+        self._contentSearchWindow = None
+
         self.title(PLUGIN)
         self._statusText = ''
 
         self.geometry(position)
         self.lift()
         self.focus()
-        self.protocol("WM_DELETE_WINDOW", self.on_quit)
-        self.bind(self._KEY_QUIT_PROGRAM[0], self.on_quit)
+        self.protocol("WM_DELETE_WINDOW", self._request_quit)
+        self.bind(self._KEY_QUIT_PROGRAM[0], self._request_quit)
 
         #--- Main menu.
         self.mainMenu = tk.Menu(self)
@@ -53,19 +120,40 @@ class CollectionManager(tk.Toplevel):
         self.mainWindow = ttk.Frame(self)
         self.mainWindow.pack(fill='both', padx=2, pady=2, expand=True)
 
+        #--- Search bar above the tree.
+        self.searchBar = ttk.Frame(self.mainWindow)
+        self.searchBar.pack(fill='x', pady=2)
+        ttk.Label(self.searchBar, text=_('Search')).pack(side='left', padx=2)
+        self._searchText = tk.StringVar()
+        self.searchEntry = ttk.Entry(self.searchBar, textvariable=self._searchText)
+        self.searchEntry.pack(side='left', fill='x', expand=True, padx=2)
+        self._matches = set()
+        # IDs of the nodes matching the search terms.
+
+        self._orderedMatches = None
+        # List of the matching node IDs in tree order, created on demand.
+
+        self._highlighted = set()
+        # IDs of the nodes tagged as matches in the tree view.
+
         #--- Paned window displaying the tree and an "index card".
         self.treeWindow = ttk.Panedwindow(self.mainWindow, orient='horizontal')
         self.treeWindow.pack(fill='both', expand=True)
 
         #--- The collection itself.
         self.collection = None
-        self._fileTypes = [(_('novelyst collection'), '.pwc')]
+        self._fileTypes = get_file_types()
 
         #--- Tree for book selection.
         self.treeView = ttk.Treeview(self.treeWindow, selectmode='browse')
         scrollY = ttk.Scrollbar(self.treeView, orient='vertical', command=self.treeView.yview)
         self.treeView.configure(yscrollcommand=scrollY.set)
         scrollY.pack(side='right', fill='y')
+        if self.kwargs['lazy_tree']:
+            # Populate the tree view on demand.
+            self._view = LazyTreeView(self.treeView, scrollY.set)
+        else:
+            self._view = self.treeView
         self.treeView.pack(side='left')
         self.treeWindow.add(self.treeView)
         self.treeView.bind('<<TreeviewSelect>>', self._on_select_node)
@@ -75,11 +163,14 @@ class CollectionManager(tk.Toplevel):
         self.treeView.bind('<Delete>', self._remove_node)
         self.treeView.bind('<Shift-Delete>', self._remove_series_with_books)
         self.treeView.bind('<Alt-B1-Motion>', self._move_node)
+        self.treeView.tag_configure('match', background='yellow')
 
         #--- "Index card" in the right frame.
         self.indexCard = IndexCard(self.treeWindow, bd=2, relief='ridge')
         self.indexCard.pack(side='right')
         self.treeWindow.add(self.indexCard)
+        self.statisticsLabel = tk.Label(self.indexCard, text='', anchor='w', justify='left', padx=5, pady=2)
+        self.statisticsLabel.pack(side='bottom', fill='x')
 
         # Adjust the tree width.
         self.treeWindow.update()
@@ -99,9 +190,15 @@ class CollectionManager(tk.Toplevel):
         self.mainMenu.add_cascade(label=_('File'), menu=self.fileMenu)
         self.fileMenu.add_command(label=_('New'), command=self._new_collection)
         self.fileMenu.add_command(label=_('Open...'), command=lambda: self._open_collection(''))
+        self.fileMenu.add_command(label=_('Reload from disk'), command=self._reload_collection)
+        self.fileMenu.entryconfig(_('Reload from disk'), state='disabled')
         self.fileMenu.add_command(label=_('Close'), command=self._close_collection)
         self.fileMenu.entryconfig(_('Close'), state='disabled')
-        self.fileMenu.add_command(label=_('Exit'), accelerator=self._KEY_QUIT_PROGRAM[1], command=self.on_quit)
+        self.fileMenu.add_command(label=_('Export...'), command=self._export_collection)
+        self.fileMenu.entryconfig(_('Export...'), state='disabled')
+        self.fileMenu.add_command(label=_('Export statistics...'), command=self._export_statistics)
+        self.fileMenu.entryconfig(_('Export statistics...'), state='disabled')
+        self.fileMenu.add_command(label=_('Exit'), accelerator=self._KEY_QUIT_PROGRAM[1], command=self._request_quit)
 
         # Series menu.
         self.seriesMenu = tk.Menu(self.mainMenu, tearoff=0)
@@ -116,11 +213,47 @@ class CollectionManager(tk.Toplevel):
         self.bookMenu.add_command(label=_('Add current project to the collection'), command=self._add_current_project)
         self.bookMenu.add_command(label=_('Remove selected book from the collection'), command=self._remove_book)
         self.bookMenu.add_command(label=_('Update book data from the current project'), command=self._update_book)
+        self.bookMenu.add_command(label=_('Update all books from their project files'), command=self._refresh_books)
+        self.bookMenu.add_command(label=_('Update statistics'), command=self._update_statistics)
+        self.bookMenu.add_separator()
+        self.bookMenu.add_command(label=_('Import projects from a folder...'), command=self._import_projects)
+        self.bookMenu.add_command(label=_('Import projects from a folder as series...'), command=lambda: self._import_projects(asSeries=True))
+        self.bookMenu.add_separator()
+        self.bookMenu.add_command(label=_('Update manuscript index'), command=self._update_content_index)
+        self.bookMenu.add_command(label=_('Search manuscripts...'), command=self._search_content)
 
         #--- Event bindings.
         self.bind('<Escape>', self._restore_status)
+        self.bind('<Escape>', self._cancel_open, add='+')
+        self._searchText.trace_add('write', self._search)
+        self.searchEntry.bind('<Return>', self._next_match)
+        self.searchEntry.bind('<Shift-Return>', lambda event: self._next_match(step=-1))
+        self.searchEntry.bind('<Escape>', self._clear_search)
+        self.bind('<Control-f>', lambda event: self.searchEntry.focus_set())
+
+        self._autosaveJob = None
+        # ID of the scheduled autosave, if any.
 
-        self.isModified = False
+        self._saveExecutor = ThreadPoolExecutor(max_workers=1)
+        self._saveFuture = None
+        # Future of the save running in the background, if any.
+
+        self._saveSnapshot = None
+        # Snapshot being saved in the background, if any.
+
+        self._saveRetryJob = None
+        # ID of the scheduled retry of a save blocked by another user's lock, if any.
+
+        self._statisticsExecutor = ThreadPoolExecutor(max_workers=1)
+        self._statisticsFuture = None
+        # Future of the book counting running in the background, if any.
+
+        self._loadingCollection = None
+        # Collection being opened in the background, if any.
+
+        self._isQuitting = False
+        self._importer = None
+        self._availabilityCheck = None
         self._element = None
         self._nodeId = None
         if self._open_collection(self.kwargs['last_open']):
@@ -129,6 +262,7 @@ class CollectionManager(tk.Toplevel):
     #--- Application related methods.
 
     def on_quit(self, event=None):
+        self._cancel_open()
         self._get_element_view()
         self.kwargs['tree_width'] = self.treeWindow.sashpos(0)
 
@@ -139,25 +273,213 @@ class CollectionManager(tk.Toplevel):
             elif keyword in self.configuration.settings:
                 self.configuration.settings[keyword] = self.kwargs[keyword]
         self.configuration.write(self.iniFile)
+        self._cancel_autosave()
+        self._wait_for_save()
+        self._saveExecutor.shutdown(wait=False)
+        self._statisticsExecutor.shutdown(wait=False, cancel_futures=True)
         try:
+            self._metadataCache.write()
             if self.collection is not None:
-                if self.isModified:
+                if self.collection.is_modified():
                     self.collection.write()
+                if self.collection.journal is not None:
+                    self.collection.journal.close()
         except Exception as ex:
             self._show_info(str(ex))
         finally:
+            self._write_profile()
             self.destroy()
             self.isOpen = False
 
+    def _request_quit(self, event=None):
+        """Write the collection in the background, and quit when done.
+
+        The window stays responsive while a large collection is written.
+        """
+        if self._isQuitting:
+            return
+
+        self._isQuitting = True
+        self._cancel_open()
+        self._get_element_view()
+        self._cancel_autosave()
+        if self._saveFuture is None and self.collection is not None and self.collection.is_modified():
+            self._start_save()
+        if self._saveFuture is not None:
+            self._show_status(f'{_("Saving")}...')
+        self._check_quit()
+
+    def _check_quit(self):
+        """Quit when the background save is done."""
+        if self._saveFuture is not None or self._saveRetryJob is not None:
+            self.after(self._POLL_INTERVAL, self._check_quit)
+            return
+
+        self.on_quit()
+
+    def _schedule_autosave(self):
+        """Save the collection in the background, when there are no more changes for a while.
+
+        Every change restarts the delay, so a series of edits is saved at once.
+        If there is a journal, the changes are already saved there,
+        so the collection file is written only when the journal has grown large.
+        """
+        if self.collection is None:
+            return
+
+        if self.collection.journal is not None:
+            if len(self.collection.journal.records) < self._JOURNAL_LIMIT:
+                return
+
+        elif not self.kwargs['autosave']:
+            return
+
+        self._cancel_autosave()
+        try:
+            delay = int(float(self.kwargs['autosave_delay']) * 1000)
+        except ValueError:
+            delay = int(float(SETTINGS['autosave_delay']) * 1000)
+        self._autosaveJob = self.after(delay, self._autosave)
+
+    def _cancel_autosave(self):
+        if self._autosaveJob is not None:
+            self.after_cancel(self._autosaveJob)
+            self._autosaveJob = None
+        if self._saveRetryJob is not None:
+            self.after_cancel(self._saveRetryJob)
+            self._saveRetryJob = None
+
+    def _autosave(self):
+        """Write a snapshot of the collection in a worker thread, if modified."""
+        self._autosaveJob = None
+        self._saveRetryJob = None
+        if self.collection is None:
+            return
+
+        if self._saveFuture is not None:
+            # The previous save is still running.
+            self._schedule_autosave()
+            return
+
+        self._get_element_view()
+        self._cancel_autosave()
+        if not self.collection.is_modified():
+            return
+
+        self._start_save()
+
+    def _start_save(self):
+        """Write a snapshot of the collection in a worker thread."""
+        snapshot = self.collection.snapshot()
+        self._saveSnapshot = snapshot
+        self._saveFuture = self._saveExecutor.submit(self.collection.write_snapshot, snapshot)
+        self.after(self._POLL_INTERVAL, self._check_autosave, self._saveFuture, self.collection, snapshot)
+
+    def _check_autosave(self, future, collection, snapshot):
+        """Mark the saved changes as unmodified when the background save is done."""
+        if not future.done():
+            self.after(self._POLL_INTERVAL, self._check_autosave, future, collection, snapshot)
+            return
+
+        if future is not self._saveFuture:
+            # The save has already been completed by _wait_for_save().
+            return
+
+        self._saveFuture = None
+        self._saveSnapshot = None
+        try:
+            future.result()
+        except CollectionChangedError:
+            # Another user has saved the collection in the meantime.
+            if collection is self.collection and self._merge_file():
+                self._autosave()
+        except CollectionLockedError as ex:
+            # Another user is saving the collection; try again without blocking the window.
+            if collection is self.collection:
+                self._show_status(f'{str(ex)} {_("Retrying")}...')
+                self._saveRetryJob = self.after(self._LOCK_RETRY_INTERVAL, self._autosave)
+        except Exception as ex:
+            # Also report unexpected errors, because this runs as a Tk callback.
+            self._set_info_how(f'!{str(ex)}')
+        else:
+            if collection is self.collection:
+                collection.commit_snapshot(snapshot)
+
+    def _merge_file(self):
+        """Merge the changes saved by another user, and refresh the view.
+
+        Return True on success, otherwise return False.
+        """
+        self._get_element_view()
+        try:
+            message = self.collection.merge_file()
+        except Error as ex:
+            self._set_info_how(f'!{str(ex)}')
+            return False
+
+        self._refresh_element_view()
+        self._set_info_how(message)
+        return True
+
+    def _wait_for_save(self):
+        """Block until the background save is done, if any.
+
+        If the save has succeeded, the saved changes are marked as unmodified,
+        so they are not written again.
+        """
+        if self._saveFuture is None:
+            return
+
+        try:
+            self._saveFuture.result()
+        except Exception:
+            pass
+        else:
+            if self.collection is not None:
+                self.collection.commit_snapshot(self._saveSnapshot)
+        self._saveFuture = None
+        self._saveSnapshot = None
+
+    def _write_profile(self):
+        """Stop profiling, and write the report sorted by cumulative time."""
+        if self._profiler is None:
+            return
+
+        self._profiler.disable()
+        try:
+            with open(self._profileFile, 'w', encoding='utf-8') as f:
+                pstats.Stats(self._profiler, stream=f).sort_stats('cumulative').print_stats()
+        except OSError:
+            pass
+        self._profiler = None
+
+    def _show_timings(self):
+        """Put the timers and counters of the last operation on the status bar, if configured."""
+        if not self.kwargs['show_timings']:
+            return
+
+        summaries = [self.stats.summary()]
+        if self.collection is not None:
+            summaries.append(self.collection.stats.summary())
+        self._show_status('; '.join(summary for summary in summaries if summary))
+
     def _on_select_node(self, event=None):
+        if self.collection is None:
+            return
+
         self._get_element_view()
         try:
-            self._nodeId = self.collection.tree.selection()[0]
-            elemId = self._nodeId[2:]
-            if self._nodeId.startswith(BOOK_PREFIX):
+            nodeId = self.treeView.selection()[0]
+            elemId = nodeId[2:]
+            if nodeId.startswith(BOOK_PREFIX):
                 self._element = self.collection.books[elemId]
-            elif self._nodeId.startswith(SERIES_PREFIX):
+            elif nodeId.startswith(SERIES_PREFIX):
                 self._element = self.collection.series[elemId]
+            else:
+                # Placeholder node.
+                return
+
+            self._nodeId = nodeId
         except IndexError:
             pass
         except AttributeError:
@@ -172,21 +494,125 @@ class CollectionManager(tk.Toplevel):
             self.indexCard.bodyBox.set_text(self._element.desc)
         if self._element.title:
             self.indexCard.title.set(self._element.title)
+        self._show_statistics()
+
+    def _show_statistics(self):
+        """Show the selected element's statistics, or the collection's statistics, below the index card."""
+        if self.collection is None:
+            self.statisticsLabel.config(text='')
+            return
+
+        statistics = self.collection.get_statistics(self._nodeId or '')
+        if statistics is None:
+            self.statisticsLabel.config(text='')
+            return
+
+        text = (f'{_("Words")}: {statistics["words"]} | '
+                f'{_("Chapters")}: {statistics["chapters"]} | '
+                f'{_("Scenes")}: {statistics["scenes"]} | '
+                f'{_("Unused scenes")}: {statistics["unusedScenes"]}')
+        if 'books' in statistics:
+            text = f'{_("Books")}: {statistics["books"]} | {text}'
+        self.statisticsLabel.config(text=text)
 
     def _get_element_view(self, event=None):
-        """Apply changes."""
+        """Apply changes.
+
+        The search index is updated by the collection, so the search is repeated.
+        """
+        isChanged = False
         try:
             title = self.indexCard.title.get()
             if title or self._element.title:
                 if self._element.title != title:
-                    self._element.title = title.strip()
-                    self.collection.tree.item(self._nodeId, text=self._element.title)
-                    self.isModified = True
+                    self.collection.set_title(self._nodeId, title.strip())
+                    self._schedule_autosave()
+                    isChanged = True
             if self.indexCard.bodyBox.hasChanged:
-                self._element.desc = self.indexCard.bodyBox.get_text()
-                self.isModified = True
+                self.collection.set_desc(self._nodeId, self.indexCard.bodyBox.get_text())
+                self._schedule_autosave()
+                isChanged = True
         except AttributeError:
             pass
+        if isChanged and self._searchText.get().strip():
+            self._search()
+
+    #--- Search related methods.
+
+    def _search(self, *args):
+        """Highlight the books and series matching the search terms, as the user types."""
+        self._orderedMatches = None
+        self._matches = set()
+        if self.collection is not None and self._searchText.get().strip():
+            self._matches = self.collection.search(self._searchText.get())
+            if self._matches:
+                self._set_info_how(f'{len(self._matches)} {_("matches")}.')
+            else:
+                self._set_info_how(f'!{_("No matches")}.')
+        else:
+            self._restore_status()
+        if len(self._matches) <= self._HIGHLIGHT_LIMIT:
+            self._highlight(self._matches)
+        else:
+            self._highlight(set())
+
+    def _next_match(self, event=None, step=1):
+        """Select the next matching node in tree order, displaying it if necessary.
+
+        Optional arguments:
+            step -- int: 1 for the next match, -1 for the previous one.
+        """
+        if not self._matches:
+            return 'break'
+
+        if self._orderedMatches is None:
+            self._orderedMatches = []
+            tree = self.collection.tree
+            for nodeId in tree.get_children(''):
+                if nodeId in self._matches:
+                    self._orderedMatches.append(nodeId)
+                for childId in tree.get_children(nodeId):
+                    if childId in self._matches:
+                        self._orderedMatches.append(childId)
+        try:
+            index = self._orderedMatches.index(self.treeView.selection()[0]) + step
+        except (IndexError, ValueError):
+            index = 0 if step > 0 else -1
+        nodeId = self._orderedMatches[index % len(self._orderedMatches)]
+        if self._view is not self.treeView:
+            self._view.show(nodeId)
+        self._tag_match(nodeId, True)
+        self.treeView.see(nodeId)
+        self.treeView.selection_set(nodeId)
+        return 'break'
+
+    def _clear_search(self, event=None):
+        self._searchText.set('')
+        self.treeView.focus_set()
+
+    def _highlight(self, nodeIds):
+        """Tag the displayed nodes as matches, and remove the tag from the other ones."""
+        for nodeId in self._highlighted - nodeIds:
+            self._tag_match(nodeId, False)
+        for nodeId in nodeIds - self._highlighted:
+            if self.treeView.exists(nodeId):
+                self._tag_match(nodeId, True)
+
+    def _tag_match(self, nodeId, isMatch):
+        """Add or remove the 'match' tag, keeping the node's other tags."""
+        try:
+            tags = set(self.treeView.item(nodeId, 'tags'))
+        except tk.TclError:
+            self._highlighted.discard(nodeId)
+            return
+
+        if isMatch:
+            tags.add('match')
+            self._highlighted.add(nodeId)
+        else:
+            tags.discard('match')
+            self._highlighted.discard(nodeId)
+        self.treeView.item(nodeId, tags=tuple(tags))
 
     def _show_info(self, message):
         if message.startswith('!'):
@@ -234,34 +660,49 @@ class CollectionManager(tk.Toplevel):
 
     def _move_node(self, event):
         """Move a selected node in the collection tree."""
+        if self.collection is None:
+            return
+
         tv = event.widget
         node = tv.selection()[0]
         targetNode = tv.identify_row(event.y)
+        tree = self.collection.tree
         if node[:2] == targetNode[:2]:
-            tv.move(node, tv.parent(targetNode), tv.index(targetNode))
-            self.isModified = True
+            self.collection.move_node(node, tree.parent(targetNode), tree.index(targetNode))
+            self._schedule_autosave()
         elif node.startswith(BOOK_PREFIX) and targetNode.startswith(SERIES_PREFIX):
-            if tv.get_children(targetNode):
-                tv.move(node, tv.parent(targetNode), tv.index(targetNode))
+            if tree.get_children(targetNode):
+                self.collection.move_node(node, tree.parent(targetNode), tree.index(targetNode))
             else:
-                tv.move(node, targetNode, 0)
-            self.isModified = True
+                self.collection.move_node(node, targetNode, 0)
+            self._schedule_autosave()
 
     #--- Project related methods.
 
     def _open_book(self, event=None):
         """Make the application open the selected book's project."""
+        if self.collection is None:
+            return
+
         try:
-            nodeId = self.collection.tree.selection()[0]
+            nodeId = self.treeView.selection()[0]
             if nodeId.startswith(BOOK_PREFIX):
                 bkId = nodeId[2:]
-                self._ui.open_project(self.collection.books[bkId].filePath)
+                book = self.collection.books[bkId]
+                if book.isAvailable is False:
+                    self._set_info_how(f'!"{norm_path(book.filePath)}" not found.')
+                    return
+
+                self._ui.open_project(book.filePath)
         except IndexError:
             pass
 
     def _add_current_project(self, event=None):
+        if self.collection is None:
+            return
+
         try:
-            selection = self.collection.tree.selection()[0]
+            selection = self.treeView.selection()[0]
         except:
             selection = ''
         parent = ''
@@ -274,7 +715,7 @@ class CollectionManager(tk.Toplevel):
         if book is not None:
             try:
                 bkId = self.collection.add_book(book, parent, index)
-                self.isModified = True
+                self._schedule_autosave()
             except Error as ex:
                 self._set_info_how(str(ex))
             else:
@@ -284,28 +725,230 @@ class CollectionManager(tk.Toplevel):
                     self._set_info_how(f'!"{book.novel.title}" already exists.')
 
     def _update_book(self, event=None):
+        if self.collection is None:
+            return
+
         novel = self._ui.novel
         if novel is not None:
-            for bkId in self.collection.books:
-                if novel.title == self.collection.books[bkId].title:
-                    if self.collection.books[bkId].pull_metadata(novel):
-                        self.isModified = True
-                        if self._nodeId == f'{BOOK_PREFIX}{bkId}':
-                            self._set_element_view()
+            for bkId in self.collection.get_book_ids_by_title(novel.title):
+                if self.collection.update_book(bkId, novel):
+                    self._schedule_autosave()
+                    if self._nodeId == f'{BOOK_PREFIX}{bkId}':
+                        self._set_element_view()
+
+    def _refresh_books(self, event=None):
+        """Update all books' titles and descriptions from their project files."""
+        if self.collection is None:
+            return
+
+        self._get_element_view()
+        modifiedIds, messages = self.collection.refresh_books()
+        if modifiedIds:
+            self._schedule_autosave()
+            if self._nodeId is not None and self._nodeId[2:] in modifiedIds:
+                self._set_element_view()
+        message = f'{len(modifiedIds)} {_("Books updated")}.'
+        if messages:
+            self._set_info_how(f'!{message} {len(messages)} {_("projects could not be read")}.')
+        else:
+            self._set_info_how(message)
+
+    def _update_statistics(self, event=None):
+        """Count the words, chapters, and scenes of all books in the background."""
+        if self.collection is None or self._statisticsFuture is not None:
+            return
+
+        filePaths = {bkId: self.collection.books[bkId].filePath for bkId in self.collection.books}
+        self._show_status(f'{_("Counting words")}...')
+        self._statisticsFuture = self._statisticsExecutor.submit(read_books_statistics, filePaths, self._metadataCache)
+        self.after(self._POLL_INTERVAL, self._check_statistics, self._statisticsFuture, self.collection, filePaths)
+
+    def _check_statistics(self, future, collection, filePaths):
+        """Apply the counts when all books are read."""
+        if future is not self._statisticsFuture or collection is not self.collection:
+            # The counting has been cancelled.
+            return
+
+        if not future.done():
+            self.after(self._POLL_INTERVAL, self._check_statistics, future, collection, filePaths)
+            return
+
+        self._statisticsFuture = None
+        messages = collection.apply_statistics(future.result(), filePaths)
+        self._show_statistics()
+        statistics = collection.get_statistics()
+        message = f'{statistics["books"]} {_("Books")}: {statistics["words"]} {_("Words")}.'
+        if messages:
+            self._set_info_how(f'!{message} {len(messages)} {_("projects could not be read")}.')
+        else:
+            self._set_info_how(message)
+
+    def _export_statistics(self, event=None):
+        """Write the statistics of the books, series, and collection to a CSV file.
+
+        Return True on success, otherwise return False.
+        """
+        if self.collection is None:
+            return False
+
+        fileName = filedialog.asksaveasfilename(
+            filetypes=[(_('CSV file'), '.csv')],
+            defaultextension='.csv',
+            parent=self,
+            )
+        self.lift()
+        self.focus()
+        if not fileName:
+            return False
+
+        try:
+            self._set_info_how(self.collection.export_statistics(fileName))
+        except Error as ex:
+            self._set_info_how(f'!{str(ex)}')
+            return False
+
+        return True
+
+    def _import_projects(self, event=None, asSeries=False):
+        """Read all projects of a directory tree in the background, and add them to the collection.
+
+        Optional arguments:
+            asSeries -- bool: if True, group the books in series named after their folders.
+        """
+        if self.collection is None or self._importer is not None:
+            return
+
+        rootDir = filedialog.askdirectory(initialdir=os.path.dirname(self.collection.filePath), parent=self)
+        self.lift()
+        self.focus()
+        if not rootDir:
+            return
+
+        self._importer = ProjectImporter(rootDir, cache=self._metadataCache)
+        self._importer.start()
+        self._show_status(f'{_("Searching projects")}...')
+        self.after(self._POLL_INTERVAL, self._check_import, self._importer, asSeries)
+
+    def _check_import(self, importer, asSeries):
+        """Show the import progress, and add the books when all projects are read."""
+        if importer is not self._importer:
+            # The import has been cancelled.
+            return
+
+        if not importer.is_finished():
+            done, total = importer.get_progress()
+            if total is not None:
+                self._show_status(f'{_("Reading projects")}: {done}/{total}')
+            self.after(self._POLL_INTERVAL, self._check_import, importer, asSeries)
+            return
+
+        self._importer = None
+        books, messages = importer.get_results()
+        groups = {}
+        # Dictionary:
+        #   keyword -- series folder, or None for the top level
+        #   value -- list of Book instances
+        for book in books:
+            folder = None
+            if asSeries:
+                folder = get_series_folder(book.filePath, importer.rootDir)
+            groups.setdefault(folder, []).append(book)
+        added = 0
+        for folder in groups:
+            parent = ''
+            if folder is not None:
+                seriesTitle = os.path.basename(folder)
+                for srId in self.collection.series:
+                    if self.collection.series[srId].title == seriesTitle:
+                        break
+                else:
+                    srId = self.collection.add_series(seriesTitle)
+                parent = f'{SERIES_PREFIX}{srId}'
+            for __, bkId, __ in self.collection.add_books(groups[folder], parent):
+                if bkId is not None:
+                    added += 1
+        if added:
+            self._schedule_autosave()
+        message = f'{added} {_("Books imported")}.'
+        if messages:
+            self._set_info_how(f'!{message} {len(messages)} {_("projects could not be read")}.')
+        else:
+            self._set_info_how(message)
+
+    def _update_content_index(self, event=None):
+        """Index the manuscripts changed since the last update in the background."""
+        if self.collection is None or self._contentIndexer is not None:
+            return
+
+        filePaths = [book.filePath for book in self.collection.books.values()]
+        self._contentIndexer = ContentIndexer(self._contentIndex, filePaths)
+        self._contentIndexer.start()
+        self.after(self._POLL_INTERVAL, self._check_content_index, self._contentIndexer)
+
+    def _check_content_index(self, indexer):
+        """Show the indexing progress, and the result when all manuscripts are indexed."""
+        if indexer is not self._contentIndexer:
+            # The indexing has been cancelled.
+            return
+
+        if not indexer.is_finished():
+            done, total = indexer.get_progress()
+            if total:
+                self._show_status(f'{_("Indexing manuscripts")}: {done}/{total}')
+            self.after(self._POLL_INTERVAL, self._check_content_index, indexer)
+            return
+
+        self._contentIndexer = None
+        done, total = indexer.get_progress()
+        messages = indexer.get_messages()
+        message = f'{done} {_("Manuscripts indexed")}.'
+        if messages:
+            self._set_info_how(f'!{message} {len(messages)} {_("projects could not be read")}.')
+        elif total:
+            self._set_info_how(message)
+
+    def _search_content(self, event=None):
+        """Open the window for searching the manuscripts, updating the index first."""
+        if self.collection is None:
+            return
+
+        self._update_content_index()
+        if self._contentSearchWindow is None or not self._contentSearchWindow.winfo_exists():
+            self._contentSearchWindow = ContentSearchWindow(
+                self,
+                self._contentIndex,
+                lambda: [book.filePath for book in self.collection.books.values()],
+                self._open_project_file,
+                )
+        self._contentSearchWindow.lift()
+
+    def _open_project_file(self, filePath):
+        """Select the book of a project file, and make the application open the project."""
+        bkId = self.collection.get_book_id_by_path(filePath)
+        if bkId is not None:
+            nodeId = f'{BOOK_PREFIX}{bkId}'
+            if self._view is not self.treeView:
+                self._view.show(nodeId)
+            self.treeView.see(nodeId)
+            self.treeView.selection_set(nodeId)
+        self._ui.open_project(filePath)
 
     def _remove_book(self, event=None):
+        if self.collection is None:
+            return
+
         try:
-            nodeId = self.collection.tree.selection()[0]
+            nodeId = self.treeView.selection()[0]
             message = ''
             try:
                 if nodeId.startswith(BOOK_PREFIX):
                     if messagebox.askyesno(APPLICATION, message=f'{_("Remove selected book from the collection")}?', parent=self):
                         if self.collection.tree.prev(nodeId):
-                            self.collection.tree.selection_set(self.collection.tree.prev(nodeId))
+                            self.treeView.selection_set(self.collection.tree.prev(nodeId))
                         elif self.collection.tree.parent(nodeId):
-                            self.collection.tree.selection_set(self.collection.tree.parent(nodeId))
+                            self.treeView.selection_set(self.collection.tree.parent(nodeId))
                         message = self.collection.remove_book(nodeId)
-                        self.isModified = True
+                        self._schedule_autosave()
                         self.lift()
                         self.focus()
             except Error as ex:
@@ -317,8 +960,11 @@ class CollectionManager(tk.Toplevel):
             pass
 
     def _add_series(self, event=None):
+        if self.collection is None:
+            return
+
         try:
-            selection = self.collection.tree.selection()[0]
+            selection = self.treeView.selection()[0]
         except:
             selection = ''
         title = 'New Series'
@@ -327,23 +973,26 @@ class CollectionManager(tk.Toplevel):
             index = self.collection.tree.index(selection) + 1
         try:
             self.collection.add_series(title, index)
-            self.isModified = True
+            self._schedule_autosave()
         except Error as ex:
             self._set_info_how(str(ex))
 
     def _remove_series(self, event=None):
+        if self.collection is None:
+            return
+
         try:
-            nodeId = self.collection.tree.selection()[0]
+            nodeId = self.treeView.selection()[0]
             message = ''
             try:
                 if nodeId.startswith(SERIES_PREFIX):
                     if messagebox.askyesno(APPLICATION, message=f'{_("Remove selected series but keep the books")}?', parent=self):
                         if self.collection.tree.prev(nodeId):
-                            self.collection.tree.selection_set(self.collection.tree.prev(nodeId))
+                            self.treeView.selection_set(self.collection.tree.prev(nodeId))
                         elif self.collection.tree.parent(nodeId):
-                            self.collection.tree.selection_set(self.collection.tree.parent(nodeId))
+                            self.treeView.selection_set(self.collection.tree.parent(nodeId))
                         message = self.collection.remove_series(nodeId)
-                        self.isModified = True
+                        self._schedule_autosave()
                         self.lift()
                         self.focus()
             except Error as ex:
@@ -355,18 +1004,21 @@ class CollectionManager(tk.Toplevel):
             pass
 
     def _remove_series_with_books(self, event=None):
+        if self.collection is None:
+            return
+
         try:
-            nodeId = self.collection.tree.selection()[0]
+            nodeId = self.treeView.selection()[0]
             message = ''
             try:
                 if nodeId.startswith(SERIES_PREFIX):
                     if messagebox.askyesno(APPLICATION, message=f'{_("Remove selected series and books")}?', parent=self):
                         if self.collection.tree.prev(nodeId):
-                            self.collection.tree.selection_set(self.collection.tree.prev(nodeId))
+                            self.treeView.selection_set(self.collection.tree.prev(nodeId))
                         elif self.collection.tree.parent(nodeId):
-                            self.collection.tree.selection_set(self.collection.tree.parent(nodeId))
+                            self.treeView.selection_set(self.collection.tree.parent(nodeId))
                         message = self.collection.remove_series_with_books(nodeId)
-                        self.isModified = True
+                        self._schedule_autosave()
                         self.lift()
                         self.focus()
             except Error as ex:
@@ -378,13 +1030,15 @@ class CollectionManager(tk.Toplevel):
             pass
 
     def _remove_node(self, event=None):
+        if self.collection is None:
+            return
+
         try:
-            nodeId = self.collection.tree.selection()[0]
+            nodeId = self.treeView.selection()[0]
             if nodeId.startswith(SERIES_PREFIX):
                 self._remove_series()
             elif nodeId.startswith(BOOK_PREFIX):
                 self._remove_book()
-            self.isModified = True
         except IndexError:
             pass
 
@@ -416,13 +1070,15 @@ class CollectionManager(tk.Toplevel):
         return fileName
 
     def _open_collection(self, fileName):
-        """Create a Collection instance and read the file.
+        """Create a Collection instance and read the file in the background.
 
         Positional arguments:
             fileName: str -- collection file path.
             
-        Display collection title and file path.
-        Return True on success, otherwise return False.
+        The file is read by a worker thread. Then the books and series are loaded 
+        into the tree in batches, so the window stays responsive. 
+        The status bar shows the progress; the user can cancel with the Escape key.
+        Return True, if the collection is being opened, otherwise return False.
         """
         self._show_status(self._statusText)
         fileName = self._select_collection(fileName)
@@ -431,23 +1087,183 @@ class CollectionManager(tk.Toplevel):
         if not fileName:
             return False
 
+        self._cancel_open()
         if self.collection is not None:
             self._close_collection()
 
         self.kwargs['last_open'] = fileName
-        self.collection = Collection(fileName, self.treeView)
+        self.stats.reset()
+        with self.stats.timer('open'):
+            collection = self._create_collection(fileName)
+            self._loadingCollection = collection
+            self._show_status(f'{_("Reading collection")}... ({_("Esc to cancel")})')
+            future = self._saveExecutor.submit(collection.read_nodes)
+        self.after(self._POLL_INTERVAL, self._check_open, future, collection)
+        return True
+
+    def _check_open(self, future, collection):
+        """Start loading the nodes into the tree when the collection file is read."""
+        if collection is not self._loadingCollection:
+            # Opening has been cancelled.
+            return
+
+        if not future.done():
+            self.after(self._POLL_INTERVAL, self._check_open, future, collection)
+            return
+
         try:
-            self.collection.read()
+            nodes = future.result()
         except Error as ex:
-            self._close_collection()
+            self._cancel_open()
             self._set_info_how(f'!{str(ex)}')
-            return False
+            return
+
+        with self.stats.timer('open'):
+            collection.begin_load()
+        self._load_batch(collection, nodes, 0)
+
+    def _load_batch(self, collection, nodes, start):
+        """Load a batch of nodes into the tree, and schedule the next batch."""
+        if collection is not self._loadingCollection:
+            # Opening has been cancelled.
+            return
+
+        end = start + self._LOAD_BATCH_SIZE
+        try:
+            with self.stats.timer('open'):
+                collection.load_nodes(nodes[start:end])
+        except Error as ex:
+            self._cancel_open()
+            self._set_info_how(f'!{str(ex)}')
+            return
 
+        if end < len(nodes):
+            self._show_status(f'{_("Loading")}: {end}/{len(nodes)} ({_("Esc to cancel")})')
+            self.after(1, self._load_batch, collection, nodes, end)
+            return
+
+        with self.stats.timer('open'):
+            message = collection.finish_load()
+        self._loadingCollection = None
+        self.collection = collection
+        self._show_status('')
+        if collection.journal is not None and collection.journal.isOutdated and collection.journal.records:
+            # Tell the user that the unsaved changes have been applied to another user's version.
+            self._set_info_how(message)
         self._show_path(f'{norm_path(self.collection.filePath)}')
         self._set_title()
+        self.fileMenu.entryconfig(_('Reload from disk'), state='normal')
         self.fileMenu.entryconfig(_('Close'), state='normal')
+        self.fileMenu.entryconfig(_('Export...'), state='normal')
+        self.fileMenu.entryconfig(_('Export statistics...'), state='normal')
+        self._show_timings()
+        self._start_availability_check()
+        if self.kwargs['content_index']:
+            self._update_content_index()
+        if self.kwargs['statistics']:
+            self._update_statistics()
+
+    def _reload_collection(self, event=None):
+        """Pick up the changes made to the collection file by another program.
+
+        Only the differences are applied to the tree, so the selection and the expanded series are kept.
+        Return True on success, otherwise return False.
+        """
+        if self.collection is None:
+            return False
+
+        self._get_element_view()
+        self._wait_for_save()
+        keepChanges = True
+        if self.collection.is_modified():
+            keepChanges = messagebox.askyesnocancel(APPLICATION, message=f'{_("Keep the unsaved changes")}?', parent=self)
+            if keepChanges is None:
+                return False
+
+        self._cancel_autosave()
+        if self._availabilityCheck is not None:
+            self._availabilityCheck.cancel()
+            self._availabilityCheck = None
+        self.stats.reset()
+        try:
+            with self.stats.timer('reload'):
+                message = self.collection.reload(keepChanges)
+        except Error as ex:
+            self._set_info_how(f'!{str(ex)}')
+            return False
+
+        self._refresh_element_view()
+        self._set_info_how(message)
+        self._start_availability_check()
         return True
 
+    def _refresh_element_view(self):
+        """Show the selected element again after the tree has been updated from the file.
+
+        The books and series are updated in place, so the selected element is still valid, if it exists.
+        """
+        if self._nodeId is not None and self.collection.tree.exists(self._nodeId):
+            self._set_element_view()
+        else:
+            self._element = None
+            self._nodeId = None
+            self.indexCard.title.set('')
+            self.indexCard.bodyBox.clear()
+            self._show_statistics()
+        if self._searchText.get().strip():
+            self._search()
+
+    def _cancel_open(self, event=None):
+        """Stop opening a collection in the background, if any, and discard the nodes loaded so far."""
+        collection = self._loadingCollection
+        if collection is None:
+            return
+
+        self._loadingCollection = None
+        if collection.journal is not None:
+            collection.journal.close()
+        collection.reset_tree()
+        self._show_status(f'{_("Opening cancelled")}.')
+
+    def _start_availability_check(self):
+        """Check in the background whether the book files exist."""
+        self._availabilityCheck = AvailabilityCheck(self.collection.books)
+        self._availabilityCheck.start()
+        self.after(self._POLL_INTERVAL, self._check_availability, self._availabilityCheck, [])
+
+    def _check_availability(self, availabilityCheck, missingIds):
+        """Mark the books as available or missing, as the results come in."""
+        if availabilityCheck is not self._availabilityCheck:
+            # The check has been cancelled.
+            return
+
+        for bkId, isAvailable in availabilityCheck.get_results():
+            self.collection.set_availability(bkId, isAvailable)
+            if not isAvailable:
+                missingIds.append(bkId)
+        if not availabilityCheck.is_finished():
+            self.after(self._POLL_INTERVAL, self._check_availability, availabilityCheck, missingIds)
+            return
+
+        self._availabilityCheck = None
+        if missingIds:
+            self._set_info_how(f'!{len(missingIds)} {_("Books not found")}.')
+
+    def _create_collection(self, fileName):
+        """Return a new Collection instance displayed by the tree view."""
+        collection = Collection(fileName, self._view)
+        collection.metadataCache = self._metadataCache
+        collection.keepBackup = self.kwargs['keep_backup']
+        collection.lockTimeout = 0
+        # Do not wait for another user's lock; the saving is retried instead.
+        if self.kwargs['journal']:
+            collection.journal = CollectionJournal(fileName)
+        if self.kwargs['snapshot_cache']:
+            collection.cache = CollectionCache(fileName)
+        if self._view is not self.treeView:
+            self._view.set_source(collection.tree, collection.get_node_options)
+        return collection
+
     def _new_collection(self, event=None):
         """Create a collection.
 
@@ -460,30 +1276,107 @@ class CollectionManager(tk.Toplevel):
         if not fileName:
             return False
 
+        self._cancel_open()
         if self.collection is not None:
             self._close_collection()
 
-        self.collection = Collection(fileName, self.treeView)
+        self.collection = self._create_collection(fileName)
+        if self.collection.journal is not None:
+            # The journal refers to the collection file, so create it.
+            try:
+                self.collection.write()
+            except Error as ex:
+                self._set_info_how(f'!{str(ex)}')
         self.kwargs['last_open'] = fileName
         self._show_path(f'{norm_path(self.collection.filePath)}')
         self._set_title()
+        self.fileMenu.entryconfig(_('Reload from disk'), state='normal')
         self.fileMenu.entryconfig(_('Close'), state='normal')
+        self.fileMenu.entryconfig(_('Export...'), state='normal')
+        self.fileMenu.entryconfig(_('Export statistics...'), state='normal')
+        return True
+
+    def _export_collection(self, event=None):
+        """Write the collection to a file of the selected format.
+
+        The collection stays connected with its own file.
+        Return True on success, otherwise return False.
+        """
+        if self.collection is None:
+            return False
+
+        fileName = filedialog.asksaveasfilename(filetypes=self._fileTypes, defaultextension=self._fileTypes[0][1])
+        self.lift()
+        self.focus()
+        if not fileName:
+            return False
+
+        if os.path.normcase(os.path.abspath(fileName)) == os.path.normcase(os.path.abspath(self.collection.filePath)):
+            self._set_info_how(f'!{_("Cannot export the collection to its own file")}.')
+            return False
+
+        try:
+            self._set_info_how(self.collection.export(fileName))
+        except Error as ex:
+            self._set_info_how(f'!{str(ex)}')
+            return False
+
         return True
 
     def _close_collection(self, event=None):
-        """Close the collection without saving and reset the user interface.
+        """Close the collection and reset the user interface.
         
+        If autosave is enabled, the changes are saved before.
         To be extended by subclasses.
         """
-        self._get_element_view()
-        self.indexCard.title.set('')
-        self.indexCard.bodyBox.clear()
-        self.collection.reset_tree()
-        self.collection = None
-        self.title('')
-        self._show_status('')
-        self._show_path('')
-        self.fileMenu.entryconfig(_('Close'), state='disabled')
+        self.stats.reset()
+        with self.stats.timer('close'):
+            self._get_element_view()
+            self._cancel_autosave()
+            self._wait_for_save()
+            if self.kwargs['autosave'] or self.collection.journal is not None:
+                while self.collection.is_modified():
+                    try:
+                        self.collection.write()
+                    except CollectionLockedError as ex:
+                        if not messagebox.askretrycancel(APPLICATION, message=str(ex), parent=self):
+                            break
+
+                    except Error as ex:
+                        self._show_info(f'!{str(ex)}')
+                        break
+            if self.collection.journal is not None:
+                self.collection.journal.close()
+            if self._importer is not None:
+                self._importer.cancel()
+                self._importer = None
+            if self._availabilityCheck is not None:
+                self._availabilityCheck.cancel()
+                self._availabilityCheck = None
+            if self._contentIndexer is not None:
+                self._contentIndexer.cancel()
+                self._contentIndexer = None
+            if self._contentSearchWindow is not None:
+                self._contentSearchWindow.destroy()
+                self._contentSearchWindow = None
+            if self._statisticsFuture is not None:
+                self._statisticsFuture.cancel()
+                self._statisticsFuture = None
+            self.indexCard.title.set('')
+            self.indexCard.bodyBox.clear()
+            self.statisticsLabel.config(text='')
+            self.collection.reset_tree()
+            self.collection = None
+            self._highlighted = set()
+            self._searchText.set('')
+            self.title('')
+            self._show_status('')
+            self._show_path('')
+            self.fileMenu.entryconfig(_('Reload from disk'), state='disabled')
+            self.fileMenu.entryconfig(_('Close'), state='disabled')
+            self.fileMenu.entryconfig(_('Export...'), state='disabled')
+            self.fileMenu.entryconfig(_('Export statistics...'), state='disabled')
+        self._show_timings()
 
     def _set_title(self):
         """Set the main window title. 
@@ -0,0 +1,197 @@
+"""Provide a function for the three-way merge of collection versions.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+from nvcollectionlib.nvcollection_globals import *
+
+
+def merge_nodes(baseNodes, ourNodes, theirNodes):
+    """Merge the changes of two collection versions made from a common base version.
+
+    Positional arguments:
+        baseNodes -- list of (node ID, parent node ID, fields) tuples: common base version.
+        ourNodes -- list of (node ID, parent node ID, fields) tuples: our version.
+        theirNodes -- list of (node ID, parent node ID, fields) tuples: their version.
+
+    The nodes are given in tree order, as generated by the storage classes' read() method.
+    Books and series are matched by their node IDs. Each field, and the parent, is merged separately:
+    a value changed in one version only is taken from that version.
+    If both versions changed a value differently, our value is kept, and the node counts as conflict.
+    Books added by both versions with the same path are regarded as the same book.
+    Books and series added by both versions with the same ID but different content get new IDs on our side.
+    A node deleted in one version is deleted, unless the other version changed it.
+    Within a parent, the order of the version that changed it is kept.
+    Return a tuple: list of the merged nodes in tree order, list of the IDs of the conflicting nodes.
+    """
+    base = _get_values(baseNodes)
+    theirs = _get_values(theirNodes)
+    ours = _get_values(_rename_added_nodes(ourNodes, base, theirs))
+    conflicts = []
+
+    #--- Merge the books and series.
+    merged = {}
+    # Dictionary:
+    #   keyword -- node ID
+    #   value -- dictionary of the fields, with the parent node ID as 'parent' field
+    for nodeId in list(theirs) + [nodeId for nodeId in ours if not nodeId in theirs]:
+        baseValues = base.get(nodeId, None)
+        ourValues = ours.get(nodeId, None)
+        theirValues = theirs.get(nodeId, None)
+        if ourValues is None or theirValues is None:
+            values = ourValues or theirValues
+            if baseValues is None:
+                # Added in one version.
+                merged[nodeId] = values
+            elif values != baseValues:
+                # Deleted in one version, and changed in the other.
+                merged[nodeId] = values
+                conflicts.append(nodeId)
+            continue
+
+        values = {}
+        isConflict = False
+        for key in list(theirValues) + [key for key in ourValues if not key in theirValues]:
+            ourValue = ourValues.get(key, None)
+            theirValue = theirValues.get(key, None)
+            baseValue = None
+            if baseValues is not None:
+                baseValue = baseValues.get(key, None)
+            if ourValue == theirValue or theirValue == baseValue:
+                values[key] = ourValue
+            elif ourValue == baseValue:
+                values[key] = theirValue
+            else:
+                values[key] = ourValue
+                isConflict = True
+        merged[nodeId] = values
+        if isConflict:
+            conflicts.append(nodeId)
+
+    # Books whose series is gone, and nodes with an invalid parent, move to the top level.
+    for nodeId, values in merged.items():
+        parent = values['parent']
+        if parent and (not parent in merged or not parent.startswith(SERIES_PREFIX) or nodeId.startswith(SERIES_PREFIX)):
+            values['parent'] = ''
+
+    #--- Merge the order of the children.
+    baseChildren = _get_children(baseNodes)
+    ourChildren = _get_children(ours)
+    theirChildren = _get_children(theirNodes)
+    mergedChildren = _get_children(merged)
+    mergedNodes = []
+
+    def add_children(parent):
+        ourOrder = ourChildren.get(parent, [])
+        theirOrder = theirChildren.get(parent, [])
+        if ourOrder != baseChildren.get(parent, []):
+            primary, secondary = ourOrder, theirOrder
+        else:
+            primary, secondary = theirOrder, ourOrder
+        primaryChildren = [nodeId for nodeId in primary if nodeId in merged and merged[nodeId]['parent'] == parent]
+        placed = set(primaryChildren)
+        followers = {}
+        # Dictionary:
+        #   keyword -- predecessor node ID; None for the first position
+        #   value -- list of the node IDs to be inserted after the predecessor
+        predecessor = None
+        for nodeId in secondary:
+            if nodeId in merged and merged[nodeId]['parent'] == parent and not nodeId in placed:
+                # Insert after the same predecessor as in the secondary order.
+                followers.setdefault(predecessor, []).append(nodeId)
+                placed.add(nodeId)
+            if nodeId in placed:
+                predecessor = nodeId
+        children = []
+        stack = list(reversed(followers.get(None, [])))
+        i = 0
+        while True:
+            if not stack:
+                if i == len(primaryChildren):
+                    break
+
+                stack.append(primaryChildren[i])
+                i += 1
+            nodeId = stack.pop()
+            children.append(nodeId)
+            stack.extend(reversed(followers.get(nodeId, [])))
+        for nodeId in mergedChildren.get(parent, []):
+            if not nodeId in placed:
+                # Moved here from a parent with another order.
+                children.append(nodeId)
+        for nodeId in children:
+            fields = dict(merged[nodeId])
+            del fields['parent']
+            mergedNodes.append((nodeId, parent, fields))
+            if nodeId.startswith(SERIES_PREFIX):
+                add_children(nodeId)
+
+    add_children('')
+    return mergedNodes, conflicts
+
+
+def _get_values(nodes):
+    """Return a dictionary of the nodes' fields by node ID, with the parent node ID as 'parent' field.
+
+    Positional arguments:
+        nodes -- list of (node ID, parent node ID, fields) tuples, or a dictionary made by this function.
+    """
+    if isinstance(nodes, dict):
+        return nodes
+
+    return {nodeId: dict(fields, parent=parent) for nodeId, parent, fields in nodes}
+
+
+def _get_children(nodes):
+    """Return a dictionary of the child node ID lists by parent node ID."""
+    children = {}
+    if isinstance(nodes, dict):
+        nodes = [(nodeId, values['parent'], None) for nodeId, values in nodes.items()]
+    for nodeId, parent, __ in nodes:
+        children.setdefault(parent, []).append(nodeId)
+    return children
+
+
+def _rename_added_nodes(ourNodes, base, theirs):
+    """Return a dictionary of our nodes' fields by node ID, with the added nodes' IDs adjusted to their version.
+
+    Our books added with the path of a book they added get the ID of their book.
+    Other books and series added with the ID of a different node they added get new IDs.
+    The nodes are kept in tree order.
+    """
+    theirPaths = {}
+    # Dictionary:
+    #   keyword -- normalized path of a book added in their version
+    #   value -- book node ID
+    for nodeId, values in theirs.items():
+        if nodeId.startswith(BOOK_PREFIX) and not nodeId in base:
+            theirPaths[path_key(values['path'])] = nodeId
+    usedIds = set(base) | set(theirs) | {nodeId for nodeId, __, __ in ourNodes}
+    renamed = {}
+    for nodeId, parent, fields in ourNodes:
+        if nodeId in base:
+            continue
+
+        newId = nodeId
+        if nodeId.startswith(BOOK_PREFIX):
+            newId = theirPaths.get(path_key(fields['path']), nodeId)
+        if newId == nodeId and nodeId in theirs and theirs[nodeId] != dict(fields, parent=renamed.get(parent, parent)):
+            newId = _new_node_id(nodeId[:2], usedIds)
+        if newId != nodeId:
+            renamed[nodeId] = newId
+    ours = {}
+    for nodeId, parent, fields in ourNodes:
+        ours[renamed.get(nodeId, nodeId)] = dict(fields, parent=renamed.get(parent, parent))
+    return ours
+
+
+def _new_node_id(prefix, usedIds):
+    """Return an unused node ID with the prefix, and add it to usedIds."""
+    i = 1
+    for nodeId in usedIds:
+        if nodeId.startswith(prefix) and nodeId[2:].isdigit():
+            i = max(i, int(nodeId[2:]) + 1)
+    nodeId = f'{prefix}{i}'
+    usedIds.add(nodeId)
+    return nodeId
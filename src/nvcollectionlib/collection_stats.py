@@ -0,0 +1,83 @@
+"""Provide a class for timing and counting the collection operations.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+import time
+from contextlib import contextmanager
+
+
+class CollectionStats:
+    """Lightweight timers and counters for the collection operations.
+
+    Timers accumulate the time and the number of calls of an operation.
+    Counters accumulate quantities such as books, bytes, or view calls.
+
+    Public methods:
+        timer(name) -- context manager that adds the enclosed run time to a timer.
+        count(name, n=1) -- add n to a counter.
+        get_time(name) -- return the accumulated seconds of a timer.
+        get_count(name) -- return the value of a counter.
+        reset() -- set all timers and counters to zero.
+        as_dict() -- return the timers and counters as a dictionary.
+        summary() -- return the timers and counters as a line of text.
+    """
+
+    def __init__(self):
+        self._timers = {}
+        # Dictionary:
+        #   keyword -- operation name
+        #   value -- list: number of calls, accumulated seconds
+
+        self._counters = {}
+        # Dictionary:
+        #   keyword -- counter name
+        #   value -- int: accumulated quantity
+
+    @contextmanager
+    def timer(self, name):
+        """Add the run time of the enclosed block to the timer name."""
+        startTime = time.perf_counter()
+        try:
+            yield
+        finally:
+            timer = self._timers.setdefault(name, [0, 0.0])
+            timer[0] += 1
+            timer[1] += time.perf_counter() - startTime
+
+    def count(self, name, n=1):
+        """Add n to the counter name."""
+        self._counters[name] = self._counters.get(name, 0) + n
+
+    def get_time(self, name):
+        return self._timers.get(name, [0, 0.0])[1]
+
+    def get_count(self, name):
+        return self._counters.get(name, 0)
+
+    def reset(self):
+        self._timers = {}
+        self._counters = {}
+
+    def as_dict(self):
+        """Return a dictionary with the keys 'timers' and 'counters'.
+
+        The timers are given as dictionaries with the keys 'calls' and 'seconds'.
+        """
+        timers = {}
+        for name, (calls, seconds) in self._timers.items():
+            timers[name] = dict(calls=calls, seconds=seconds)
+        return dict(timers=timers, counters=dict(self._counters))
+
+    def summary(self):
+        """Return the timers and counters as a line of text, e.g. for a status bar."""
+        parts = []
+        for name, (calls, seconds) in self._timers.items():
+            if calls > 1:
+                parts.append(f'{name}: {seconds:.3f} s ({calls}x)')
+            else:
+                parts.append(f'{name}: {seconds:.3f} s')
+        for name, value in self._counters.items():
+            parts.append(f'{name}: {value}')
+        return '; '.join(parts)
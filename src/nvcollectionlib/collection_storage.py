@@ -0,0 +1,44 @@
+"""Provide functions for selecting the storage of a collection file.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+import os
+
+from nvcollectionlib.pwc_storage import PwcStorage
+from nvcollectionlib.sqlite_storage import SqliteStorage
+
+STORAGE_CLASSES = [PwcStorage, SqliteStorage]
+# Supported collection file formats. The first one is the default.
+
+
+def get_storage_class(filePath):
+    """Return the storage class for the file's extension, or None."""
+    extension = os.path.splitext(filePath)[1].lower()
+    for storageClass in STORAGE_CLASSES:
+        if extension == storageClass.EXTENSION:
+            return storageClass
+
+    return None
+
+
+def get_storage(filePath, stats=None):
+    """Return a storage instance for the collection file, or None, if the file type is not supported.
+
+    Positional arguments:
+        filePath -- str: path to the collection file.
+
+    Optional arguments:
+        stats -- CollectionStats instance counting the bytes or rows processed.
+    """
+    storageClass = get_storage_class(filePath)
+    if storageClass is None:
+        return None
+
+    return storageClass(filePath, stats)
+
+
+def get_file_types():
+    """Return a list of (description, extension) tuples for file selection dialogs."""
+    return [(storageClass.DESCRIPTION, storageClass.EXTENSION) for storageClass in STORAGE_CLASSES]
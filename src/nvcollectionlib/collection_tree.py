@@ -0,0 +1,200 @@
+"""Provide a class representing the ordered tree of series and books.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+
+
+class CollectionTree:
+    """Ordered hierarchy of series and book node IDs, independent of tkinter.
+
+    The interface is a subset of the ttk.Treeview methods,
+    so the tree can replace the Treeview in the collection model.
+    If a view is set, all structural changes are passed on to it,
+    keeping it in sync with the tree.
+
+    Public methods:
+        insert(parent, index, iid, **kwargs) -- insert a node.
+        insert_many(parent, index, nodes) -- insert a sequence of nodes at once.
+        delete(*items) -- delete nodes with all their descendants.
+        move(item, parent, index) -- move a node to another position.
+        item(item, **kwargs) -- pass display options to the view.
+        get_children(item) -- return a tuple of the item's child nodes.
+        count_children(item) -- return the number of the item's child nodes.
+        parent(item) -- return the item's parent node.
+        index(item) -- return the item's position within its parent's children.
+        prev(item) -- return the item's previous sibling, or an empty string.
+        next(item) -- return the item's next sibling, or an empty string.
+        exists(item) -- return True, if the node is in the tree.
+        reset() -- delete all nodes.
+
+    Public instance variables:
+        view -- ttk.Treeview (or a compatible object) that displays the tree, or None.
+        stats -- CollectionStats instance counting the view calls, or None.
+    """
+
+    def __init__(self, view=None, stats=None):
+        """Initialize the instance variables.
+
+        Optional arguments:
+            view -- ttk.Treeview (or a compatible object) that displays the tree.
+            stats -- CollectionStats instance counting the view calls.
+        """
+        self.view = view
+        self.stats = stats
+
+        self._children = {'': []}
+        # Dictionary:
+        #   keyword -- node ID ('' for the root)
+        #   value -- list of child node IDs
+
+        self._parents = {}
+        # Dictionary:
+        #   keyword -- node ID
+        #   value -- parent node ID
+
+    def insert(self, parent, index, iid, **kwargs):
+        """Insert a node and return its ID.
+
+        Positional arguments:
+            parent -- str: parent node ID; '' for the top level.
+            index -- int or 'end': position among the parent's children.
+            iid -- str: ID of the node to create.
+
+        Keyword arguments are passed on to the view.
+        """
+        self._children[iid] = []
+        self._parents[iid] = parent
+        self._insert_child(parent, index, iid)
+        if self.view is not None:
+            self._count_view_calls()
+            self.view.insert(parent, index, iid, **kwargs)
+        return iid
+
+    def insert_many(self, parent, index, nodes):
+        """Insert a sequence of sibling nodes, updating the view afterwards.
+
+        Positional arguments:
+            parent -- str: parent node ID; '' for the top level.
+            index -- int or 'end': position of the first node among the parent's children.
+            nodes -- list of (iid, kwargs) tuples; kwargs are passed on to the view.
+        """
+        newIds = []
+        for iid, __ in nodes:
+            self._children[iid] = []
+            self._parents[iid] = parent
+            newIds.append(iid)
+        siblings = self._children[parent]
+        if index == 'end':
+            siblings.extend(newIds)
+        else:
+            index = max(int(index), 0)
+            siblings[index:index] = newIds
+        if self.view is not None:
+            self._count_view_calls(len(nodes))
+            for iid, kwargs in nodes:
+                self.view.insert(parent, index, iid, **kwargs)
+                if index != 'end':
+                    index += 1
+
+    def delete(self, *items):
+        """Delete nodes with all their descendants."""
+        for item in items:
+            self._children[self._parents[item]].remove(item)
+            self._forget(item)
+        if self.view is not None:
+            self._count_view_calls()
+            self.view.delete(*items)
+
+    def move(self, item, parent, index):
+        """Move a node to another parent and/or position.
+
+        Positional arguments:
+            item -- str: ID of the node to move.
+            parent -- str: new parent node ID; '' for the top level.
+            index -- int or 'end': new position among the parent's children.
+        """
+        self._children[self._parents[item]].remove(item)
+        self._parents[item] = parent
+        self._insert_child(parent, index, item)
+        if self.view is not None:
+            self._count_view_calls()
+            self.view.move(item, parent, index)
+
+    def item(self, item, option=None, **kwargs):
+        """Pass display options such as the node's text on to the view.
+
+        Return the value of option, if given, or None, if the view does not display the node.
+        """
+        if self.view is not None:
+            self._count_view_calls()
+            return self.view.item(item, option, **kwargs)
+
+    def get_children(self, item=''):
+        return tuple(self._children[item])
+
+    def count_children(self, item=''):
+        return len(self._children[item])
+
+    def parent(self, item):
+        return self._parents[item]
+
+    def index(self, item):
+        if not item:
+            return 0
+
+        return self._children[self._parents[item]].index(item)
+
+    def prev(self, item):
+        siblings = self._children[self._parents[item]]
+        i = siblings.index(item)
+        if i > 0:
+            return siblings[i - 1]
+
+        return ''
+
+    def next(self, item):
+        siblings = self._children[self._parents[item]]
+        i = siblings.index(item) + 1
+        if i < len(siblings):
+            return siblings[i]
+
+        return ''
+
+    def exists(self, item):
+        return item in self._parents
+
+    def reset(self):
+        """Delete all nodes.
+        
+        If the view can be cleared at once, such as a LazyTreeView, its clear method is used.
+        """
+        if self.view is not None:
+            self._count_view_calls()
+            if hasattr(self.view, 'clear'):
+                self.view.clear()
+            else:
+                children = self.view.get_children('')
+                if children:
+                    self._count_view_calls()
+                    self.view.delete(*children)
+        self._children = {'': []}
+        self._parents = {}
+
+    def _count_view_calls(self, n=1):
+        if self.stats is not None:
+            self.stats.count('view calls', n)
+
+    def _insert_child(self, parent, index, item):
+        siblings = self._children[parent]
+        if index == 'end':
+            siblings.append(item)
+        else:
+            siblings.insert(max(int(index), 0), item)
+
+    def _forget(self, item):
+        """Remove a node and its descendants from the dictionaries."""
+        for child in self._children.pop(item):
+            self._forget(child)
+        del self._parents[item]
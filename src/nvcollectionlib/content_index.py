@@ -0,0 +1,388 @@
+"""Provide classes for a persistent full-text index of the books' manuscripts.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+import os
+import sqlite3
+import threading
+from array import array
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from nvcollectionlib.nvcollection_globals import *
+from nvcollectionlib.search_index import split_words
+from nvcollectionlib.yw7_metadata import read_project_content
+from nvcollectionlib.yw7_metadata import strip_markup
+
+
+def index_project(filePath):
+    """Return a dictionary with the index entry of a project.
+
+    Positional arguments:
+        filePath -- str: path to the yWriter 7 project file.
+
+    The dictionary has the keys:
+        path, mtime, size -- the project file's path, modification time, and size.
+        title -- str: project title.
+        scenes -- list of (chapter title, scene ID, scene title) tuples in the project's order.
+        postings -- dictionary of the scene numbers by word, as bytes of an unsigned int array.
+    The scenes' titles, descriptions, and contents are indexed, without the yWriter markup.
+    This is a module function, so it can run in a process pool.
+    Raise the "Error" exception in case of error.
+    """
+    try:
+        stat = os.stat(filePath)
+    except OSError:
+        raise Error(f'{_("File not found")}: "{norm_path(filePath)}".')
+
+    content = read_project_content(filePath)
+    scenes = []
+    postings = {}
+    for chapter in content['chapters']:
+        for scId in chapter['scenes']:
+            scene = content['scenes'].get(scId, None)
+            if scene is None:
+                continue
+
+            sceneNumber = len(scenes)
+            text = strip_markup(scene['text'])
+            for word in set(split_words(' '.join((scene['title'] or '', scene['desc'] or '', text)))):
+                postings.setdefault(word, array('I')).append(sceneNumber)
+            scenes.append((chapter['title'], scId, scene['title']))
+    return dict(
+        path=filePath,
+        mtime=stat.st_mtime_ns,
+        size=stat.st_size,
+        title=content['title'],
+        scenes=scenes,
+        postings={word: numbers.tobytes() for word, numbers in postings.items()},
+        )
+
+
+class ContentIndex:
+    """Inverted index of the manuscripts' scenes, stored in an SQLite database.
+
+    The index is keyed by the normalized project path, and an entry is valid
+    as long as the project file's modification time and size are unchanged.
+    For each word and project, the numbers of the scenes containing the word
+    are stored as a binary array, so the database stays compact.
+    Each method uses a connection of its own, so the methods can be called from different threads.
+
+    Public methods:
+        get_outdated(filePaths) -- return the paths of the projects to be indexed.
+        store(entry) -- replace a project's index entry.
+        remove(filePath) -- remove a project from the index.
+        search(query, filePaths) -- return the scenes containing words beginning with all query terms.
+
+    Public instance variables:
+        filePath -- str: path to the database file.
+    """
+    MAX_RESULTS = 1000
+
+    _SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS projects (
+            id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL, path TEXT, mtime INTEGER, size INTEGER, title TEXT);
+        CREATE TABLE IF NOT EXISTS scenes (
+            project INTEGER, number INTEGER, chapter TEXT, scId TEXT, title TEXT,
+            PRIMARY KEY (project, number)) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS postings (
+            word TEXT, project INTEGER, scenes BLOB,
+            PRIMARY KEY (word, project)) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS postings_project ON postings (project);
+        '''
+
+    def __init__(self, filePath):
+        """Initialize the instance variables.
+
+        Positional arguments:
+            filePath -- str: path to the database file.
+        """
+        self.filePath = filePath
+        self._lock = threading.Lock()
+        # Serializes the write transactions.
+
+    def get_outdated(self, filePaths):
+        """Return a list of the paths of the projects that are not indexed in their current version.
+
+        Positional arguments:
+            filePaths -- iterable of project paths.
+
+        Projects whose files no longer exist are removed from the index.
+        Raise the "Error" exception in case of error.
+        """
+        with closing(self._connect()) as connection:
+            indexed = {}
+            try:
+                for key, mtime, size in connection.execute('SELECT key, mtime, size FROM projects'):
+                    indexed[key] = (mtime, size)
+            except sqlite3.Error:
+                raise Error(f'{_("Cannot read file")}: "{norm_path(self.filePath)}".')
+
+        outdated = []
+        for filePath in filePaths:
+            try:
+                stat = os.stat(filePath)
+            except OSError:
+                if path_key(filePath) in indexed:
+                    self.remove(filePath)
+                continue
+
+            if indexed.get(path_key(filePath), None) != (stat.st_mtime_ns, stat.st_size):
+                outdated.append(filePath)
+        return outdated
+
+    def store(self, entry):
+        """Replace a project's index entry.
+
+        Positional arguments:
+            entry -- dict: index entry, as returned by index_project().
+
+        Raise the "Error" exception in case of error.
+        """
+        key = path_key(entry['path'])
+        with self._lock, closing(self._connect()) as connection:
+            try:
+                with connection:
+                    self._delete(connection, key)
+                    cursor = connection.execute(
+                        'INSERT INTO projects (key, path, mtime, size, title) VALUES (?, ?, ?, ?, ?)',
+                        (key, entry['path'], entry['mtime'], entry['size'], entry['title']))
+                    projectId = cursor.lastrowid
+                    connection.executemany(
+                        'INSERT INTO scenes (project, number, chapter, scId, title) VALUES (?, ?, ?, ?, ?)',
+                        [(projectId, number, chapter, scId, title)
+                         for number, (chapter, scId, title) in enumerate(entry['scenes'])])
+                    connection.executemany(
+                        'INSERT INTO postings (word, project, scenes) VALUES (?, ?, ?)',
+                        [(word, projectId, numbers) for word, numbers in entry['postings'].items()])
+            except sqlite3.Error:
+                raise Error(f'{_("Cannot write file")}: "{norm_path(self.filePath)}".')
+
+    def remove(self, filePath):
+        """Remove a project from the index.
+
+        Raise the "Error" exception in case of error.
+        """
+        with self._lock, closing(self._connect()) as connection:
+            try:
+                with connection:
+                    self._delete(connection, path_key(filePath))
+            except sqlite3.Error:
+                raise Error(f'{_("Cannot write file")}: "{norm_path(self.filePath)}".')
+
+    def search(self, query, filePaths=None):
+        """Return a list of the scenes containing words beginning with all query terms.
+
+        Positional arguments:
+            query -- str: search terms.
+
+        Optional arguments:
+            filePaths -- iterable of project paths to be searched; if None, search all indexed projects.
+
+        The scenes are given as dictionaries with the keys
+        'path', 'book', 'chapter', 'scId', and 'scene',
+        sorted by project path and by the scenes' order in the project.
+        At most MAX_RESULTS scenes are returned.
+        Raise the "Error" exception in case of error.
+        """
+        terms = sorted(set(split_words(query)), key=len, reverse=True)
+        if not terms:
+            return []
+
+        with closing(self._connect()) as connection:
+            try:
+                projects = {}
+                for projectId, key, path, title in connection.execute('SELECT id, key, path, title FROM projects'):
+                    projects[projectId] = (key, path, title)
+                if filePaths is not None:
+                    keys = {path_key(filePath) for filePath in filePaths}
+                    projects = {projectId: project for projectId, project in projects.items() if project[0] in keys}
+
+                result = None
+                # Dictionary:
+                #   keyword -- project ID
+                #   value -- set of the numbers of the matching scenes
+                for term in terms:
+                    matches = {}
+                    for projectId, blob in connection.execute(
+                            'SELECT project, scenes FROM postings WHERE word >= ? AND word < ?',
+                            (term, f'{term}\U0010ffff')):
+                        if not projectId in projects:
+                            continue
+
+                        if result is not None and not projectId in result:
+                            continue
+
+                        numbers = array('I')
+                        numbers.frombytes(blob)
+                        matches.setdefault(projectId, set()).update(numbers)
+                    if result is not None:
+                        for projectId in matches:
+                            matches[projectId] &= result[projectId]
+                    result = {projectId: numbers for projectId, numbers in matches.items() if numbers}
+                    if not result:
+                        return []
+
+                scenes = []
+                for projectId in sorted(result, key=lambda projectId: projects[projectId][0]):
+                    __, path, bookTitle = projects[projectId]
+                    for number in sorted(result[projectId]):
+                        chapter, scId, sceneTitle = connection.execute(
+                            'SELECT chapter, scId, title FROM scenes WHERE project = ? AND number = ?',
+                            (projectId, number)).fetchone()
+                        scenes.append(dict(path=path, book=bookTitle, chapter=chapter, scId=scId, scene=sceneTitle))
+                        if len(scenes) >= self.MAX_RESULTS:
+                            return scenes
+
+                return scenes
+
+            except sqlite3.Error:
+                raise Error(f'{_("Cannot read file")}: "{norm_path(self.filePath)}".')
+
+    def _connect(self):
+        """Return a connection to the database, creating the tables if necessary."""
+        try:
+            connection = sqlite3.connect(self.filePath, timeout=30)
+            connection.executescript(self._SCHEMA)
+        except sqlite3.Error:
+            raise Error(f'{_("Cannot read file")}: "{norm_path(self.filePath)}".')
+
+        return connection
+
+    def _delete(self, connection, key):
+        row = connection.execute('SELECT id FROM projects WHERE key = ?', (key,)).fetchone()
+        if row is not None:
+            connection.execute('DELETE FROM postings WHERE project = ?', row)
+            connection.execute('DELETE FROM scenes WHERE project = ?', row)
+            connection.execute('DELETE FROM projects WHERE id = ?', row)
+
+
+class ContentIndexer:
+    """Update the content index of a set of projects in the background.
+
+    A background thread determines the projects changed since they were indexed,
+    has them read by a pool of worker threads, and stores the index entries.
+    Worker processes are used only if USE_PROCESSES is set, e.g. by the standalone application.
+    The plugin runs inside the novelyst process, where spawning interpreters is not safe,
+    since they would re-import the host application.
+    If no process pool is available, e.g. in a frozen application, worker threads are used.
+
+    Public methods:
+        start() -- start updating the index.
+        get_progress() -- return the number of projects indexed and the total number.
+        is_finished() -- return True, if all projects are indexed.
+        wait() -- block until all projects are indexed.
+        get_messages() -- return the error messages.
+        cancel() -- do not index the projects not yet started.
+    """
+    USE_PROCESSES = False
+    # If True, the projects are read by worker processes instead of threads.
+
+    def __init__(self, index, filePaths, maxWorkers=None):
+        """Initialize the instance variables.
+
+        Positional arguments:
+            index -- ContentIndex instance to update.
+            filePaths -- iterable of the project paths.
+
+        Optional arguments:
+            maxWorkers -- int: maximum number of workers.
+        """
+        self._index = index
+        self._filePaths = list(filePaths)
+        self._maxWorkers = maxWorkers
+        self._executor = None
+        self._done = 0
+        self._total = None
+        self._messages = []
+        self._finished = threading.Event()
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self._update_index, daemon=True).start()
+
+    def get_progress(self):
+        """Return a tuple: number of projects indexed, total number of projects to index.
+
+        The total number is None as long as the changed projects are being determined.
+        """
+        with self._lock:
+            return self._done, self._total
+
+    def is_finished(self):
+        return self._finished.is_set()
+
+    def wait(self, timeout=None):
+        """Block until all projects are indexed.
+
+        Return True, if finished, or False on timeout.
+        """
+        return self._finished.wait(timeout)
+
+    def get_messages(self):
+        with self._lock:
+            return list(self._messages)
+
+    def cancel(self):
+        """Do not index the projects not yet started."""
+        with self._lock:
+            self._cancelled = True
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _update_index(self):
+        try:
+            outdated = self._index.get_outdated(self._filePaths)
+            with self._lock:
+                self._total = len(outdated)
+            remaining = outdated
+            if self.USE_PROCESSES:
+                remaining = self._index_projects(ProcessPoolExecutor, outdated)
+            if remaining:
+                self._index_projects(ThreadPoolExecutor, remaining)
+        except Error as ex:
+            with self._lock:
+                self._messages.append(str(ex))
+        finally:
+            self._finished.set()
+
+    def _index_projects(self, executorClass, filePaths):
+        """Index the projects using an executor of the given class.
+
+        Return the paths of the projects not indexed because the executor is not available.
+        """
+        remaining = set(filePaths)
+        try:
+            with executorClass(max_workers=self._maxWorkers) as executor:
+                with self._lock:
+                    if self._cancelled:
+                        return []
+
+                    self._executor = executor
+                futures = {executor.submit(index_project, filePath): filePath for filePath in filePaths}
+                for future in as_completed(futures):
+                    if future.cancelled():
+                        continue
+
+                    try:
+                        self._index.store(future.result())
+                    except Error as ex:
+                        with self._lock:
+                            self._messages.append(str(ex))
+                    remaining.discard(futures[future])
+                    with self._lock:
+                        self._done += 1
+        except (BrokenProcessPool, OSError, NotImplementedError):
+            return sorted(remaining)
+
+        except RuntimeError:
+            # The executor has been shut down by cancel().
+            return []
+
+        return []
@@ -0,0 +1,92 @@
+"""Provide a window for searching the manuscripts of the collection.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+import tkinter as tk
+from tkinter import ttk
+
+from nvcollectionlib.nvcollection_globals import *
+
+
+class ContentSearchWindow(tk.Toplevel):
+    """Window with a search box and a list of the matching scenes.
+
+    The search runs on the content index when the user presses Enter.
+    Double-clicking a scene opens its project.
+
+    Public methods:
+        search(query) -- list the scenes matching the query.
+    """
+
+    def __init__(self, master, index, get_file_paths, open_project):
+        """Set up the window.
+
+        Positional arguments:
+            master -- parent window.
+            index -- ContentIndex instance to be searched.
+            get_file_paths -- function returning the paths of the collection's books.
+            open_project -- function to be called with the path of a project to open.
+        """
+        super().__init__(master)
+        self.title(f'{_("Search manuscripts")} - {PLUGIN}')
+        self._index = index
+        self._get_file_paths = get_file_paths
+        self._open_project = open_project
+        self._results = {}
+        # Dictionary:
+        #   keyword -- result list item ID
+        #   value -- project path
+
+        searchBar = ttk.Frame(self)
+        searchBar.pack(fill='x', padx=2, pady=2)
+        self._searchText = tk.StringVar()
+        searchEntry = ttk.Entry(searchBar, textvariable=self._searchText)
+        searchEntry.pack(side='left', fill='x', expand=True, padx=2)
+        ttk.Button(searchBar, text=_('Search'), command=lambda: self.search(self._searchText.get())).pack(side='left', padx=2)
+
+        columns = ('book', 'chapter', 'scene')
+        self._resultList = ttk.Treeview(self, columns=columns, show='headings', selectmode='browse')
+        self._resultList.heading('book', text=_('Book'))
+        self._resultList.heading('chapter', text=_('Chapter'))
+        self._resultList.heading('scene', text=_('Scene'))
+        scrollY = ttk.Scrollbar(self._resultList, orient='vertical', command=self._resultList.yview)
+        self._resultList.configure(yscrollcommand=scrollY.set)
+        scrollY.pack(side='right', fill='y')
+        self._resultList.pack(fill='both', expand=True, padx=2)
+
+        self._statusBar = tk.Label(self, text='', anchor='w', padx=5, pady=2)
+        self._statusBar.pack(fill='x')
+
+        searchEntry.bind('<Return>', lambda event: self.search(self._searchText.get()))
+        self._resultList.bind('<Double-1>', self._open_result)
+        self._resultList.bind('<Return>', self._open_result)
+        self.bind('<Escape>', lambda event: self.destroy())
+        searchEntry.focus_set()
+
+    def search(self, query):
+        """List the scenes of the collection's books matching the query."""
+        self._resultList.delete(*self._resultList.get_children())
+        self._results = {}
+        try:
+            scenes = self._index.search(query, self._get_file_paths())
+        except Error as ex:
+            self._statusBar.config(text=str(ex))
+            return
+
+        for scene in scenes:
+            item = self._resultList.insert('', 'end', values=(scene['book'], scene['chapter'], scene['scene']))
+            self._results[item] = scene['path']
+        if len(scenes) >= self._index.MAX_RESULTS:
+            self._statusBar.config(text=f'{len(scenes)} {_("scenes found")} ({_("limit reached")}).')
+        else:
+            self._statusBar.config(text=f'{len(scenes)} {_("scenes found")}.')
+
+    def _open_result(self, event=None):
+        try:
+            item = self._resultList.selection()[0]
+        except IndexError:
+            return
+
+        self._open_project(self._results[item])
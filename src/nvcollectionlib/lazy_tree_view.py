@@ -0,0 +1,308 @@
+"""Provide a class for a Treeview that displays large collections on demand.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+
+
+class LazyTreeView:
+    """View adapter that populates a ttk.Treeview on demand.
+
+    The adapter is set as the view of a CollectionTree.
+    It displays only a part of the collection tree:
+    - The series' children are inserted when the series is expanded.
+      Large series release their children again when collapsed.
+    - The top level nodes are inserted in chunks, as the user scrolls down.
+
+    The CollectionTree still holds the whole structure,
+    so the collection data is not affected.
+    All other attributes are taken from the wrapped Treeview.
+
+    Public methods:
+        set_source(tree, get_options) -- connect the adapter to the collection tree.
+        insert(parent, index, iid, **kwargs) -- display a new node, if visible.
+        delete(*items) -- remove nodes from the display.
+        clear() -- remove all nodes from the display at once.
+        move(item, parent, index) -- move a displayed node, or display/hide it.
+        item(item, option, **kwargs) -- change or query the display options of a displayed node.
+        populate(item) -- display the children of a series.
+        release(item) -- remove the children of a series from the display.
+        show(item) -- display a node, with its ancestors populated.
+    """
+    CHUNK_SIZE = 500
+    # Number of top level nodes inserted at a time.
+
+    RELEASE_THRESHOLD = 1000
+    # Series with more children release them when collapsed.
+
+    _PLACEHOLDER = '#'
+    # Prefix of the dummy child that makes a collapsed series expandable.
+
+    def __init__(self, view, scrollCommand=None):
+        """Initialize the instance variables and the event bindings.
+
+        Positional arguments:
+            view -- ttk.Treeview to populate.
+
+        Optional arguments:
+            scrollCommand -- callback for the view's vertical scrolling, e.g. the scrollbar's set method.
+        """
+        self._view = view
+        self._scrollCommand = scrollCommand
+        self._tree = None
+        self._get_options = None
+
+        self._shown = set()
+        # IDs of the nodes inserted into the view, except placeholders.
+
+        self._populated = set()
+        # IDs of the nodes whose children are inserted into the view.
+
+        self._placeholders = set()
+        # IDs of the nodes with a placeholder child.
+
+        self._loadedTop = 0
+        # Number of top level nodes inserted into the view.
+        # These are always the first ones of the collection tree.
+
+        self._topLimit = self.CHUNK_SIZE
+        # Number of top level nodes to be inserted.
+
+        self._loading = False
+
+        self._pruning = False
+        # True, if the placeholders are to be pruned when idle.
+
+        view.configure(yscrollcommand=self._on_scroll)
+        view.bind('<<TreeviewOpen>>', self._on_open, add='+')
+        view.bind('<<TreeviewClose>>', self._on_close, add='+')
+
+    def __getattr__(self, name):
+        return getattr(self._view, name)
+
+    def set_source(self, tree, get_options):
+        """Connect the adapter to the collection tree.
+
+        Positional arguments:
+            tree -- CollectionTree instance holding the whole structure.
+            get_options -- function returning the display options of a node ID as a dict.
+        """
+        self._tree = tree
+        self._get_options = get_options
+
+    def insert(self, parent, index, iid, **kwargs):
+        """Display a new node, if its position is visible.
+        
+        The collection tree is expected to already contain the node.
+        """
+        if self._is_visible(parent, self._get_position(parent, index)):
+            self._show(parent, index, iid, kwargs)
+        else:
+            self._update_placeholder(parent)
+
+    def delete(self, *items):
+        """Remove nodes from the display."""
+        isHiddenDeleted = False
+        for item in items:
+            if not item in self._shown:
+                isHiddenDeleted = True
+                continue
+
+            parent = self._view.parent(item)
+            self._forget(item)
+            self._view.delete(item)
+            if parent == '':
+                self._loadedTop -= 1
+            else:
+                self._update_placeholder(parent)
+        if isHiddenDeleted:
+            self._prune_placeholders()
+        if not self._shown:
+            self._loadedTop = 0
+            self._topLimit = self.CHUNK_SIZE
+
+    def clear(self):
+        """Remove all nodes from the display at once, e.g. before loading another collection.
+
+        The top level nodes are deleted with a single view call,
+        and the bookkeeping is reset instead of unregistering the nodes one by one.
+        """
+        children = self._view.get_children('')
+        if children:
+            self._view.delete(*children)
+        self._shown = set()
+        self._populated = set()
+        self._placeholders = set()
+        self._loadedTop = 0
+        self._topLimit = self.CHUNK_SIZE
+
+    def move(self, item, parent, index):
+        """Move a displayed node, or display/hide it, depending on its new position.
+        
+        The collection tree is expected to already contain the node at the new position.
+        """
+        position = self._get_position(parent, index)
+        isVisible = self._is_visible(parent, position)
+        if item in self._shown:
+            oldParent = self._view.parent(item)
+            if oldParent == parent:
+                isVisible = parent != '' or position < self._loadedTop
+            if isVisible:
+                self._view.move(item, parent, index)
+                if oldParent == '' and parent != '':
+                    self._loadedTop -= 1
+                elif oldParent != '' and parent == '':
+                    self._loadedTop += 1
+            else:
+                self.delete(item)
+            self._update_placeholder(oldParent)
+        else:
+            self._schedule_pruning()
+            if isVisible:
+                self._show(parent, index, item, self._get_options(item))
+        self._update_placeholder(parent)
+
+    def item(self, item, option=None, **kwargs):
+        """Change or query the display options of a displayed node.
+
+        Return None, if the node is not displayed.
+        """
+        if item in self._shown:
+            return self._view.item(item, option, **kwargs)
+
+    def populate(self, item):
+        """Display the children of a node."""
+        if item in self._populated or not item in self._shown:
+            return
+
+        self._remove_placeholder(item)
+        self._populated.add(item)
+        for child in self._tree.get_children(item):
+            self._show(item, 'end', child, self._get_options(child))
+
+    def show(self, item):
+        """Display a node, loading the top level chunks and populating the ancestors as needed."""
+        if item in self._shown or not self._tree.exists(item):
+            return
+
+        ancestors = []
+        parent = self._tree.parent(item)
+        while parent:
+            ancestors.insert(0, parent)
+            parent = self._tree.parent(parent)
+        topNode = (ancestors + [item])[0]
+        topPosition = self._tree.index(topNode)
+        while self._loadedTop <= topPosition:
+            self._load_more()
+        for ancestor in ancestors:
+            self.populate(ancestor)
+            self._view.item(ancestor, open=True)
+
+    def release(self, item):
+        """Remove the children of a node from the display."""
+        if not item in self._populated:
+            return
+
+        self._populated.discard(item)
+        children = self._view.get_children(item)
+        for child in children:
+            self._forget(child)
+        self._view.delete(*children)
+        self._update_placeholder(item)
+
+    def _show(self, parent, index, iid, kwargs):
+        """Insert a node into the view. Nodes with children are collapsed, with a placeholder child."""
+        if self._tree.count_children(iid):
+            kwargs = dict(kwargs)
+            kwargs['open'] = False
+        self._view.insert(parent, index, iid, **kwargs)
+        self._shown.add(iid)
+        if parent == '':
+            self._loadedTop += 1
+        self._update_placeholder(iid)
+
+    def _forget(self, item):
+        """Remove a node and its displayed descendants from the bookkeeping."""
+        self._shown.discard(item)
+        self._placeholders.discard(item)
+        if item in self._populated:
+            self._populated.discard(item)
+            for child in self._view.get_children(item):
+                self._forget(child)
+
+    def _get_position(self, parent, index):
+        """Return the position of a node in the collection tree, given the insertion index."""
+        lastPosition = self._tree.count_children(parent) - 1
+        if index == 'end':
+            return lastPosition
+
+        return min(max(int(index), 0), lastPosition)
+
+    def _is_visible(self, parent, position):
+        """Return True, if a node at this position belongs to the displayed part."""
+        if parent == '':
+            return position < self._loadedTop or (position == self._loadedTop and self._loadedTop < self._topLimit)
+
+        return parent in self._populated
+
+    def _update_placeholder(self, item):
+        """Make a displayed, unpopulated node expandable exactly if it has children."""
+        if item == '' or not item in self._shown or item in self._populated:
+            return
+
+        if self._tree.exists(item) and self._tree.count_children(item):
+            if not item in self._placeholders:
+                self._view.insert(item, 'end', f'{self._PLACEHOLDER}{item}', text='...')
+                self._placeholders.add(item)
+        else:
+            self._remove_placeholder(item)
+
+    def _schedule_pruning(self):
+        """Prune the placeholders when idle, so a series of changes needs only one pass."""
+        if not self._pruning:
+            self._pruning = True
+            self._view.after_idle(self._prune_placeholders)
+
+    def _prune_placeholders(self):
+        """Remove the placeholders of nodes that have lost all children.
+        
+        This is needed after changing a node that is not displayed,
+        because its former parent is not known.
+        """
+        self._pruning = False
+        for item in list(self._placeholders):
+            if not self._tree.exists(item):
+                self._placeholders.discard(item)
+            elif not self._tree.count_children(item):
+                self._remove_placeholder(item)
+
+    def _remove_placeholder(self, item):
+        if item in self._placeholders:
+            self._view.delete(f'{self._PLACEHOLDER}{item}')
+            self._placeholders.discard(item)
+
+    def _load_more(self):
+        """Insert the next chunk of top level nodes."""
+        self._loading = False
+        self._topLimit = self._loadedTop + self.CHUNK_SIZE
+        for iid in self._tree.get_children('')[self._loadedTop:self._topLimit]:
+            self._show('', 'end', iid, self._get_options(iid))
+
+    def _on_scroll(self, first, last):
+        if self._scrollCommand is not None:
+            self._scrollCommand(first, last)
+        if self._tree is None or self._loading:
+            return
+
+        if float(last) > 0.9 and self._loadedTop < self._tree.count_children(''):
+            self._loading = True
+            self._view.after_idle(self._load_more)
+
+    def _on_open(self, event=None):
+        self.populate(self._view.focus())
+
+    def _on_close(self, event=None):
+        item = self._view.focus()
+        if self._tree.exists(item) and self._tree.count_children(item) > self.RELEASE_THRESHOLD:
+            self.release(item)
@@ -0,0 +1,208 @@
+"""Provide a class for a persistent cache of project metadata.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+import os
+import json
+import threading
+import time
+
+from nvcollectionlib.nvcollection_globals import *
+from nvcollectionlib.yw7_metadata import read_project_metadata
+from nvcollectionlib.yw7_metadata import read_project_content
+from nvcollectionlib.book_statistics import get_statistics
+
+
+class MetadataCache:
+    """Disk-backed cache of the metadata extracted from project files.
+
+    The entries are keyed by the normalized project path, and are valid
+    as long as the project file's modification time and size are unchanged.
+    When the cache exceeds its maximum size, the least recently used
+    entries are discarded on writing.
+    The methods can be called from worker threads.
+
+    Public methods:
+        read() -- load the cache file.
+        write() -- save the cache file, if modified.
+        get(filePath) -- return the cached metadata of a project file, or None.
+        put(filePath, data) -- store metadata of a project file.
+        get_metadata(filePath) -- return the project's title and description.
+        get_statistics(filePath) -- return the project's word, chapter, and scene counts.
+        clear() -- discard all entries.
+
+    Public instance variables:
+        filePath -- str: path to the cache file.
+        maxEntries -- int: maximum number of entries kept on writing.
+    """
+    MAX_ENTRIES = 10000
+
+    def __init__(self, filePath, maxEntries=MAX_ENTRIES):
+        """Initialize the instance variables.
+
+        Positional arguments:
+            filePath -- str: path to the cache file.
+
+        Optional arguments:
+            maxEntries -- int: maximum number of entries kept on writing.
+        """
+        self.filePath = filePath
+        self.maxEntries = maxEntries
+
+        self._entries = {}
+        # Dictionary:
+        #   keyword -- normalized project file path
+        #   value -- dict with the keys 'mtime', 'size', 'used', and 'data'
+
+        self._used = {}
+        # Dictionary:
+        #   keyword -- normalized project file path
+        #   value -- int: time of the entry's last use since reading, stored with the next modification
+
+        self._isModified = False
+        self._lock = threading.Lock()
+
+    def read(self):
+        """Load the cache file.
+
+        A missing or damaged cache file results in an empty cache.
+        """
+        try:
+            with open(self.filePath, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            if not isinstance(entries, dict):
+                entries = {}
+        except (OSError, ValueError):
+            entries = {}
+        with self._lock:
+            self._entries = entries
+            self._used = {}
+            self._isModified = False
+
+    def write(self):
+        """Save the cache file, if modified, discarding the least recently used entries.
+
+        Using entries does not count as modification, so the file is not rewritten
+        when all metadata is found in the cache.
+        Raise the "Error" exception in case of error.
+        """
+        with self._lock:
+            if not self._isModified:
+                return
+
+            for key, used in self._used.items():
+                if key in self._entries:
+                    self._entries[key]['used'] = used
+            self._used = {}
+            if len(self._entries) > self.maxEntries:
+                keys = sorted(self._entries, key=lambda key: self._entries[key]['used'], reverse=True)
+                for key in keys[self.maxEntries:]:
+                    del self._entries[key]
+            text = json.dumps(self._entries, ensure_ascii=False)
+            self._isModified = False
+        tempPath = f'{self.filePath}.tmp'
+        try:
+            with open(tempPath, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tempPath, self.filePath)
+        except OSError:
+            raise Error(f'{_("Cannot write file")}: "{norm_path(self.filePath)}".')
+
+    def get(self, filePath):
+        """Return a dictionary with the cached metadata of a project file.
+
+        Return None, if there is no valid entry.
+        An entry is invalidated, if the file's modification time or size changed.
+        """
+        key = path_key(filePath)
+        try:
+            stat = os.stat(filePath)
+        except OSError:
+            stat = None
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                return None
+
+            if stat is None or entry['mtime'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+                del self._entries[key]
+                self._isModified = True
+                return None
+
+            self._used[key] = int(time.time())
+            return dict(entry['data'])
+
+    def put(self, filePath, data, stat=None):
+        """Store metadata of a project file.
+
+        Positional arguments:
+            filePath -- str: path to the project file.
+            data -- dict: metadata to be merged into a valid entry.
+
+        Optional arguments:
+            stat -- os.stat_result of the project file taken before extracting the data.
+        """
+        key = path_key(filePath)
+        if stat is None:
+            try:
+                stat = os.stat(filePath)
+            except OSError:
+                return
+
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None or entry['mtime'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+                entry = dict(mtime=stat.st_mtime_ns, size=stat.st_size, data={})
+                self._entries[key] = entry
+            entry['data'].update(data)
+            entry['used'] = int(time.time())
+            self._isModified = True
+
+    def get_metadata(self, filePath):
+        """Return a dictionary with the project's title and description.
+
+        Read the project file only if there is no valid entry.
+        Raise the "Error" exception in case of error.
+        """
+        data = self.get(filePath)
+        if data is not None and 'title' in data and 'desc' in data:
+            return dict(title=data['title'], desc=data['desc'])
+
+        try:
+            stat = os.stat(filePath)
+        except OSError:
+            stat = None
+        metadata = read_project_metadata(filePath)
+        if stat is not None:
+            self.put(filePath, metadata, stat)
+        return metadata
+
+    def get_statistics(self, filePath):
+        """Return a dictionary with the project's word, chapter, and scene counts.
+
+        Read the project file only if there is no valid entry.
+        The title and description are stored as well, because the whole file is read.
+        Raise the "Error" exception in case of error.
+        """
+        data = self.get(filePath)
+        if data is not None and 'statistics' in data:
+            return dict(data['statistics'])
+
+        try:
+            stat = os.stat(filePath)
+        except OSError:
+            stat = None
+        content = read_project_content(filePath)
+        statistics = get_statistics(content)
+        if stat is not None:
+            self.put(filePath, dict(title=content['title'], desc=content['desc'], statistics=statistics), stat)
+        return statistics
+
+    def clear(self):
+        """Discard all entries."""
+        with self._lock:
+            self._entries = {}
+            self._used = {}
+            self._isModified = True
@@ -12,6 +12,7 @@ import locale
 __all__ = ['Error',
            '_',
            'norm_path',
+           'path_key',
            'LOCALE_PATH',
            'CURRENT_LANGUAGE',
            'APPLICATION',
@@ -52,3 +53,9 @@ def norm_path(path):
         path = ''
     return os.path.normpath(path)
 
+
+def path_key(path):
+    """Return a normalized absolute path for comparing file locations."""
+    if path is None:
+        path = ''
+    return os.path.normcase(os.path.abspath(path))
@@ -0,0 +1,155 @@
+"""Provide a class for importing yWriter projects from a directory tree.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from nvcollectionlib.nvcollection_globals import *
+from nvcollectionlib.book import Book
+
+PROJECT_EXTENSION = '.yw7'
+
+
+def find_projects(rootDir):
+    """Return a sorted list of the yWriter project paths found in the rootDir tree."""
+    projects = []
+    for dirPath, __, fileNames in os.walk(rootDir):
+        for fileName in fileNames:
+            if fileName.lower().endswith(PROJECT_EXTENSION):
+                projects.append(os.path.join(dirPath, fileName))
+    projects.sort()
+    return projects
+
+
+def read_project(filePath, cache=None):
+    """Return a Book instance with the metadata of the project at filePath.
+
+    Optional arguments:
+        cache -- MetadataCache instance to be used instead of reading unchanged files.
+
+    Raise the "Error" exception in case of error.
+    """
+    book = Book(filePath)
+    book.pull_file_metadata(cache)
+    return book
+
+
+def get_series_folder(filePath, rootDir):
+    """Return the folder that groups the project at filePath, or None.
+
+    This is the folder containing the project's directory.
+    If the project file is not in a ".yw" directory of its own,
+    it is the project file's directory.
+    Projects located directly in rootDir are not grouped.
+    """
+    folder = os.path.dirname(os.path.abspath(filePath))
+    if folder.lower().endswith('.yw'):
+        folder = os.path.dirname(folder)
+    if os.path.normcase(folder) == os.path.normcase(os.path.abspath(rootDir)):
+        return None
+
+    return folder
+
+
+class ProjectImporter:
+    """Read the metadata of all yWriter projects found in a directory tree.
+
+    The directory tree is walked by a background thread,
+    and the projects are read by a pool of worker threads,
+    so the caller can poll the progress without blocking.
+
+    Public methods:
+        start() -- start walking the directory tree and reading the projects.
+        get_progress() -- return the number of projects read and the total number.
+        is_finished() -- return True, if all projects are read.
+        wait() -- block until all projects are read.
+        get_results() -- return the books read, and the error messages.
+        cancel() -- do not read the projects not yet started.
+
+    Public instance variables:
+        rootDir -- str: path to the directory tree to import.
+    """
+
+    def __init__(self, rootDir, maxWorkers=None, cache=None):
+        """Initialize the instance variables.
+
+        Positional arguments:
+            rootDir -- str: path to the directory tree to import.
+
+        Optional arguments:
+            maxWorkers -- int: maximum number of worker threads.
+            cache -- MetadataCache instance to be used instead of reading unchanged files.
+        """
+        self.rootDir = rootDir
+        self._maxWorkers = maxWorkers
+        self._cache = cache
+        self._executor = None
+        self._futures = []
+        self._total = None
+        self._finished = threading.Event()
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start walking the directory tree and reading the projects."""
+        self._executor = ThreadPoolExecutor(max_workers=self._maxWorkers)
+        threading.Thread(target=self._submit_projects, daemon=True).start()
+
+    def get_progress(self):
+        """Return a tuple: number of projects read, total number of projects.
+
+        The total number is None as long as the directory tree is being walked.
+        """
+        with self._lock:
+            done = sum(1 for future in self._futures if future.done())
+            return done, self._total
+
+    def is_finished(self):
+        return self._finished.is_set()
+
+    def wait(self, timeout=None):
+        """Block until all projects are read.
+
+        Return True, if finished, or False on timeout.
+        """
+        return self._finished.wait(timeout)
+
+    def get_results(self):
+        """Return a tuple: list of Book instances, list of error messages.
+
+        The books are sorted by path.
+        """
+        books = []
+        messages = []
+        for future in self._futures:
+            if future.cancelled():
+                continue
+
+            try:
+                books.append(future.result())
+            except Error as ex:
+                messages.append(str(ex))
+        return books, messages
+
+    def cancel(self):
+        """Do not read the projects not yet started."""
+        self._cancelled = True
+        with self._lock:
+            for future in self._futures:
+                future.cancel()
+
+    def _submit_projects(self):
+        try:
+            projects = find_projects(self.rootDir)
+            with self._lock:
+                if not self._cancelled:
+                    for filePath in projects:
+                        self._futures.append(self._executor.submit(read_project, filePath, self._cache))
+                self._total = len(self._futures)
+            self._executor.shutdown(wait=True)
+        finally:
+            self._finished.set()
@@ -0,0 +1,270 @@
+"""Provide a class for storing a collection in a pwc XML file.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+import os
+from shutil import copyfile
+import xml.etree.ElementTree as ET
+
+from nvcollectionlib.nvcollection_globals import *
+
+
+class PwcStorage:
+    """Collection storage in the pwc 1.0 XML file format.
+
+    Public methods:
+        read() -- iterate over the books and series of the file.
+        write(snapshot, keepBackup) -- write a collection snapshot to the file.
+
+    Public instance variables:
+        filePath -- str: path to the pwc file.
+        stats -- CollectionStats instance counting the bytes processed, or None.
+    """
+    EXTENSION = '.pwc'
+    DESCRIPTION = _('novelyst collection')
+
+    MAJOR_VERSION = 1
+    MINOR_VERSION = 0
+    # DTD version.
+
+    _XML_HEADER = '<?xml version="1.0" encoding="utf-8"?>'
+    _INDENT = '  '
+
+    newMap = dict(
+            collection='collection',
+            series='series',
+            book='book',
+            id='id',
+            path='path',
+            title='title',
+            desc='desc',
+            )
+
+    oldMap = dict(
+            collection='COLLECTION',
+            series='SERIES',
+            book='BOOK',
+            id='ID',
+            path='Path',
+            title='Title',
+            desc='Desc',
+            )
+
+    def __init__(self, filePath, stats=None):
+        """Initialize the instance variables.
+
+        Positional arguments:
+            filePath -- str: path to the pwc file.
+
+        Optional arguments:
+            stats -- CollectionStats instance counting the bytes processed.
+        """
+        self.filePath = filePath
+        self.stats = stats
+
+    def read(self):
+        """Iterate over the books and series of the pwc file, in tree order.
+
+        Generate (node ID, parent node ID, fields) tuples,
+        with fields as dictionary with the keys 'path', 'title', and 'desc' for books,
+        and 'title' and 'desc' for series.
+        The file is parsed incrementally, and the XML elements are discarded
+        as soon as the books and series are generated.
+        Books without a path are skipped.
+        The file is checked before the first node is generated.
+        Raise the "Error" exception in case of error.
+        """
+        xmlMap = None
+        xmlElements = []
+        # Stack of the currently open XML elements.
+        srId = None
+        seriesFields = None
+        seriesNode = ''
+        bkId = None
+        bookFields = None
+        bookLevel = None
+
+        def check_root(xmlRoot):
+            """Select the XML tag names and check the file version."""
+            nonlocal xmlMap
+            if xmlRoot.tag == self.newMap['collection']:
+                xmlMap = self.newMap
+            elif xmlRoot.tag == self.oldMap['collection']:
+                xmlMap = self.oldMap
+            else:
+                raise Error(f'{_("No collection found in file")}: "{norm_path(self.filePath)}".')
+
+            try:
+                majorVersionStr, minorVersionStr = xmlRoot.attrib['version'].split('.')
+                majorVersion = int(majorVersionStr)
+                minorVersion = int(minorVersionStr)
+            except:
+                raise Error(f'{_("No valid version found in file")}: "{norm_path(self.filePath)}".')
+
+            if majorVersion > self.MAJOR_VERSION:
+                raise Error(_('The collection was created with a newer plugin version.'))
+
+            elif majorVersion < self.MAJOR_VERSION:
+                raise Error(_('The collection was created with an outdated plugin version.'))
+
+            elif minorVersion > self.MINOR_VERSION:
+                raise Error(_('The collection was created with a newer plugin version.'))
+
+        def get_series():
+            """Return the current series' node, and the series' fields on first demand."""
+            nonlocal seriesNode
+            if srId is not None and not seriesNode:
+                seriesNode = f'{SERIES_PREFIX}{srId}'
+                fields = dict(
+                    title=seriesFields.get(xmlMap['title'], seriesNode),
+                    desc=seriesFields.get(xmlMap['desc'], None),
+                    )
+                return seriesNode, fields
+
+            return seriesNode, None
+
+        def get_book():
+            """Return the current book's node and fields, or None."""
+            item = f'{BOOK_PREFIX}{bkId}'
+            bookPath = bookFields.get(xmlMap['path'], None)
+            if not bookPath:
+                return None
+
+            fields = dict(
+                path=bookPath,
+                title=bookFields.get(xmlMap['title'], item),
+                desc=bookFields.get(xmlMap['desc'], None),
+                )
+            return item, fields
+
+        try:
+            with open(self.filePath, 'rb') as f:
+                for event, xmlElement in ET.iterparse(f, events=('start', 'end')):
+                    if event == 'start':
+                        if xmlMap is None:
+                            check_root(xmlElement)
+                        elif bookFields is None and xmlElement.tag == xmlMap['book']:
+                            if len(xmlElements) == 1 or srId is not None:
+                                bkId = xmlElement.attrib.get(xmlMap['id'], None)
+                                bookFields = {}
+                                bookLevel = len(xmlElements)
+                        elif len(xmlElements) == 1 and xmlElement.tag == xmlMap['series']:
+                            srId = xmlElement.attrib[xmlMap['id']]
+                            seriesFields = {}
+                            seriesNode = ''
+                        xmlElements.append(xmlElement)
+                        continue
+
+                    xmlElements.pop()
+                    level = len(xmlElements)
+                    if bookFields is not None:
+                        if level == bookLevel:
+                            if bkId is not None:
+                                parent, fields = get_series()
+                                if fields is not None:
+                                    yield parent, '', fields
+
+                                book = get_book()
+                                if book is not None:
+                                    yield book[0], parent, book[1]
+
+                            bkId = None
+                            bookFields = None
+                        elif level == bookLevel + 1 and xmlElement.tag not in bookFields:
+                            bookFields[xmlElement.tag] = xmlElement.text
+                    elif srId is not None:
+                        if level == 1:
+                            node, fields = get_series()
+                            if fields is not None:
+                                yield node, '', fields
+
+                            srId = None
+                            seriesNode = ''
+                        elif level == 2 and xmlElement.tag not in seriesFields:
+                            seriesFields[xmlElement.tag] = xmlElement.text
+                    if xmlElements:
+                        # Release the processed elements.
+                        xmlElements[-1].clear()
+                if self.stats is not None:
+                    self.stats.count('bytes read', f.tell())
+        except (Error, GeneratorExit):
+            raise
+
+        except (ET.ParseError, OSError):
+            raise Error(f'{_("Can not process file")}: "{norm_path(self.filePath)}".')
+
+        except:
+            raise Error(f'{_("Can not parse file")}: "{norm_path(self.filePath)}".')
+
+    def write(self, snapshot, keepBackup=True):
+        """Write a collection snapshot to the pwc file.
+
+        Positional arguments:
+            snapshot -- dict: collection data, as returned by Collection.snapshot().
+
+        Optional arguments:
+            keepBackup -- bool: if True, copy the previous file to a .bak file.
+
+        The XML text is generated in a single pass,
+        with the header, the indentation, and the CDATA sections in place.
+        It is written to a temporary file that replaces the pwc file
+        when complete, so there is always a valid pwc file on disk.
+        Overwrite existing file without confirmation.
+        Raise the "Error" exception in case of error.
+        """
+        tags = {BOOK_PREFIX: 'book', SERIES_PREFIX: 'series'}
+
+        def write_tree(elements, level):
+            """Serialize the snapshot elements as XML elements."""
+            indent = self._INDENT * level
+            for prefix, elementId, fields, children in elements:
+                tag = tags[prefix]
+                f.write(f'\n{indent}<{tag} id="{elementId}">')
+                for fieldTag, text in fields:
+                    write_element(fieldTag, text, level + 1)
+                write_tree(children, level + 1)
+                f.write(f'\n{indent}</{tag}>')
+
+        def write_element(tag, text, level):
+            """Write a leaf element with its text as CDATA section."""
+            if text:
+                text = text.replace(']]>', ']]]]><![CDATA[>')
+                f.write(f'\n{self._INDENT * level}<{tag}><![CDATA[{text}]]></{tag}>')
+            else:
+                f.write(f'\n{self._INDENT * level}<{tag} />')
+
+        tempPath = f'{self.filePath}.tmp'
+        try:
+            with open(tempPath, 'w', encoding='utf-8') as f:
+                f.write(self._XML_HEADER)
+                rootTag = f'collection version="{self.MAJOR_VERSION}.{self.MINOR_VERSION}"'
+                if snapshot['elements']:
+                    f.write(f'\n<{rootTag}>')
+                    write_tree(snapshot['elements'], 1)
+                    f.write('\n</collection>\n')
+                else:
+                    f.write(f'\n<{rootTag} />')
+                f.flush()
+                os.fsync(f.fileno())
+                if self.stats is not None:
+                    self.stats.count('bytes written', f.buffer.tell())
+        except:
+            remove_file(tempPath)
+            raise Error(f'{_("Cannot write file")}: "{norm_path(self.filePath)}".')
+
+        try:
+            if keepBackup and os.path.isfile(self.filePath):
+                copyfile(self.filePath, f'{self.filePath}.bak')
+            os.replace(tempPath, self.filePath)
+        except:
+            remove_file(tempPath)
+            raise Error(f'{_("Cannot overwrite file")}: "{norm_path(self.filePath)}".')
+
+
+def remove_file(filePath):
+    try:
+        os.remove(filePath)
+    except OSError:
+        pass
@@ -0,0 +1,146 @@
+"""Provide a class for an inverted index of the collection's titles and descriptions.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+import re
+from bisect import bisect_left
+from bisect import insort
+
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+def split_words(text):
+    """Return a list of the case-folded words of a text."""
+    if not text:
+        return []
+
+    return _WORD_PATTERN.findall(text.casefold())
+
+
+class SearchIndex:
+    """Inverted index of the words in the books' and series' titles and descriptions.
+
+    The words are case-folded. They are held in a sorted list,
+    so all words beginning with a search term are found by bisection.
+
+    Public methods:
+        build(nodes) -- index many nodes at once, replacing the whole index.
+        add(nodeId, *texts) -- index a node's texts, replacing the previous ones.
+        remove(nodeId) -- remove a node from the index.
+        search(query) -- return the IDs of the nodes containing words that begin with all query terms.
+        split(text) -- return the words of a text.
+    """
+    FILTER_LIMIT = 1000
+    # With fewer candidates, further terms are checked against the candidates' words.
+
+    def __init__(self):
+        self._postings = {}
+        # Dictionary:
+        #   keyword -- word
+        #   value -- set of the IDs of the nodes containing the word
+
+        self._words = []
+        # Sorted list of the indexed words.
+
+        self._nodeWords = {}
+        # Dictionary:
+        #   keyword -- node ID
+        #   value -- frozenset of the node's words
+
+    def build(self, nodes):
+        """Index many nodes at once, replacing the whole index.
+
+        Positional arguments:
+            nodes -- iterable of (node ID, texts) tuples, with texts as a tuple of strings or None.
+        """
+        postings = {}
+        nodeWords = {}
+        for nodeId, texts in nodes:
+            words = self._get_words(texts)
+            if words:
+                nodeWords[nodeId] = words
+                for word in words:
+                    nodeIds = postings.get(word, None)
+                    if nodeIds is None:
+                        postings[word] = {nodeId}
+                    else:
+                        nodeIds.add(nodeId)
+        self._postings = postings
+        self._nodeWords = nodeWords
+        self._words = sorted(postings)
+
+    def add(self, nodeId, *texts):
+        """Index a node's texts, replacing the previously indexed ones."""
+        words = self._get_words(texts)
+        oldWords = self._nodeWords.get(nodeId, frozenset())
+        for word in oldWords - words:
+            self._remove_posting(word, nodeId)
+        for word in words - oldWords:
+            if not word in self._postings:
+                self._postings[word] = set()
+                insort(self._words, word)
+            self._postings[word].add(nodeId)
+        if words:
+            self._nodeWords[nodeId] = words
+        else:
+            self._nodeWords.pop(nodeId, None)
+
+    def remove(self, nodeId):
+        for word in self._nodeWords.pop(nodeId, ()):
+            self._remove_posting(word, nodeId)
+
+    def search(self, query):
+        """Return a set of the IDs of the nodes containing words that begin with all query terms.
+
+        Positional arguments:
+            query -- str: search terms, separated by spaces or punctuation.
+
+        The longest terms are looked up first, because they match the fewest nodes.
+        Return an empty set, if the query contains no words.
+        """
+        terms = sorted(set(self.split(query)), key=len, reverse=True)
+        if not terms:
+            return set()
+
+        result = None
+        for term in terms:
+            if result is not None and len(result) < self.FILTER_LIMIT:
+                result = {nodeId for nodeId in result if self._has_prefix(nodeId, term)}
+            else:
+                matches = set()
+                i = bisect_left(self._words, term)
+                while i < len(self._words) and self._words[i].startswith(term):
+                    matches.update(self._postings[self._words[i]])
+                    i += 1
+                if result is None:
+                    result = matches
+                else:
+                    result &= matches
+            if not result:
+                break
+
+        return result
+
+    def split(self, text):
+        """Return a list of the case-folded words of a text."""
+        return split_words(text)
+
+    def _get_words(self, texts):
+        return frozenset(self.split(' '.join(text for text in texts if text)))
+
+    def _has_prefix(self, nodeId, term):
+        """Return True, if the node contains a word that begins with term."""
+        for word in self._nodeWords.get(nodeId, ()):
+            if word.startswith(term):
+                return True
+
+        return False
+
+    def _remove_posting(self, word, nodeId):
+        nodeIds = self._postings[word]
+        nodeIds.discard(nodeId)
+        if not nodeIds:
+            del self._postings[word]
+            del self._words[bisect_left(self._words, word)]
@@ -5,14 +5,22 @@ For further information see https://github.com/peter88213/novelyst_collection
 License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
 """
 from nvcollectionlib.nvcollection_globals import *
+from nvcollectionlib.book_statistics import new_rollup
 
 
 class Series:
     """Book series representation for the collection.
     
     A series has a title and a description. 
+    The counts of its books are rolled up in the statistics.
     """
 
     def __init__(self):
         self.title = None
         self.desc = None
+
+        self.isModified = False
+        # True, if the series has changed since the collection was read or written.
+
+        self.statistics = new_rollup()
+        # Dictionary with the sums of the counted books' statistics, and the number of these books.
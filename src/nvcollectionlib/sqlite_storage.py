@@ -0,0 +1,196 @@
+"""Provide a class for storing a collection in an SQLite database.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+import os
+import sqlite3
+from contextlib import closing
+
+from nvcollectionlib.nvcollection_globals import *
+
+
+class SqliteStorage:
+    """Collection storage in an SQLite database.
+
+    The books and series are held in tables of their own,
+    and their order in a table of tree nodes, indexed by parent and position.
+    Changes are written in a single transaction. If the snapshot tells
+    which elements are modified, only these are written, and the tree
+    nodes are rewritten only if the structure has changed.
+
+    Public methods:
+        read() -- iterate over the books and series of the database.
+        write(snapshot, keepBackup) -- write a collection snapshot to the database.
+
+    Public instance variables:
+        filePath -- str: path to the database file.
+        stats -- CollectionStats instance counting the rows processed, or None.
+    """
+    EXTENSION = '.pwcdb'
+    DESCRIPTION = _('novelyst collection database')
+
+    MAJOR_VERSION = 1
+    MINOR_VERSION = 0
+    # Database schema version.
+
+    _SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS series (id TEXT PRIMARY KEY, title TEXT, desc TEXT);
+        CREATE TABLE IF NOT EXISTS books (id TEXT PRIMARY KEY, path TEXT, title TEXT, desc TEXT);
+        CREATE TABLE IF NOT EXISTS nodes (node TEXT PRIMARY KEY, parent TEXT NOT NULL, position INTEGER NOT NULL);
+        CREATE INDEX IF NOT EXISTS nodes_order ON nodes (parent, position);
+        '''
+
+    def __init__(self, filePath, stats=None):
+        """Initialize the instance variables.
+
+        Positional arguments:
+            filePath -- str: path to the database file.
+
+        Optional arguments:
+            stats -- CollectionStats instance counting the rows processed.
+        """
+        self.filePath = filePath
+        self.stats = stats
+
+    def read(self):
+        """Iterate over the books and series of the database, in tree order.
+
+        Generate (node ID, parent node ID, fields) tuples,
+        with fields as dictionary with the keys 'path', 'title', and 'desc' for books,
+        and 'title' and 'desc' for series.
+        The database is checked before the first node is generated.
+        Raise the "Error" exception in case of error.
+        """
+        if not os.path.isfile(self.filePath):
+            raise Error(f'{_("Can not process file")}: "{norm_path(self.filePath)}".')
+
+        try:
+            with closing(sqlite3.connect(self.filePath)) as connection:
+                self._check_version(connection)
+                books = {}
+                for bkId, path, title, desc in connection.execute('SELECT id, path, title, desc FROM books'):
+                    books[f'{BOOK_PREFIX}{bkId}'] = dict(path=path, title=title, desc=desc)
+                series = {}
+                for srId, title, desc in connection.execute('SELECT id, title, desc FROM series'):
+                    series[f'{SERIES_PREFIX}{srId}'] = dict(title=title, desc=desc)
+                children = {}
+                for node, parent in connection.execute('SELECT node, parent FROM nodes ORDER BY parent, position'):
+                    children.setdefault(parent, []).append(node)
+        except Error:
+            raise
+
+        except sqlite3.Error:
+            raise Error(f'{_("Can not process file")}: "{norm_path(self.filePath)}".')
+
+        if self.stats is not None:
+            self.stats.count('rows read', len(books) + len(series))
+
+        def walk(parent):
+            for node in children.get(parent, []):
+                if node in books:
+                    yield node, parent, books[node]
+
+                elif node in series:
+                    yield node, parent, series[node]
+
+                    yield from walk(node)
+
+        yield from walk('')
+
+    def write(self, snapshot, keepBackup=True):
+        """Write a collection snapshot to the database in a single transaction.
+
+        Positional arguments:
+            snapshot -- dict: collection data, as returned by Collection.snapshot().
+
+        Optional arguments:
+            keepBackup -- bool: not used, because the transaction keeps the database consistent.
+
+        If the snapshot's 'modifiedIds' entry is a list, and the database is not new,
+        only the modified books and series are written, and the tree nodes
+        only if the list contains the empty string.
+        Otherwise, the database content is replaced.
+        Raise the "Error" exception in case of error.
+        """
+        modifiedIds = snapshot.get('modifiedIds', None)
+        bookRows = []
+        seriesRows = []
+        nodeRows = []
+        try:
+            with closing(sqlite3.connect(self.filePath)) as connection:
+                with connection:
+                    connection.executescript(self._SCHEMA)
+                    if connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone() is None:
+                        # New database.
+                        modifiedIds = None
+                    else:
+                        self._check_version(connection)
+                    if modifiedIds is not None:
+                        modifiedIds = set(modifiedIds)
+                    self._collect_rows(snapshot['elements'], '', modifiedIds, bookRows, seriesRows, nodeRows)
+                    if modifiedIds is None:
+                        connection.execute('DELETE FROM books')
+                        connection.execute('DELETE FROM series')
+                    if modifiedIds is None or '' in modifiedIds:
+                        connection.execute('DELETE FROM nodes')
+                        connection.executemany('INSERT INTO nodes (node, parent, position) VALUES (?, ?, ?)', nodeRows)
+                        # Remove the books and series that are no longer in the tree.
+                        connection.execute(f"DELETE FROM books WHERE '{BOOK_PREFIX}' || id NOT IN (SELECT node FROM nodes)")
+                        connection.execute(f"DELETE FROM series WHERE '{SERIES_PREFIX}' || id NOT IN (SELECT node FROM nodes)")
+                    connection.executemany('INSERT OR REPLACE INTO books (id, path, title, desc) VALUES (?, ?, ?, ?)', bookRows)
+                    connection.executemany('INSERT OR REPLACE INTO series (id, title, desc) VALUES (?, ?, ?)', seriesRows)
+                    connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)",
+                                       (f'{self.MAJOR_VERSION}.{self.MINOR_VERSION}',))
+        except Error:
+            raise
+
+        except sqlite3.Error:
+            raise Error(f'{_("Cannot write file")}: "{norm_path(self.filePath)}".')
+
+        if self.stats is not None:
+            self.stats.count('rows written', len(bookRows) + len(seriesRows))
+
+    def _collect_rows(self, elements, parent, modifiedIds, bookRows, seriesRows, nodeRows):
+        """Collect the table rows of the snapshot elements.
+
+        All tree nodes are collected, but only the modified books and series,
+        if a list of modified IDs is given.
+        """
+        for position, (prefix, elementId, fields, children) in enumerate(elements):
+            node = f'{prefix}{elementId}'
+            nodeRows.append((node, parent, position))
+            if modifiedIds is None or node in modifiedIds:
+                values = dict(fields)
+                if prefix == BOOK_PREFIX:
+                    bookRows.append((elementId, values['path'], values['title'], values['desc']))
+                elif prefix == SERIES_PREFIX:
+                    seriesRows.append((elementId, values['title'], values['desc']))
+            self._collect_rows(children, node, modifiedIds, bookRows, seriesRows, nodeRows)
+
+    def _check_version(self, connection):
+        """Raise the "Error" exception, if the database is not a collection of a compatible version."""
+        try:
+            row = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        except sqlite3.Error:
+            row = None
+        if row is None:
+            raise Error(f'{_("No collection found in file")}: "{norm_path(self.filePath)}".')
+
+        try:
+            majorVersionStr, minorVersionStr = row[0].split('.')
+            majorVersion = int(majorVersionStr)
+            minorVersion = int(minorVersionStr)
+        except:
+            raise Error(f'{_("No valid version found in file")}: "{norm_path(self.filePath)}".')
+
+        if majorVersion > self.MAJOR_VERSION:
+            raise Error(_('The collection was created with a newer plugin version.'))
+
+        elif majorVersion < self.MAJOR_VERSION:
+            raise Error(_('The collection was created with an outdated plugin version.'))
+
+        elif minorVersion > self.MINOR_VERSION:
+            raise Error(_('The collection was created with a newer plugin version.'))
@@ -0,0 +1,164 @@
+"""Provide functions for reading the project metadata and content from a yWriter 7 file.
+
+Copyright (c) 2023 Peter Triesberger
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+import re
+import xml.etree.ElementTree as ET
+
+from nvcollectionlib.nvcollection_globals import *
+
+_PROJECT_PATH = ['YWRITER7', 'PROJECT']
+_METADATA_TAGS = dict(
+    Title='title',
+    Desc='desc',
+    )
+_SCENE_TAGS = dict(
+    ID='id',
+    Title='title',
+    Desc='desc',
+    SceneContent='text',
+    Unused='unused',
+    )
+_MARKUP_PATTERN = re.compile(r'\[/?\w+\]|/\*.*?\*/', re.DOTALL)
+# yWriter formatting tags and comments.
+
+_CHAPTER_TAGS = dict(
+    ID='id',
+    Title='title',
+    Type='type',
+    ChapterType='chapterType',
+    Unused='unused',
+    )
+
+
+def read_project_metadata(filePath):
+    """Return a dictionary with the project title and description of a .yw7 file.
+
+    Positional arguments:
+        filePath -- str: path to the yWriter 7 project file.
+
+    The file is parsed as a stream, which stops at the end of the PROJECT element,
+    so the chapters and scenes are not read.
+    Raise the "Error" exception in case of error.
+    """
+    metadata = dict(title=None, desc=None)
+    xmlPath = []
+    # Tags of the currently open XML elements.
+    try:
+        with open(filePath, 'rb') as f:
+            for event, xmlElement in ET.iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    xmlPath.append(xmlElement.tag)
+                    continue
+
+                xmlPath.pop()
+                if xmlPath == _PROJECT_PATH:
+                    if xmlElement.tag in _METADATA_TAGS:
+                        metadata[_METADATA_TAGS[xmlElement.tag]] = xmlElement.text
+                elif xmlPath == _PROJECT_PATH[:1] and xmlElement.tag == _PROJECT_PATH[1]:
+                    return metadata
+
+                xmlElement.clear()
+
+    except (ET.ParseError, OSError):
+        raise Error(f'{_("Cannot read project")}: "{norm_path(filePath)}".')
+
+    raise Error(f'{_("No project found in file")}: "{norm_path(filePath)}".')
+
+
+def read_project_content(filePath):
+    """Return a dictionary with the project metadata, chapters, and scenes of a .yw7 file.
+
+    Positional arguments:
+        filePath -- str: path to the yWriter 7 project file.
+
+    The dictionary has the keys:
+        title -- str: project title.
+        desc -- str: project description.
+        chapters -- list of chapter dictionaries in the project's order, with the keys 
+                    'id', 'title', 'type' (0: normal, 1: notes, 2: to do), 'unused', and 'scenes' (list of scene IDs).
+        scenes -- dictionary of scene dictionaries by scene ID, with the keys 
+                  'title', 'desc', 'text', 'type' (0: normal, 1: notes, 2: to do), and 'unused'.
+    The file is parsed as a stream, discarding the processed XML elements,
+    so the characters, locations, and items are not kept in memory.
+    This function does not access the collection, so it can run in another process.
+    Raise the "Error" exception in case of error.
+    """
+    content = dict(title=None, desc=None, chapters=[], scenes={})
+    xmlPath = []
+    # Tags of the currently open XML elements.
+    fields = None
+    # Texts of the current scene's or chapter's child elements.
+    sceneIds = None
+    # IDs of the current chapter's scenes.
+    isProject = False
+    try:
+        with open(filePath, 'rb') as f:
+            for event, xmlElement in ET.iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    xmlPath.append(xmlElement.tag)
+                    if xmlPath == ['YWRITER7', 'SCENES', 'SCENE'] or xmlPath == ['YWRITER7', 'CHAPTERS', 'CHAPTER']:
+                        fields = {}
+                        sceneIds = []
+                    continue
+
+                xmlPath.pop()
+                depth = len(xmlPath)
+                if depth == 2 and xmlPath == _PROJECT_PATH:
+                    if xmlElement.tag in _METADATA_TAGS:
+                        content[_METADATA_TAGS[xmlElement.tag]] = xmlElement.text
+                elif depth == 1 and xmlElement.tag == _PROJECT_PATH[1]:
+                    isProject = True
+                elif depth == 3 and xmlPath[1] == 'SCENES' and xmlElement.tag in _SCENE_TAGS:
+                    fields[_SCENE_TAGS[xmlElement.tag]] = xmlElement.text
+                elif depth == 4 and xmlPath[1] == 'SCENES' and xmlElement.tag == 'Field_SceneType':
+                    fields['type'] = xmlElement.text
+                elif depth == 3 and xmlPath[1] == 'CHAPTERS' and xmlElement.tag in _CHAPTER_TAGS:
+                    fields[_CHAPTER_TAGS[xmlElement.tag]] = xmlElement.text
+                elif depth == 4 and xmlPath[1] == 'CHAPTERS' and xmlElement.tag == 'ScID':
+                    sceneIds.append(xmlElement.text.strip())
+                elif depth == 2 and xmlElement.tag == 'SCENE' and 'id' in fields:
+                    content['scenes'][fields['id'].strip()] = dict(
+                        title=fields.get('title', None),
+                        desc=fields.get('desc', None),
+                        text=fields.get('text', None),
+                        type=_get_int(fields.get('type', None)),
+                        unused=fields.get('unused', None) == '-1',
+                        )
+                elif depth == 2 and xmlElement.tag == 'CHAPTER' and 'id' in fields:
+                    content['chapters'].append(dict(
+                        id=fields['id'].strip(),
+                        title=fields.get('title', None),
+                        type=_get_int(fields.get('chapterType', fields.get('type', None))),
+                        unused=fields.get('unused', None) == '-1',
+                        scenes=sceneIds,
+                        ))
+                if depth:
+                    xmlElement.clear()
+
+    except (ET.ParseError, OSError, AttributeError):
+        raise Error(f'{_("Cannot read project")}: "{norm_path(filePath)}".')
+
+    if not isProject:
+        raise Error(f'{_("No project found in file")}: "{norm_path(filePath)}".')
+
+    return content
+
+
+def strip_markup(text):
+    """Return a scene text without the yWriter formatting tags and comments."""
+    if not text:
+        return ''
+
+    return _MARKUP_PATTERN.sub(' ', text)
+
+
+def _get_int(text):
+    """Return the integer value of an element's text, or 0."""
+    try:
+        return int(text)
+
+    except (TypeError, ValueError):
+        return 0
@@ -1,33 +1,137 @@
 """A test application for the novelyst_collection plugin.
 
+Usage:
+    pywcollection.py -- start the collection manager.
+    pywcollection.py diff OURS THEIRS -- list the differences of two collection files.
+    pywcollection.py merge OURS THEIRS [-o OUTPUT] -- merge THEIRS into OURS, or into OUTPUT.
+
 For further information see https://github.com/peter88213/novelyst_collection
 License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
 """
-import tkinter as tk
-from pywriter.pywriter_globals import *
-from pywriter.ui.main_tk import MainTk
-from novelyst_collection import Plugin
+import sys
+import argparse
 
 APPLICATION = 'Collection'
 
 
-class CollectionTk(MainTk):
+def start_ui():
+    """Start the collection manager in a test application window."""
+    import tkinter as tk
+    from pywriter.pywriter_globals import _
+    from pywriter.ui.main_tk import MainTk
+    from novelyst_collection import Plugin
+    from nvcollectionlib.content_index import ContentIndexer
 
-    def __init__(self):
-        kwargs = {
-                'root_geometry': '800x500',
-                'yw_last_open': '',
-                'color_text_bg':'white',
-                'color_text_fg':'black',
-                }
-        super().__init__(APPLICATION, **kwargs)
-        self.helpMenu = tk.Menu(self.mainMenu, tearoff=0)
-        self.mainMenu.add_cascade(label=_('Help'), menu=self.helpMenu)
-        plugin = Plugin()
-        plugin.install(self)
+    # Unlike novelyst, the test application can spawn worker processes.
+    ContentIndexer.USE_PROCESSES = True
 
+    class CollectionTk(MainTk):
+
+        def __init__(self):
+            kwargs = {
+                    'root_geometry': '800x500',
+                    'yw_last_open': '',
+                    'color_text_bg':'white',
+                    'color_text_fg':'black',
+                    }
+            super().__init__(APPLICATION, **kwargs)
+            self.helpMenu = tk.Menu(self.mainMenu, tearoff=0)
+            self.mainMenu.add_cascade(label=_('Help'), menu=self.helpMenu)
+            plugin = Plugin()
+            plugin.install(self)
 
-if __name__ == '__main__':
     ui = CollectionTk()
     ui.start()
 
+
+def open_collection(filePath):
+    """Return a Collection instance with the content of the collection file.
+
+    Raise the "Error" exception in case of error.
+    """
+    from nvcollectionlib.nvcollection_globals import Error
+    from nvcollectionlib.nvcollection_globals import _
+    from nvcollectionlib.nvcollection_globals import norm_path
+    from nvcollectionlib.collection import Collection
+
+    collection = Collection(filePath)
+    if collection.filePath is None:
+        raise Error(f'{_("File type is not supported")}: "{norm_path(filePath)}".')
+
+    collection.read()
+    return collection
+
+
+def diff_files(ourPath, theirPath):
+    """Print the differences of two collection files, one line per entry.
+
+    Return True, if the files differ.
+    Raise the "Error" exception in case of error.
+    """
+    collection = open_collection(ourPath)
+    diff = collection.diff(theirPath)
+    for nodeId in diff['added']:
+        print(f'+ {nodeId}')
+    for nodeId in diff['removed']:
+        print(f'- {nodeId}')
+    for nodeId, ourParent, theirParent in diff['moved']:
+        print(f'> {nodeId}: "{ourParent}" -> "{theirParent}"')
+    for nodeId, ourTitle, theirTitle in diff['retitled']:
+        print(f'~ {nodeId}: "{ourTitle}" -> "{theirTitle}"')
+    for nodeId in diff['changed']:
+        print(f'* {nodeId}')
+    return any(diff.values())
+
+
+def merge_files(ourPath, theirPath, outputPath=None):
+    """Merge a collection file into another one, and write the result.
+
+    Positional arguments:
+        ourPath -- str: path to the collection file whose entries are kept.
+        theirPath -- str: path to the collection file whose additional entries are merged.
+
+    Optional arguments:
+        outputPath -- str: path to the merged file; if None, ourPath is overwritten.
+
+    Return a message.
+    Raise the "Error" exception in case of error.
+    """
+    collection = open_collection(ourPath)
+    message = collection.merge(theirPath)
+    if outputPath:
+        return f'{message} {collection.export(outputPath)}'
+
+    return f'{message} {collection.write()}'
+
+
+def main(args=None):
+    """Run the command given by the command line arguments. Return the exit status."""
+    parser = argparse.ArgumentParser(description='Compare and merge collection files, or start the collection manager.')
+    subparsers = parser.add_subparsers(dest='command')
+    diffParser = subparsers.add_parser('diff', help='list the entries added, removed, moved, retitled, and changed in THEIRS')
+    diffParser.add_argument('ours', help='collection file')
+    diffParser.add_argument('theirs', help='collection file to compare with')
+    mergeParser = subparsers.add_parser('merge', help='add the entries of THEIRS that are not in OURS')
+    mergeParser.add_argument('ours', help='collection file whose entries are kept')
+    mergeParser.add_argument('theirs', help='collection file to merge')
+    mergeParser.add_argument('-o', '--output', help='merged collection file; default: overwrite OURS')
+    args = parser.parse_args(args)
+    if args.command is None:
+        start_ui()
+        return 0
+
+    from nvcollectionlib.nvcollection_globals import Error
+    try:
+        if args.command == 'diff':
+            return int(diff_files(args.ours, args.theirs))
+
+        print(merge_files(args.ours, args.theirs, args.output))
+        return 0
+
+    except Error as ex:
+        print(f'!{str(ex)}', file=sys.stderr)
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,353 @@
+"""Benchmarks for the novelyst_collection project.
+
+Generate synthetic collections with stub yWriter projects,
+and measure the time and peak memory of the collection operations.
+The results are written as JSON, and can be compared with a baseline
+from a previous run, e.g. before and after a change:
+
+    python benchmark_collection.py --sizes 100 10000 --output before.json
+    python benchmark_collection.py --sizes 100 10000 --baseline before.json
+
+For further information see https://github.com/peter88213/novelyst_collection
+License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from shutil import rmtree
+
+from nvcollectionlib.collection import Collection
+from nvcollectionlib.collection_cache import CollectionCache
+from nvcollectionlib.collection_diff import diff_nodes
+from nvcollectionlib.collection_diff import merge_collections
+from nvcollectionlib.book import Book
+
+DEFAULT_SIZES = [100, 10000]
+SERIES_SIZE = 10
+# Number of books per series; every other series' books are kept at the top level.
+
+ADD_COUNT = 100
+# Number of books added one by one in the add_book benchmark.
+
+MOVE_COUNT = 1000
+# Number of tree moves in the tree_move benchmark.
+
+CHANGE_INTERVAL = 100
+# Every CHANGE_INTERVAL-th entry is retitled, removed, or moved in the compared collection.
+
+DEFAULT_THRESHOLD = 0.2
+# Relative slowdown regarded as a regression.
+
+YW7_TEMPLATE = '''<?xml version="1.0" encoding="utf-8"?>
+<YWRITER7>
+  <PROJECT>
+    <Ver>7</Ver>
+    <Title><![CDATA[{title}]]></Title>
+    <Desc><![CDATA[{desc}]]></Desc>
+  </PROJECT>
+  <LOCATIONS />
+  <ITEMS />
+  <CHARACTERS />
+  <PROJECTNOTES />
+  <SCENES>
+{scenes}
+  </SCENES>
+  <CHAPTERS>
+    <CHAPTER>
+      <ID>1</ID>
+      <Title><![CDATA[Chapter 1]]></Title>
+      <Scenes>
+{sceneIds}
+      </Scenes>
+    </CHAPTER>
+  </CHAPTERS>
+</YWRITER7>
+'''
+SCENE_TEMPLATE = '''    <SCENE>
+      <ID>{scId}</ID>
+      <Title><![CDATA[Scene {scId}]]></Title>
+      <SceneContent><![CDATA[{text}]]></SceneContent>
+    </SCENE>'''
+SCENE_COUNT = 10
+SCENE_TEXT = 'The quick brown fox jumps over the lazy dog. ' * 50
+
+
+class StubNovel:
+    """Minimal stand-in for a novel, providing the metadata used by Collection.add_book."""
+
+    def __init__(self, title, desc):
+        self.title = title
+        self.desc = desc
+
+
+class StubProject:
+    """Minimal stand-in for a project file, as passed to Collection.add_book."""
+
+    def __init__(self, filePath, title, desc):
+        self.filePath = filePath
+        self.novel = StubNovel(title, desc)
+
+
+def write_project(filePath, title):
+    """Write a stub yWriter 7 project with some scenes."""
+    scenes = '\n'.join(SCENE_TEMPLATE.format(scId=i, text=SCENE_TEXT) for i in range(1, SCENE_COUNT + 1))
+    sceneIds = '\n'.join(f'        <ScID>{i}</ScID>' for i in range(1, SCENE_COUNT + 1))
+    os.makedirs(os.path.dirname(filePath), exist_ok=True)
+    with open(filePath, 'w', encoding='utf-8') as f:
+        f.write(YW7_TEMPLATE.format(title=title, desc=f'Description of {title}.', scenes=scenes, sceneIds=sceneIds))
+
+
+def project_path(workDir, bookNumber):
+    return f'{workDir}/projects/{bookNumber // 1000:03}/Book {bookNumber}.yw/Book {bookNumber}.yw7'
+
+
+def generate_collection(workDir, size, withProjects=True):
+    """Write a synthetic collection file with size books, and return its path.
+
+    Positional arguments:
+        workDir -- str: directory for the collection and the projects.
+        size -- int: number of books.
+
+    Optional arguments:
+        withProjects -- bool: if True, write a stub project for each book.
+    """
+    filePath = f'{workDir}/collection_{size}.pwc'
+    bookNumber = 0
+    seriesNumber = 0
+    with open(filePath, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n<collection version="1.0">\n')
+        while bookNumber < size:
+            seriesNumber += 1
+            count = min(SERIES_SIZE, size - bookNumber)
+            inSeries = seriesNumber % 2 == 0
+            indent = '  '
+            if inSeries:
+                f.write(f'  <series id="{seriesNumber}">\n')
+                f.write(f'    <title><![CDATA[Series {seriesNumber}]]></title>\n')
+                f.write(f'    <desc><![CDATA[Description of series {seriesNumber}.]]></desc>\n')
+                indent = '    '
+            for __ in range(count):
+                bookNumber += 1
+                bookPath = project_path(workDir, bookNumber)
+                if withProjects:
+                    write_project(bookPath, f'Book {bookNumber}')
+                f.write(f'{indent}<book id="{bookNumber}">\n')
+                f.write(f'{indent}  <path><![CDATA[{bookPath}]]></path>\n')
+                f.write(f'{indent}  <title><![CDATA[Book {bookNumber}]]></title>\n')
+                f.write(f'{indent}  <desc><![CDATA[Description of book {bookNumber}.]]></desc>\n')
+                f.write(f'{indent}</book>\n')
+            if inSeries:
+                f.write('  </series>\n')
+        f.write('</collection>\n')
+    return filePath
+
+
+def measure(function):
+    """Run function, and return a tuple: result, seconds, peak memory in KiB."""
+    tracemalloc.start()
+    startTime = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - startTime
+    __, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak // 1024
+
+
+def measure_plugin_import():
+    """Import the plugin module in a new interpreter, and return the measurements.
+
+    The startup of novelyst waits for the plugin imports,
+    so the collection manager must not be imported with the plugin.
+    """
+    script = ('import sys, time; startTime = time.perf_counter(); import novelyst_collection; '
+              'print(time.perf_counter() - startTime, len(sys.modules), '
+              '"nvcollectionlib.collection_manager" in sys.modules)')
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+    output = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True, text=True, check=True).stdout
+    seconds, modules, managerImported = output.split()
+    if managerImported == 'True':
+        print('Warning: the collection manager is imported with the plugin.')
+    return dict(import_plugin=dict(seconds=round(float(seconds), 6), peak_kib=0, modules=int(modules)))
+
+
+def run_benchmarks(workDir, size, withProjects, view=None):
+    """Return a dictionary of the measurements for a collection with size books."""
+    results = {}
+
+    def record(name, function):
+        result, seconds, peak = measure(function)
+        results[name] = dict(seconds=round(seconds, 6), peak_kib=peak)
+        return result
+
+    filePath = generate_collection(workDir, size, withProjects)
+    fileSize = os.path.getsize(filePath)
+
+    collection = Collection(filePath, view)
+    record('read', collection.read)
+    results['read']['bytes'] = fileSize
+    record('write', collection.write)
+
+    # Read via the snapshot cache: the first read fills it, the second one uses it.
+    cache = CollectionCache(filePath)
+    cache.remove()
+    cachedCollection = Collection(filePath, view)
+    cachedCollection.cache = cache
+    record('read_fill_cache', cachedCollection.read)
+    cachedCollection = Collection(filePath, view)
+    cachedCollection.cache = cache
+    record('read_cached', cachedCollection.read)
+    cachedCollection.reset_tree()
+    cachedCollection = None
+    cache.remove()
+
+    # The first search builds the index.
+    record('build_search_index', lambda: collection.search('book'))
+    record('search_prefix', lambda: collection.search('boo 1'))
+
+    if withProjects:
+        record('check_availability', collection.check_availability)
+        record('refresh_books', collection.refresh_books)
+
+    # Compare and merge with a changed copy of the collection.
+    ourNodes = collection.read_nodes()
+    theirNodes = []
+    for i, (nodeId, parent, fields) in enumerate(ourNodes):
+        if i % CHANGE_INTERVAL == 1:
+            fields = dict(fields, title=f'{fields["title"]} (changed)')
+        elif i % CHANGE_INTERVAL == 2 and nodeId.startswith('bk'):
+            continue
+
+        elif i % CHANGE_INTERVAL == 3 and nodeId.startswith('bk'):
+            parent = ''
+        theirNodes.append((nodeId, parent, fields))
+    for i in range(ADD_COUNT):
+        bookNumber = size * 2 + i + 1
+        theirNodes.append((f'bk{bookNumber}', '', dict(path=project_path(workDir, bookNumber), title=f'Book {bookNumber}', desc=None)))
+    record('diff_collections', lambda: diff_nodes(ourNodes, theirNodes))
+    record('merge_collections', lambda: merge_collections(ourNodes, theirNodes))
+
+    # Add books one by one, and as a batch.
+    newProjects = []
+    for i in range(ADD_COUNT * 2):
+        bookNumber = size + i + 1
+        bookPath = project_path(workDir, bookNumber)
+        write_project(bookPath, f'Book {bookNumber}')
+        newProjects.append(StubProject(bookPath, f'Book {bookNumber}', 'New book.'))
+
+    def add_one_by_one():
+        for project in newProjects[:ADD_COUNT]:
+            collection.add_book(project)
+
+    record('add_book', add_one_by_one)
+    results['add_book']['count'] = ADD_COUNT
+
+    def add_as_batch():
+        books = []
+        for project in newProjects[ADD_COUNT:]:
+            book = Book(project.filePath)
+            book.title = project.novel.title
+            books.append(book)
+        collection.add_books(books)
+
+    record('add_books', add_as_batch)
+    results['add_books']['count'] = ADD_COUNT
+
+    # Move books between the top level and the series, as the collection manager does.
+    tree = collection.tree
+    seriesNodes = [node for node in tree.get_children('') if node.startswith('sr')]
+    bookNodes = [node for node in tree.get_children('') if node.startswith('bk')]
+
+    def move_nodes():
+        for i in range(min(MOVE_COUNT, len(bookNodes))):
+            if seriesNodes:
+                tree.move(bookNodes[i], seriesNodes[i % len(seriesNodes)], 0)
+            tree.move(bookNodes[i], '', tree.index(bookNodes[-1]))
+
+    record('tree_move', move_nodes)
+
+    def remove_series():
+        for seriesNode in seriesNodes:
+            collection.remove_series_with_books(seriesNode)
+
+    record('remove_series_with_books', remove_series)
+    results['remove_series_with_books']['count'] = len(seriesNodes)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return a list of messages about operations slower than the baseline by more than threshold."""
+    regressions = []
+    for size in results['results']:
+        for name in results['results'][size]:
+            try:
+                before = baseline['results'][size][name]['seconds']
+            except KeyError:
+                continue
+
+            after = results['results'][size][name]['seconds']
+            if before > 0 and after > before * (1 + threshold):
+                regressions.append(f'{name} ({size} books): {before:.4f} s -> {after:.4f} s (+{(after / before - 1) * 100:.0f}%)')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the collection operations.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='numbers of books, e.g. 100 10000 100000')
+    parser.add_argument('--output', default='benchmark_results.json',
+                        help='JSON file for the results')
+    parser.add_argument('--baseline',
+                        help='JSON results of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='relative slowdown regarded as a regression')
+    parser.add_argument('--no-projects', action='store_true',
+                        help='do not write stub projects for the collection books')
+    parser.add_argument('--tk', action='store_true',
+                        help='display the collection in a ttk.Treeview (requires a display)')
+    args = parser.parse_args()
+
+    view = None
+    if args.tk:
+        from tkinter import ttk
+        view = ttk.Treeview()
+
+    results = dict(
+        python=platform.python_version(),
+        platform=platform.platform(),
+        timestamp=time.strftime('%Y-%m-%d %H:%M:%S'),
+        results={},
+        )
+    results['results']['startup'] = measure_plugin_import()
+    for name, values in results['results']['startup'].items():
+        print(f'{"startup":>13}  {name:<26} {values["seconds"]:>10.4f} s  {values["modules"]:>5} modules')
+    for size in args.sizes:
+        workDir = tempfile.mkdtemp(prefix='pwc_benchmark_')
+        try:
+            results['results'][str(size)] = run_benchmarks(workDir, size, not args.no_projects, view)
+        finally:
+            rmtree(workDir, ignore_errors=True)
+        for name, values in results['results'][str(size)].items():
+            print(f'{size:>7} books  {name:<26} {values["seconds"]:>10.4f} s  {values["peak_kib"]:>9} KiB')
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results written to "{args.output}".')
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for message in regressions:
+            print(f'Regression: {message}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
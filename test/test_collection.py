@@ -7,17 +7,38 @@ License: GNU GPLv3 (https://www.gnu.org/licenses/gpl-3.0.en.html)
 """
 
 import os
+import subprocess
+import sys
+import time
 import unittest
 from shutil import copyfile
 from shutil import rmtree
 from tkinter import ttk
 
+import pywcollection
+from nvcollectionlib.nvcollection_globals import Error
 from nvcollectionlib.collection import Collection
+from nvcollectionlib.collection_journal import CollectionJournal
+from nvcollectionlib.collection_cache import CollectionCache
+from nvcollectionlib.collection_lock import CollectionLock
+from nvcollectionlib.collection_lock import CollectionLockedError
+from nvcollectionlib.content_index import ContentIndex
+from nvcollectionlib.content_index import ContentIndexer
+from nvcollectionlib.project_import import ProjectImporter
+from nvcollectionlib.metadata_cache import MetadataCache
+from nvcollectionlib.lazy_tree_view import LazyTreeView
+from nvcollectionlib.book_statistics import read_statistics
 from pywriter.yw.yw7_file import Yw7File
 from pywriter.model.novel import Novel
 
 DATA_PATH = '../data'
 TEST_FILE = 'collection.pwc'
+DB_FILE = 'collection.pwcdb'
+OTHER_FILE = 'other_collection.pwc'
+CACHE_FILE = 'collection_cache.json'
+CONTENT_INDEX_FILE = 'collection_content.db'
+STATISTICS_FILE = 'collection_statistics.csv'
+SCENES_PROJECT = 'yWriter Projects/Shadow Scenes.yw/Shadow Scenes.yw7'
 
 os.chdir('yw7')
 
@@ -30,6 +51,45 @@ def read_file(inputFile):
 def remove_all_testfiles():
     try:
         os.remove(TEST_FILE)
+    except:
+        pass
+    try:
+        os.remove(f'{TEST_FILE}.bak')
+    except:
+        pass
+    try:
+        os.remove(f'{TEST_FILE}.journal')
+    except:
+        pass
+    try:
+        os.remove(f'{TEST_FILE}.cache')
+    except:
+        pass
+    try:
+        os.remove(f'{TEST_FILE}.lock')
+    except:
+        pass
+    try:
+        os.remove(OTHER_FILE)
+    except:
+        pass
+    try:
+        os.remove(DB_FILE)
+    except:
+        pass
+    try:
+        os.remove(CACHE_FILE)
+    except:
+        pass
+    try:
+        os.remove(CONTENT_INDEX_FILE)
+    except:
+        pass
+    try:
+        os.remove(STATISTICS_FILE)
+    except:
+        pass
+    try:
         rmtree('yWriter Projects')
     except:
         pass
@@ -62,6 +122,15 @@ class NrmOpr(unittest.TestCase):
         copyfile(DATA_PATH + '/yWriter Projects/The Refugee Ship.yw/The Refugee Ship.yw7',
                  'yWriter Projects/The Refugee Ship.yw/The Refugee Ship.yw7')
 
+    def test_defer_manager_import(self):
+        """Load the plugin without importing the collection manager. """
+        script = ('import sys; import novelyst_collection; '
+                  'print(sorted(name for name in ("nvcollectionlib.collection_manager", "nvcollectionlib.collection", '
+                  '"tkinter.filedialog", "webbrowser") if name in sys.modules))')
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+        output = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), '[]')
+
     def test_read_write_configuration(self):
         """Read and write the configuration file. """
         copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
@@ -74,6 +143,456 @@ class NrmOpr(unittest.TestCase):
         self.assertEqual(read_file(TEST_FILE),
                          read_file(DATA_PATH + '/_collection/read_write.xml'))
 
+    def test_load_in_batches(self):
+        """Read the collection file first, and then load the nodes in batches. """
+        copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        nodes = myCollection.read_nodes()
+        self.assertEqual(myCollection.books, {})
+        myCollection.begin_load()
+        for i in range(0, len(nodes), 2):
+            myCollection.load_nodes(nodes[i:i + 2])
+        self.assertEqual(myCollection.finish_load(),
+                         '2 Books found in "' + TEST_FILE + '".')
+        os.remove(TEST_FILE)
+        myCollection.write()
+        self.assertEqual(read_file(TEST_FILE),
+                         read_file(DATA_PATH + '/_collection/read_write.xml'))
+
+    def test_reload(self):
+        """Reload a collection changed by another program, applying only the differences. """
+        copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        myCollection.read()
+        myCollection.set_statistics('1', dict(words=100, chapters=2, scenes=3, unusedScenes=0))
+        myCollection.remove_series('sr3')
+        otherCollection = Collection(TEST_FILE)
+        otherCollection.read()
+        otherCollection.remove_series('sr1')
+        otherCollection.move_node('bk2', '', 0)
+        otherCollection.set_title('bk1', 'Gravity')
+        otherCollection.write()
+        self.assertEqual(myCollection.reload(keepChanges=False),
+                         '"' + TEST_FILE + '" reloaded: 1 added, 1 removed, 1 moved, 1 changed.')
+        self.assertEqual(myCollection.snapshot()['elements'], otherCollection.snapshot()['elements'])
+        self.assertFalse(myCollection.is_modified())
+        self.assertEqual(myCollection.get_book_ids_by_title('Gravity'), ['1'])
+        self.assertEqual(myCollection.get_statistics('sr2')['books'], 1)
+        self.assertEqual(myCollection.search('space'), {'bk1', 'bk2', 'sr2', 'sr3'})
+        self.assertEqual(myCollection.reload(),
+                         '"' + TEST_FILE + '" reloaded: 0 added, 0 removed, 0 moved, 0 changed.')
+
+    def test_reload_keep_changes(self):
+        """Reload a collection changed by another program, keeping the journaled changes. """
+        copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        myCollection.journal = CollectionJournal(TEST_FILE)
+        myCollection.read()
+        myCollection.set_title('bk1', 'Gravity')
+        otherCollection = Collection(TEST_FILE)
+        otherCollection.read()
+        otherCollection.set_title('sr3', 'Captain Conner Stories')
+        otherCollection.write()
+        self.assertEqual(myCollection.reload(),
+                         'Changes merged from "' + TEST_FILE + '": 0 added, 0 removed, 0 moved, 1 changed.')
+        self.assertEqual(myCollection.books['1'].title, 'Gravity')
+        self.assertEqual(myCollection.series['3'].title, 'Captain Conner Stories')
+        self.assertTrue(myCollection.is_modified())
+        myCollection.journal.close()
+        self.assertEqual(len(myCollection.journal.read()), 1)
+        self.assertFalse(myCollection.journal.isOutdated)
+
+        myCollection.reload(keepChanges=False)
+        self.assertEqual(myCollection.books['1'].title, 'The Gravity Monster')
+        self.assertFalse(myCollection.is_modified())
+        myCollection.journal.close()
+        self.assertEqual(myCollection.journal.read(), [])
+
+    def test_merge_concurrent_changes(self):
+        """Merge the changes saved by another user instead of overwriting them. """
+        copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        myCollection.read()
+        otherCollection = Collection(TEST_FILE)
+        otherCollection.read()
+        myCollection.set_title('bk1', 'Gravity')
+        myCollection.set_title('sr1', 'Standalone books')
+        myCollection.add_series('Space Opera')
+        otherCollection.set_desc('sr3', 'Swashbuckling.')
+        otherCollection.set_title('sr1', 'Single books')
+        otherCollection.move_node('bk2', '', 0)
+        otherCollection.add_series('Fantasy')
+        otherCollection.write()
+        self.assertEqual(myCollection.write(), '"' + TEST_FILE + '" written.')
+        mergedCollection = Collection(TEST_FILE)
+        mergedCollection.read()
+        self.assertEqual(mergedCollection.tree.get_children(''), ('bk2', 'sr1', 'sr2', 'sr3', 'sr4', 'sr5'))
+        self.assertEqual(mergedCollection.books['1'].title, 'Gravity')
+        self.assertEqual(mergedCollection.series['1'].title, 'Standalone books')
+        self.assertEqual(mergedCollection.series['3'].desc, 'Swashbuckling.')
+        self.assertEqual(mergedCollection.series['4'].title, 'Fantasy')
+        self.assertEqual(mergedCollection.series['5'].title, 'Space Opera')
+        self.assertEqual(myCollection.snapshot()['elements'], mergedCollection.snapshot()['elements'])
+        self.assertFalse(myCollection.is_modified())
+
+    def test_diff_merge_collections(self):
+        """Compare a collection with another collection file, and merge the other file's additions. """
+        copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
+        otherCollection = Collection(TEST_FILE)
+        otherCollection.read()
+        otherCollection.set_title('bk1', 'Gravity')
+        otherCollection.move_node('bk2', '', 0)
+        otherCollection.set_desc('sr3', 'Swashbuckling.')
+        otherCollection.add_series('Fantasy')
+        otherCollection.export(OTHER_FILE)
+        myCollection = Collection(TEST_FILE)
+        myCollection.read()
+        self.assertEqual(myCollection.diff(OTHER_FILE),
+                         dict(added=['sr4'], removed=[], moved=[('bk2', 'sr2', '')],
+                              retitled=[('bk1', 'The Gravity Monster', 'Gravity')], changed=['sr3']))
+        self.assertEqual(myCollection.merge(OTHER_FILE),
+                         '"' + OTHER_FILE + '" merged: 1 added, 0 changed.')
+        self.assertTrue(myCollection.is_modified())
+        self.assertEqual(myCollection.tree.get_children(''), ('sr1', 'sr2', 'sr3', 'sr4'))
+        self.assertEqual(myCollection.tree.get_children('sr2'), ('bk1', 'bk2'))
+        self.assertEqual(myCollection.books['1'].title, 'The Gravity Monster')
+        self.assertEqual(myCollection.series['4'].title, 'Fantasy')
+        self.assertEqual(myCollection.diff(OTHER_FILE)['added'], [])
+
+    def test_diff_command_line(self):
+        """Compare collection files on the command line, rejecting unsupported files. """
+        copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
+        copyfile(DATA_PATH + '/_collection/read_write.xml', OTHER_FILE)
+        self.assertEqual(pywcollection.main(['diff', TEST_FILE, OTHER_FILE]), 0)
+        self.assertEqual(pywcollection.main(['diff', STATISTICS_FILE, OTHER_FILE]), 2)
+        self.assertEqual(pywcollection.main(['merge', TEST_FILE, STATISTICS_FILE]), 2)
+
+    def test_lock_collection(self):
+        """Do not write the collection file while another user's lock exists. """
+        copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        myCollection.read()
+        myCollection.set_title('bk1', 'Gravity')
+        with CollectionLock(TEST_FILE):
+            lock = CollectionLock(TEST_FILE, timeout=0)
+            self.assertRaises(Error, lock.acquire)
+            myCollection.lockTimeout = 0
+            self.assertRaises(CollectionLockedError, myCollection.write)
+        self.assertTrue(myCollection.is_modified())
+        self.assertEqual(myCollection.write(), '"' + TEST_FILE + '" written.')
+        self.assertFalse(os.path.isfile(f'{TEST_FILE}.lock'))
+
+    def test_refresh_lock(self):
+        """Keep a lock held during a slow write from being regarded as stale. """
+        lock = CollectionLock(TEST_FILE)
+        lock.REFRESH_SECONDS = 0.05
+        with lock:
+            os.utime(lock.filePath, (0, 0))
+            time.sleep(0.5)
+            self.assertFalse(CollectionLock(TEST_FILE)._remove_stale_lock())
+        self.assertFalse(os.path.isfile(lock.filePath))
+
+    def test_read_write_headless(self):
+        """Read, modify, and write a collection without a Treeview. """
+        copyfile(DATA_PATH + '/_collection/empty_series.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        self.assertEqual(myCollection.read(),
+                         '1 Books found in "' + TEST_FILE + '".')
+        self.assertEqual(myCollection.tree.get_children(''), ('bk1', 'sr1'))
+        myCollection.tree.move('bk1', 'sr1', 'end')
+        self.assertEqual(myCollection.write(),
+                         '"' + TEST_FILE + '" written.')
+        self.assertEqual(read_file(TEST_FILE),
+                         read_file(DATA_PATH + '/_collection/add_book_to_series.xml'))
+
+    def test_collection_stats(self):
+        """Count the books, bytes, and view calls of reading and writing. """
+        copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
+        fileSize = os.path.getsize(TEST_FILE)
+        myCollection = Collection(TEST_FILE, ttk.Treeview())
+        myCollection.read()
+        myCollection.write()
+        stats = myCollection.stats
+        self.assertEqual(stats.get_count('books read'), 2)
+        self.assertEqual(stats.get_count('books written'), 2)
+        self.assertEqual(stats.get_count('bytes read'), fileSize)
+        self.assertEqual(stats.get_count('bytes written'), os.path.getsize(TEST_FILE))
+        self.assertGreater(stats.get_count('view calls'), 0)
+        self.assertIn('read', stats.as_dict()['timers'])
+        self.assertIn('write', stats.as_dict()['timers'])
+
+    def test_write_atomic(self):
+        """Replace the collection file when complete, keeping a backup. """
+        copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        myCollection.read()
+        myCollection.remove_book('bk1')
+        myCollection.write()
+        self.assertFalse(os.path.isfile(f'{TEST_FILE}.tmp'))
+        self.assertEqual(read_file(f'{TEST_FILE}.bak'),
+                         read_file(DATA_PATH + '/_collection/read_write.xml'))
+        os.remove(f'{TEST_FILE}.bak')
+        myCollection.keepBackup = False
+        myCollection.write()
+        self.assertFalse(os.path.isfile(f'{TEST_FILE}.bak'))
+
+    def test_track_modifications(self):
+        """Track the modified elements, and write a snapshot. """
+        copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        myCollection.read()
+        self.assertFalse(myCollection.is_modified())
+        myCollection.set_title('bk1', myCollection.books['1'].title)
+        self.assertFalse(myCollection.is_modified())
+        myCollection.set_title('bk1', 'New title')
+        self.assertTrue(myCollection.books['1'].isModified)
+        self.assertEqual(myCollection.get_modified_ids(), ['bk1'])
+        snapshot = myCollection.snapshot()
+        myCollection.move_node('bk1', '', 0)
+        myCollection.write_snapshot(snapshot)
+        myCollection.clear_modified(snapshot['changeCount'])
+        self.assertFalse(myCollection.books['1'].isModified)
+        self.assertEqual(myCollection.get_modified_ids(), [''])
+        myCollection.write()
+        self.assertFalse(myCollection.is_modified())
+
+    def test_replay_journal(self):
+        """Log the changes in a journal, and replay them on reading. """
+        copyfile(DATA_PATH + '/_collection/empty_series.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        myCollection.journal = CollectionJournal(TEST_FILE)
+        myCollection.read()
+        myCollection.move_node('bk1', 'sr1', 'end')
+        myCollection.set_title('bk1', 'New title')
+        myCollection.journal.close()
+        self.assertEqual(read_file(TEST_FILE),
+                         read_file(DATA_PATH + '/_collection/empty_series.xml'))
+
+        myCollection = Collection(TEST_FILE)
+        myCollection.journal = CollectionJournal(TEST_FILE)
+        myCollection.read()
+        self.assertEqual(myCollection.tree.get_children('sr1'), ('bk1',))
+        self.assertEqual(myCollection.books['1'].title, 'New title')
+        self.assertTrue(myCollection.is_modified())
+        myCollection.set_title('bk1', 'The Gravity Monster')
+        myCollection.write()
+        myCollection.journal.close()
+        self.assertEqual(myCollection.journal.read(), [])
+        self.assertEqual(read_file(TEST_FILE),
+                         read_file(DATA_PATH + '/_collection/add_book_to_series.xml'))
+
+    def test_replay_outdated_journal(self):
+        """Replay the journal on top of a file saved by another user in the meantime. """
+        copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        myCollection.journal = CollectionJournal(TEST_FILE)
+        myCollection.read()
+        myCollection.set_title('bk1', 'Gravity')
+        myCollection.journal.close()
+        otherCollection = Collection(TEST_FILE)
+        otherCollection.read()
+        otherCollection.set_title('sr3', 'Captain Conner Stories')
+        otherCollection.write()
+
+        myCollection = Collection(TEST_FILE)
+        myCollection.journal = CollectionJournal(TEST_FILE)
+        self.assertEqual(myCollection.read(),
+                         '2 Books found in "' + TEST_FILE + '". 1 unsaved changes restored; '
+                         'the file has been changed by another program in the meantime.')
+        self.assertEqual(myCollection.books['1'].title, 'Gravity')
+        self.assertEqual(myCollection.series['3'].title, 'Captain Conner Stories')
+        self.assertTrue(myCollection.is_modified())
+        myCollection.journal.close()
+        self.assertEqual(len(myCollection.journal.read()), 1)
+        self.assertFalse(myCollection.journal.isOutdated)
+
+    def test_snapshot_cache(self):
+        """Load the collection from the cache, if the file is unchanged. """
+        copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        myCollection.cache = CollectionCache(TEST_FILE)
+        myCollection.read()
+        self.assertEqual(myCollection.stats.get_count('cache hits'), 0)
+        self.assertTrue(os.path.isfile(f'{TEST_FILE}.cache'))
+
+        myCollection = Collection(TEST_FILE)
+        myCollection.cache = CollectionCache(TEST_FILE)
+        self.assertEqual(myCollection.read(),
+                         '2 Books found in "' + TEST_FILE + '".')
+        self.assertEqual(myCollection.stats.get_count('cache hits'), 1)
+        myCollection.remove_book('bk1')
+        myCollection.write()
+
+        myCollection = Collection(TEST_FILE)
+        myCollection.cache = CollectionCache(TEST_FILE)
+        self.assertEqual(myCollection.read(),
+                         '1 Books found in "' + TEST_FILE + '".')
+        self.assertEqual(myCollection.stats.get_count('cache hits'), 1)
+
+        copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        myCollection.cache = CollectionCache(TEST_FILE)
+        self.assertEqual(myCollection.read(),
+                         '2 Books found in "' + TEST_FILE + '".')
+        self.assertEqual(myCollection.stats.get_count('cache hits'), 0)
+
+    def test_sqlite_storage(self):
+        """Export a collection to a database, and write it incrementally. """
+        copyfile(DATA_PATH + '/_collection/empty_series.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        myCollection.read()
+        self.assertEqual(myCollection.export(DB_FILE),
+                         '"' + DB_FILE + '" written.')
+        myCollection = Collection(DB_FILE)
+        self.assertEqual(myCollection.read(),
+                         '1 Books found in "' + DB_FILE + '".')
+        self.assertEqual(myCollection.tree.get_children(''), ('bk1', 'sr1'))
+        myCollection.move_node('bk1', 'sr1', 'end')
+        myCollection.set_title('sr1', myCollection.series['1'].title)
+        myCollection.write()
+        self.assertEqual(myCollection.stats.get_count('rows written'), 0)
+        myCollection = Collection(DB_FILE)
+        myCollection.read()
+        self.assertEqual(myCollection.tree.get_children('sr1'), ('bk1',))
+        os.remove(TEST_FILE)
+        myCollection.export(TEST_FILE)
+        self.assertEqual(read_file(TEST_FILE),
+                         read_file(DATA_PATH + '/_collection/add_book_to_series.xml'))
+
+    def test_search(self):
+        """Find books and series by the beginnings of the words in their titles and descriptions. """
+        copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        myCollection.read()
+        self.assertEqual(myCollection.search('GRAV'), {'bk1'})
+        self.assertEqual(myCollection.search('rick star'), {'bk1', 'bk2', 'sr2'})
+        self.assertEqual(myCollection.search('rick star alien'), {'bk2'})
+        self.assertEqual(myCollection.search('--'), set())
+        myCollection.set_title('bk1', 'Zebra crossing')
+        self.assertEqual(myCollection.search('grav'), set())
+        self.assertEqual(myCollection.search('zebra'), {'bk1'})
+        myCollection.set_desc('sr3', 'Quokka')
+        self.assertEqual(myCollection.search('quokka'), {'sr3'})
+        myCollection.remove_book('bk1')
+        self.assertEqual(myCollection.search('zebra'), set())
+
+    def test_content_index(self):
+        """Index the manuscripts' scenes, and update the index when a project changes. """
+        os.mkdir('yWriter Projects/Shadow Scenes.yw')
+        copyfile(DATA_PATH + '/' + SCENES_PROJECT, SCENES_PROJECT)
+        projects = [SCENES_PROJECT, 'yWriter Projects/The Gravity Monster.yw/The Gravity Monster.yw7']
+        contentIndex = ContentIndex(CONTENT_INDEX_FILE)
+        indexer = ContentIndexer(contentIndex, projects)
+        indexer.start()
+        self.assertTrue(indexer.wait(60))
+        self.assertEqual(indexer.get_progress(), (2, 2))
+        self.assertEqual(indexer.get_messages(), [])
+        self.assertEqual([scene['scId'] for scene in contentIndex.search('crater')], ['1', '2'])
+        self.assertEqual([scene['scId'] for scene in contentIndex.search('ARCA hatch')], ['1', '4'])
+        self.assertEqual(contentIndex.search('shorten'), [])
+        self.assertEqual(contentIndex.search('crater', projects[1:]), [])
+        self.assertEqual(contentIndex.search('arrival')[0],
+                         dict(path=SCENES_PROJECT, book='Shadow Scenes', chapter='Chapter 1', scId='1', scene='Arrival'))
+        self.assertEqual(contentIndex.get_outdated(projects), [])
+        os.remove(SCENES_PROJECT)
+        self.assertEqual(contentIndex.get_outdated(projects), [])
+        self.assertEqual(contentIndex.search('crater'), [])
+
+    def test_statistics(self):
+        """Count the books' words, chapters, and scenes, and keep the roll-ups up to date. """
+        os.mkdir('yWriter Projects/Shadow Scenes.yw')
+        copyfile(DATA_PATH + '/' + SCENES_PROJECT, SCENES_PROJECT)
+        self.assertEqual(read_statistics(SCENES_PROJECT), dict(words=23, chapters=1, scenes=2, unusedScenes=1))
+        copyfile(DATA_PATH + '/_collection/empty_series.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        myCollection.read()
+        self.assertEqual(myCollection.refresh_statistics(), [])
+        bookStatistics = myCollection.get_statistics('bk1')
+        self.assertEqual(bookStatistics, read_statistics(myCollection.books['1'].filePath))
+        self.assertEqual(myCollection.get_statistics(), dict(books=1, **bookStatistics))
+        self.assertEqual(myCollection.get_statistics('sr1')['books'], 0)
+        myCollection.move_node('bk1', 'sr1', 'end')
+        self.assertEqual(myCollection.get_statistics('sr1'), dict(books=1, **bookStatistics))
+        self.assertFalse(myCollection.books['1'].isModified)
+        self.assertEqual(myCollection.export_statistics(STATISTICS_FILE), f'"{STATISTICS_FILE}" written.')
+        self.assertEqual(read_file(STATISTICS_FILE).splitlines()[0],
+                         'Type,Series,Title,Path,Books,words,chapters,scenes,unusedScenes')
+        self.assertEqual(len(read_file(STATISTICS_FILE).splitlines()), 4)
+        myCollection.remove_book('bk1')
+        self.assertEqual(myCollection.get_statistics(), dict(books=0, words=0, chapters=0, scenes=0, unusedScenes=0))
+        self.assertEqual(myCollection.get_statistics('sr1'), myCollection.get_statistics())
+
+    def test_keep_missing_books(self):
+        """Keep books whose project files are not available. """
+        copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
+        os.remove('yWriter Projects/The Refugee Ship.yw/The Refugee Ship.yw7')
+        myCollection = Collection(TEST_FILE)
+        self.assertEqual(myCollection.read(),
+                         '2 Books found in "' + TEST_FILE + '".')
+        self.assertEqual(myCollection.check_availability(), ['2'])
+        self.assertTrue(myCollection.books['1'].isAvailable)
+        self.assertFalse(myCollection.books['2'].isAvailable)
+        os.remove(TEST_FILE)
+        myCollection.write()
+        self.assertEqual(read_file(TEST_FILE),
+                         read_file(DATA_PATH + '/_collection/read_write.xml'))
+
+    def test_read_book_after_series(self):
+        """Read a top-level book following a series. """
+        copyfile(DATA_PATH + '/_collection/book_after_series.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE, ttk.Treeview())
+        self.assertEqual(myCollection.read(),
+                         '2 Books found in "' + TEST_FILE + '".')
+        self.assertEqual(myCollection.tree.get_children(''), ('sr1', 'bk2'))
+        os.remove(TEST_FILE)
+        myCollection.write()
+        self.assertEqual(read_file(TEST_FILE),
+                         read_file(DATA_PATH + '/_collection/book_after_series.xml'))
+
+    def test_lazy_tree_view(self):
+        """Populate the tree view on demand. """
+        copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
+        treeView = ttk.Treeview()
+        lazyView = LazyTreeView(treeView)
+        myCollection = Collection(TEST_FILE, lazyView)
+        lazyView.set_source(myCollection.tree, myCollection.get_node_options)
+        myCollection.read()
+        self.assertEqual(treeView.get_children(''), ('sr1', 'sr2', 'sr3'))
+        self.assertEqual(treeView.get_children('sr2'), ('#sr2',))
+        lazyView.populate('sr2')
+        self.assertEqual(treeView.get_children('sr2'), ('bk1', 'bk2'))
+        myCollection.tree.move('bk1', 'sr3', 'end')
+        self.assertEqual(treeView.get_children('sr2'), ('bk2',))
+        self.assertEqual(treeView.get_children('sr3'), ('#sr3',))
+
+    def test_read_old_map(self):
+        """Read a file with the old XML tag names and write it with the new ones. """
+        copyfile(DATA_PATH + '/_collection/read_old_map.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE, ttk.Treeview())
+        self.assertEqual(myCollection.read(),
+                         '2 Books found in "' + TEST_FILE + '".')
+        os.remove(TEST_FILE)
+        self.assertEqual(myCollection.write(),
+                         '"' + TEST_FILE + '" written.')
+        self.assertEqual(read_file(TEST_FILE),
+                         read_file(DATA_PATH + '/_collection/read_write.xml'))
+
+    def test_lookup_books(self):
+        """Look up books by path, title, and ID. """
+        copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        myCollection.read()
+        self.assertEqual(myCollection.get_book_id_by_path('yWriter Projects/The Refugee Ship.yw/The Refugee Ship.yw7'),
+                         '2')
+        self.assertEqual(myCollection.get_book_ids_by_title('The Gravity Monster'), ['1'])
+        self.assertEqual(myCollection.get_book('2').title, 'The Refugee Ship')
+        myCollection.set_title('bk1', 'Rick Starlift 1')
+        self.assertEqual(myCollection.get_book_ids_by_title('The Gravity Monster'), [])
+        self.assertEqual(myCollection.get_book_ids_by_title('Rick Starlift 1'), ['1'])
+        myCollection.remove_book('bk2')
+        self.assertIsNone(myCollection.get_book_id_by_path('yWriter Projects/The Refugee Ship.yw/The Refugee Ship.yw7'))
+        self.assertIsNone(myCollection.get_book('2'))
+
     def test_create_collection(self):
         """Use Case: manage the collection/create the collection."""
         myCollection = Collection(TEST_FILE, ttk.Treeview())
@@ -107,6 +626,76 @@ class NrmOpr(unittest.TestCase):
         self.assertEqual(read_file(TEST_FILE),
                          read_file(DATA_PATH + '/_collection/add_second_book.xml'))
 
+    def test_add_books(self):
+        """Use Case: manage the collection/add a batch of books to the collection."""
+        copyfile(DATA_PATH + '/_collection/create_collection.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        self.assertEqual(myCollection.read(),
+                         '0 Books found in "' + TEST_FILE + '".')
+        books = []
+        for bookPath in ('yWriter Projects/The Gravity Monster.yw/The Gravity Monster.yw7',
+                         'yWriter Projects/The Refugee Ship.yw/The Refugee Ship.yw7',
+                         'yWriter Projects/The Gravity Monster.yw/The Gravity Monster.yw7',
+                         ):
+            book = Yw7File(bookPath)
+            book.novel = Novel()
+            book.read()
+            books.append(book)
+        results = myCollection.add_books(books)
+        self.assertEqual([bkId for __, bkId, __ in results], ['1', '2', None])
+        self.assertEqual(myCollection.write(),
+                         '"' + TEST_FILE + '" written.')
+        self.assertEqual(read_file(TEST_FILE),
+                         read_file(DATA_PATH + '/_collection/add_second_book.xml'))
+
+    def test_import_projects(self):
+        """Use Case: manage the collection/import the projects of a directory tree."""
+        copyfile(DATA_PATH + '/_collection/create_collection.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        myCollection.read()
+        importer = ProjectImporter('yWriter Projects')
+        importer.start()
+        importer.wait()
+        books, messages = importer.get_results()
+        self.assertEqual(messages, [])
+        self.assertEqual([book.title for book in books], ['The Gravity Monster', 'The Refugee Ship'])
+        myCollection.add_books(books)
+        self.assertEqual(myCollection.write(),
+                         '"' + TEST_FILE + '" written.')
+        self.assertEqual(read_file(TEST_FILE),
+                         read_file(DATA_PATH + '/_collection/add_second_book.xml'))
+
+    def test_refresh_books(self):
+        """Use Case: manage the collection/update the books from their project files."""
+        copyfile(DATA_PATH + '/_collection/read_write.xml', TEST_FILE)
+        myCollection = Collection(TEST_FILE)
+        myCollection.read()
+        myCollection.set_title('bk1', 'Rick Starlift 1')
+        myCollection.set_desc('bk2', None)
+        self.assertEqual(myCollection.refresh_books(), (['1', '2'], []))
+        self.assertEqual(myCollection.refresh_books(), ([], []))
+        os.remove(TEST_FILE)
+        myCollection.write()
+        self.assertEqual(read_file(TEST_FILE),
+                         read_file(DATA_PATH + '/_collection/read_write.xml'))
+
+    def test_metadata_cache(self):
+        """Cache the project metadata until the project file changes."""
+        bookPath = 'yWriter Projects/The Gravity Monster.yw/The Gravity Monster.yw7'
+        cache = MetadataCache(CACHE_FILE)
+        metadata = cache.get_metadata(bookPath)
+        self.assertEqual(metadata['title'], 'The Gravity Monster')
+        cache.write()
+        cache = MetadataCache(CACHE_FILE)
+        cache.read()
+        self.assertEqual(cache.get(bookPath), metadata)
+        os.remove(CACHE_FILE)
+        cache.write()
+        self.assertFalse(os.path.isfile(CACHE_FILE))
+        stat = os.stat(bookPath)
+        os.utime(bookPath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+        self.assertIsNone(cache.get(bookPath))
+
     def test_remove_book(self):
         """Use Case: manage the collection/remove a book from the collection."""
         copyfile(DATA_PATH + '/_collection/add_second_book.xml', TEST_FILE)